@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""Run several patch scripts against one PatchSession.
+
+Usage: python apply_patches.py patch1 patch2 patch_connect_fix ...
+
+Files touched by more than one patch are read and written once. Patches are
+grouped by target file: each group runs in order, the groups run in parallel.
+"""
+import importlib
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from patch_session import PatchSession
+
+
+def _target(mod):
+    return getattr(mod, 'filepath', None) or getattr(mod, 'path', None)
+
+
+def main(names):
+    session = PatchSession()
+    groups = {}   # target path -> modules, in command-line order
+    for name in names:
+        mod = importlib.import_module(name.removesuffix('.py'))
+        groups.setdefault(_target(mod), []).append(mod)
+
+    def run(mods):
+        for mod in mods:
+            mod.apply(session)
+
+    with ThreadPoolExecutor(max_workers=4) as ex:
+        # list() re-raises the first failure before anything is flushed
+        list(ex.map(run, groups.values()))
+    for path in session.flush():
+        print('Written', path)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    main(sys.argv[1:])
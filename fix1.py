@@ -109,8 +109,9 @@ new = '''    private fun startVideoForward() {
         }, "VideoForward").also { it.start() }
     }'''
 
-if old in content:
-    content = content.replace(old, new)
+pos = content.find(old)
+if pos >= 0:
+    content = content[:pos] + new + content[pos + len(old):]
     with open(p,'wb') as f: f.write(content.encode('utf-8'))
     print("OK: startVideoForward replaced")
 else:
@@ -1,8 +1,8 @@
 import re
 
-p = r'C:\MirageWork\MirageVulkan\android\capture\src\main\java\com\mirage\capture\ipc\AccessoryCommandReceiver.kt'
-with open(p,'rb') as f:
-    content = f.read().decode('utf-8')
+from patch_session import PatchSession
+
+filepath = r'C:\MirageWork\MirageVulkan\android\capture\src\main\java\com\mirage\capture\ipc\AccessoryCommandReceiver.kt'
 
 # --- Step 1: companion から videoSocket を削除 ---
 old_companion_field = '''        @Volatile
@@ -76,28 +76,20 @@ new_probe = '''    fun probeExistingUsb(svc: ScreenCaptureService) {
         }, "UsbProbe").start()
     }'''
 
-errors = []
-
-def apply(old, new, label):
-    global content
-    old_crlf = old.replace('\n', '\r\n')
-    if old_crlf in content:
-        content = content.replace(old_crlf, new.replace('\n', '\r\n'))
-        print(f"{label}: OK (CRLF)")
-    elif old in content:
-        content = content.replace(old, new)
-        print(f"{label}: OK (LF)")
-    else:
-        errors.append(label)
-        print(f"{label}: ERROR - not found")
+def apply(session):
+    try:
+        session.apply_edits(filepath, [
+            ("Step1: class body + instance var", old_class_body_start, new_class_body_start),
+            ("Step2: remove companion videoSocket", old_companion_field, new_companion_field),
+            ("Step3: probeExistingUsb", old_probe, new_probe),
+        ])
+    except ValueError as e:
+        print(f"FAILED steps:\n{e}")
+        return False
+    return True
 
-apply(old_class_body_start, new_class_body_start, "Step1: class body + instance var")
-apply(old_companion_field, new_companion_field, "Step2: remove companion videoSocket")
-apply(old_probe, new_probe, "Step3: probeExistingUsb")
 
-if not errors:
-    with open(p,'wb') as f:
-        f.write(content.encode('utf-8'))
-    print("FIX-2 all steps applied, file saved")
-else:
-    print(f"FAILED steps: {errors}")
+if __name__ == '__main__':
+    session = PatchSession()
+    if apply(session) and session.flush():
+        print("FIX-2 all steps applied, file saved")
@@ -1,8 +1,7 @@
 """Fix 2b: Properly place public setter for ai_processing_enabled_"""
-from pathlib import Path
+from patch_session import PatchSession
 
-CPP_PATH = Path(r"C:\MirageWork\MirageVulkan\src\ai_engine.cpp")
-cpp = CPP_PATH.read_text(encoding='utf-8')
+filepath = r"C:\MirageWork\MirageVulkan\src\ai_engine.cpp"
 
 # The previous fix added the setter in private scope. Replace it with proper public: accessor
 old = '''    std::atomic<bool>                                   ai_processing_enabled_{true};  // Bug fix: propagated from AIEngine::enabled_
@@ -13,6 +12,22 @@ public:
     void setAiProcessingEnabled(bool v) { ai_processing_enabled_.store(v, std::memory_order_relaxed); }
 private:'''
 
-cpp = cpp.replace(old, new, 1)
-CPP_PATH.write_text(cpp, encoding='utf-8')
-print("[OK] Added public: scope for setAiProcessingEnabled()")
+
+PATCH_ID = 'fix2b_ai_processing_setter_public'
+
+
+def apply(session):
+    if session.is_applied(PATCH_ID, filepath):
+        print("[SKIP] public: scope already added")
+        return
+    if not session.edit(filepath, old, new):
+        print("[WARN] setter not found - run fix2_private first")
+        return
+    session.mark_applied(PATCH_ID, filepath)
+    print("[OK] Added public: scope for setAiProcessingEnabled()")
+
+
+if __name__ == '__main__':
+    session = PatchSession()
+    apply(session)
+    session.flush()
@@ -5,8 +5,9 @@ with open(h264_path,'rb') as f:
 old = 'for (pkt in packets) { sender.send(pkt) }\r\n                if (sender is UsbVideoSender) { sender.flushBatch() }\r\n                for (sec in secondarySenders) {\r\n                    try { for (pkt in packets) { sec.send(pkt) } }\r\n                    catch (e: Exception) {'
 new = 'for (pkt in packets) { sender.send(pkt) }\r\n                sender.flush() // FIX-3: interface経由、instanceof不要\r\n                for (sec in secondarySenders) {\r\n                    try { for (pkt in packets) { sec.send(pkt) }; sec.flush() }\r\n                    catch (e: Exception) {'
 
-if old in h264:
-    h264 = h264.replace(old, new)
+pos = h264.find(old)
+if pos >= 0:
+    h264 = h264[:pos] + new + h264[pos + len(old):]
     with open(h264_path,'wb') as f:
         f.write(h264.encode('utf-8'))
     print("H264Encoder instanceof removal: OK")
@@ -14,8 +15,9 @@ else:
     print("ERROR: pattern not found")
     # LFで試す
     old_lf = old.replace('\r\n','\n')
-    if old_lf in h264:
-        h264 = h264.replace(old_lf, new.replace('\r\n','\n'))
+    pos = h264.find(old_lf)
+    if pos >= 0:
+        h264 = h264[:pos] + new.replace('\r\n','\n') + h264[pos + len(old_lf):]
         with open(h264_path,'wb') as f:
             f.write(h264.encode('utf-8'))
         print("H264Encoder instanceof removal: OK (LF)")
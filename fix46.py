@@ -1,41 +1,27 @@
-p = r'C:\MirageWork\MirageVulkan\android\accessory\src\main\java\com\mirage\accessory\access\MirageAccessibilityService.kt'
+from patch_session import PatchSession
 
-with open(p,'rb') as f:
-    content = f.read().decode('utf-8')
+filepath = r'C:\MirageWork\MirageVulkan\android\accessory\src\main\java\com\mirage\accessory\access\MirageAccessibilityService.kt'
 
-errors = []
+edits = []   # (label, old, new), applied all or nothing by apply()
 
-def apply(label, old, new):
-    global content
-    old_crlf = old.replace('\n', '\r\n')
-    if old_crlf in content:
-        content = content.replace(old_crlf, new.replace('\n', '\r\n'))
-        print(f"  {label}: OK")
-        return True
-    elif old in content:
-        content = content.replace(old, new)
-        print(f"  {label}: OK (LF)")
-        return True
-    else:
-        print(f"  {label}: ERROR")
-        errors.append(label)
-        return False
+def edit(label, old, new):
+    edits.append((label, old, new))
 
 print("=== FIX-4: commandReceiver 削除 ===")
 
 # 1. 不要なimport削除
-apply('import BroadcastReceiver',
+edit('import BroadcastReceiver',
     'import android.content.BroadcastReceiver\n',
     '')
-apply('import IntentFilter',
+edit('import IntentFilter',
     'import android.content.IntentFilter\n',
     '')
-apply('import LocalBroadcastManager',
+edit('import LocalBroadcastManager',
     'import androidx.localbroadcastmanager.content.LocalBroadcastManager\n',
     '')
 
 # 2. commandReceiverフィールド削除
-apply('commandReceiver field',
+edit('commandReceiver field',
     '''    private val commandReceiver = object : BroadcastReceiver() {
         override fun onReceive(context: Context?, intent: Intent?) {
             if (intent?.action != AccessoryIoService.ACTION_COMMAND) return
@@ -58,7 +44,7 @@ apply('commandReceiver field',
     '    override fun onServiceConnected() {')
 
 # 3. onServiceConnected内のregisterReceiver削除
-apply('registerReceiver in onServiceConnected',
+edit('registerReceiver in onServiceConnected',
     '''        udpSender.start()
         val filter = IntentFilter(AccessoryIoService.ACTION_COMMAND)
         LocalBroadcastManager.getInstance(this).registerReceiver(commandReceiver, filter)
@@ -67,14 +53,14 @@ apply('registerReceiver in onServiceConnected',
         Log.i(TAG, "AccessibilityService connected")''')
 
 # 4. onDestroy内のunregisterReceiver削除
-apply('unregisterReceiver in onDestroy',
+edit('unregisterReceiver in onDestroy',
     '        LocalBroadcastManager.getInstance(this).unregisterReceiver(commandReceiver)\n        udpSender.stop()',
     '        udpSender.stop()')
 
 print("\n=== FIX-6: MediaProjection packageName 緩和 ===")
 
 # 5. onAccessibilityEvent - packageName完全一致 → 部分一致リスト
-apply('onAccessibilityEvent packageName check',
+edit('onAccessibilityEvent packageName check',
     '''    override fun onAccessibilityEvent(event: AccessibilityEvent?) {
         event ?: return
         // MediaProjectionダイアログの自動承認を試行
@@ -96,7 +82,7 @@ apply('onAccessibilityEvent packageName check',
     }''')
 
 # 6. companion object に SYSTEM_DIALOG_PACKAGES 追加
-apply('SYSTEM_DIALOG_PACKAGES in companion',
+edit('SYSTEM_DIALOG_PACKAGES in companion',
     '''    companion object {
         private const val TAG = "MirageA11y"
 
@@ -126,7 +112,7 @@ apply('SYSTEM_DIALOG_PACKAGES in companion',
     }''')
 
 # 7. handleMediaProjectionDialog - 承認テキスト拡充 + 親クリック深さ制限
-apply('handleMediaProjectionDialog targets',
+edit('handleMediaProjectionDialog targets',
     '''        // 日本語・英語両方のボタンテキストを検索
         val targets = listOf("開始", "Start", "Start now")
         for (label in targets) {
@@ -179,9 +165,19 @@ apply('handleMediaProjectionDialog targets',
             }
         }''')
 
-if not errors:
-    with open(p,'wb') as f:
-        f.write(content.encode('utf-8'))
-    print("\nAll changes saved OK")
-else:
-    print(f"\nFailed: {errors}")
+
+def apply(session):
+    try:
+        session.apply_edits(filepath, edits)
+    except ValueError as e:
+        print(f"\nFailed:\n{e}")
+        return False
+    for label, _, _ in edits:
+        print(f"  {label}: OK")
+    return True
+
+
+if __name__ == '__main__':
+    session = PatchSession()
+    if apply(session) and session.flush():
+        print("\nAll changes saved OK")
@@ -0,0 +1,47 @@
+"""Source lookup and numbered listings for the read_*.py scripts."""
+import os
+import sys
+
+
+def walk_files(root):
+    """DirEntry of every file under root, in os.walk's top-down order.
+
+    scandir entries carry their type (and on Windows their size) from the
+    directory read itself, so nothing is stat()ed per file. A missing root
+    yields nothing, as os.walk does.
+    """
+    stack = [root]
+    while stack:
+        files, dirs = [], []
+        try:
+            with os.scandir(stack.pop()) as it:
+                for e in it:
+                    (dirs if e.is_dir(follow_symlinks=False) else files).append(e)
+        except OSError:
+            continue
+        yield from files
+        stack.extend(reversed([d.path for d in dirs]))
+
+
+def find_sources(root, names):
+    """DirEntry of every file under root whose name is in names (one hash lookup each)."""
+    names = frozenset(names)
+    return (e for e in walk_files(root) if e.name in names)
+
+
+def read_lines(path):
+    """Lines of path, decoded as UTF-8 with undecodable bytes replaced."""
+    with open(path, 'rb') as f:
+        return f.read().decode('utf-8', 'replace').splitlines()
+
+
+def write_numbered(lines, stop=None):
+    """Write 'N: line' for lines[:stop] to stdout in one write.
+
+    One encoded blob goes straight to the binary stream instead of a print()
+    per line; stdout is flushed first so it stays in order with print()ed
+    headers around it.
+    """
+    text = ''.join(f'{i}: {l}\n' for i, l in enumerate(lines[:stop], 1))
+    sys.stdout.flush()
+    sys.stdout.buffer.write(text.encode('utf-8', 'replace'))
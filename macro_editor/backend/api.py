@@ -1,14 +1,18 @@
 """MacroEditorAPI - pywebview JS bridge"""
+import asyncio
 import json
 import subprocess
 import base64
+import mmap
 import tempfile
 import os
-import re
 import threading
-import xml.etree.ElementTree as ET
 from pathlib import Path
 from backend.mirage_client import MirageClient, MacroRunner
+from backend.ui_dump import (dump_ui_xml, parse_ui_root, parse_ui_elements, nodes_to_elements,
+                             select_clickable_nodes, select_text_nodes, iter_text_elements,
+                             TEXT_FIELDS, CLICKABLE_FIELDS)
+from backend.ui_dump import parse_bounds as _parse_bounds
 
 MACROS_DIR = Path(__file__).parent.parent / 'macros'
 MACROS_DIR.mkdir(exist_ok=True)
@@ -17,19 +21,72 @@ _runner: MacroRunner = None
 _run_lock = threading.Lock()
 
 
+class _AdbPipeline:
+    """Ordered, non-blocking adb command queue for the ADB macro fallback.
+
+    Input commands run one after another on a private asyncio loop (device
+    order is preserved) while the macro thread keeps going, so adb process
+    startup overlaps macro-side work. At most MAX_IN_FLIGHT commands may be
+    outstanding; flush() is the barrier before reading screen state.
+    """
+    MAX_IN_FLIGHT = 4
+
+    def __init__(self, serial):
+        self._serial = serial
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._slots = threading.BoundedSemaphore(self.MAX_IN_FLIGHT)
+        self._tail = None
+        self._errors = []
+
+    async def _run(self, prev, args, timeout):
+        if prev is not None:
+            await asyncio.wait([asyncio.wrap_future(prev)])
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                'adb', '-s', self._serial, *args,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                await asyncio.wait_for(proc.wait(), timeout)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                raise subprocess.TimeoutExpired(['adb'] + list(args), timeout)
+        except Exception as e:
+            self._errors.append(e)
+
+    def submit(self, *args, timeout=10):
+        self._slots.acquire()
+        fut = asyncio.run_coroutine_threadsafe(self._run(self._tail, args, timeout), self._loop)
+        fut.add_done_callback(lambda _f: self._slots.release())
+        self._tail = fut
+
+    def flush(self):
+        """Block until every submitted command finished; re-raise the first failure."""
+        if self._tail is not None:
+            self._tail.result()
+        if self._errors:
+            err = self._errors[0]
+            self._errors.clear()
+            raise err
+
+    def close(self):
+        try:
+            if self._tail is not None:
+                self._tail.result()
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+
+
 def _run_adb(serial, *args, timeout=10):
     cmd = ['adb', '-s', serial] + list(args)
     r = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
     return r.stdout.strip()
 
 
-def _parse_bounds(bounds_str):
-    m = re.match(r'\[(\d+),(\d+)\]\[(\d+),(\d+)\]', bounds_str or '')
-    if m:
-        return tuple(int(v) for v in m.groups())
-    return None
-
-
 class MacroEditorAPI:
     """Exposed to JavaScript via window.pywebview.api"""
 
@@ -87,10 +144,11 @@ class MacroEditorAPI:
                            capture_output=True, timeout=10)
             subprocess.run(['adb', '-s', serial, 'shell', 'rm', '/sdcard/mirage_cap.png'],
                            capture_output=True, timeout=5)
-            if not os.path.exists(tmp):
+            if not os.path.exists(tmp) or os.path.getsize(tmp) == 0:
                 return {'error': 'Screenshot file not found'}
-            with open(tmp, 'rb') as f:
-                b64 = base64.b64encode(f.read()).decode('ascii')
+            # base64 straight off the page cache; skips a multi-MB read() copy
+            with open(tmp, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                b64 = base64.b64encode(mm).decode('ascii')
             result = subprocess.run(['adb', '-s', serial, 'shell', 'wm', 'size'],
                                     capture_output=True, text=True, timeout=5)
             width, height = 1080, 1920
@@ -126,41 +184,46 @@ class MacroEditorAPI:
 
     # ==================== Screen Analysis ====================
 
-    def dump_ui(self, serial):
+    def dump_ui(self, serial, fields=None):
         """Dump UI hierarchy via uiautomator. Returns {elements: [...]}."""
         try:
-            _run_adb(serial, 'shell', 'uiautomator', 'dump', '/sdcard/mirage_ui.xml', timeout=15)
-            tmp = os.path.join(tempfile.gettempdir(), 'mirage_ui.xml')
-            subprocess.run(['adb', '-s', serial, 'pull', '/sdcard/mirage_ui.xml', tmp],
-                           capture_output=True, timeout=10)
-            _run_adb(serial, 'shell', 'rm', '/sdcard/mirage_ui.xml', timeout=5)
-            if not os.path.exists(tmp):
+            xml_bytes = dump_ui_xml(serial)
+            if not xml_bytes:
                 return {'error': 'UI dump file not found'}
-            with open(tmp, 'r', encoding='utf-8') as f:
-                xml_text = f.read()
-            elements = self._parse_ui_xml(xml_text)
-            return {'elements': elements, 'xml_size': len(xml_text)}
+            elements = self._parse_ui_xml(xml_bytes, fields)
+            return {'elements': elements, 'xml_size': len(xml_bytes)}
         except Exception as e:
             return {'error': str(e)}
 
+    def _root_for(self, serial):
+        """Freshly dumped UI tree root for serial, None if the dump failed."""
+        xml_bytes = dump_ui_xml(serial)
+        return parse_ui_root(xml_bytes) if xml_bytes else None
+
     def find_text(self, serial, text):
         """Find UI elements containing text."""
-        result = self.dump_ui(serial)
-        if 'error' in result:
-            return result
-        text_lower = text.lower()
-        matches = [e for e in result['elements']
-                   if text_lower in (e.get('text', '') or '').lower()
-                   or text_lower in (e.get('content_desc', '') or '').lower()]
+        try:
+            root = self._root_for(serial)
+        except Exception as e:
+            return {'error': str(e)}
+        if root is None:
+            return {'error': 'UI dump file not found'}
+        matches = nodes_to_elements(select_text_nodes(root, text), TEXT_FIELDS)
         return {'matches': matches, 'count': len(matches)}
 
+    def _iter_find_text(self, serial, text):
+        """Yield matches lazily so callers needing only the first hit stop early."""
+        return iter_text_elements(serial, text, TEXT_FIELDS)
+
     def get_clickables(self, serial):
         """Get all clickable elements."""
-        result = self.dump_ui(serial)
-        if 'error' in result:
-            return result
-        clickables = [e for e in result['elements']
-                      if e.get('clickable') or e.get('checkable') or e.get('scrollable')]
+        try:
+            root = self._root_for(serial)
+        except Exception as e:
+            return {'error': str(e)}
+        if root is None:
+            return {'error': 'UI dump file not found'}
+        clickables = nodes_to_elements(select_clickable_nodes(root), CLICKABLE_FIELDS)
         return {'elements': clickables, 'count': len(clickables)}
 
     def capture_screen_with_elements(self, serial):
@@ -172,41 +235,8 @@ class MacroEditorAPI:
         screen['elements'] = ui.get('elements', []) if isinstance(ui, dict) and 'error' not in ui else []
         return screen
 
-    def _parse_ui_xml(self, xml_text):
-        elements = []
-        try:
-            root = ET.fromstring(xml_text)
-        except ET.ParseError:
-            return elements
-        for node in root.iter('node'):
-            bounds = _parse_bounds(node.get('bounds', ''))
-            if not bounds:
-                continue
-            x1, y1, x2, y2 = bounds
-            cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
-            w, h = x2 - x1, y2 - y1
-            if w < 2 or h < 2:
-                continue
-            text = node.get('text', '') or ''
-            resource_id = node.get('resource-id', '') or ''
-            content_desc = node.get('content-desc', '') or ''
-            class_name = node.get('class', '') or ''
-            label = text or content_desc or (resource_id.split('/')[-1] if resource_id else '')
-            elements.append({
-                'text': text, 'resource_id': resource_id,
-                'content_desc': content_desc,
-                'class_name': class_name.split('.')[-1],
-                'bounds': {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2},
-                'center_x': cx, 'center_y': cy, 'width': w, 'height': h,
-                'label': label[:40],
-                'clickable': node.get('clickable') == 'true',
-                'scrollable': node.get('scrollable') == 'true',
-                'checkable': node.get('checkable') == 'true',
-                'checked': node.get('checked') == 'true',
-                'focused': node.get('focused') == 'true',
-                'enabled': node.get('enabled') == 'true',
-            })
-        return elements
+    def _parse_ui_xml(self, xml_text, fields=None):
+        return parse_ui_elements(xml_text, fields)
 
     # ==================== Macro Execution ====================
 
@@ -214,11 +244,9 @@ class MacroEditorAPI:
         global _runner
         with _run_lock:
             try:
-                client = MirageClient(timeout=30.0)
-                client.connect()
-                _runner = MacroRunner(client, serial, step_delay=0.3)
+                # Shared connection: no connect handshake per run
+                _runner = MacroRunner(None, serial, step_delay=0.3)
                 result = _runner.execute(python_code)
-                client.disconnect()
                 _runner = None
                 return result
             except ConnectionError:
@@ -238,75 +266,68 @@ class MacroEditorAPI:
         log_lines = []
         step_count = 0
         api_self = self
+        adb = _AdbPipeline(serial)
 
         class AdbDevice:
             def tap(self, x, y):
                 nonlocal step_count; step_count += 1
                 log_lines.append(f"[ADB] tap({x}, {y})")
-                subprocess.run(['adb', '-s', serial, 'shell', 'input', 'tap', str(x), str(y)],
-                               capture_output=True, timeout=10)
+                adb.submit('shell', 'input', 'tap', str(x), str(y))
             def swipe(self, x1, y1, x2, y2, duration=300):
                 nonlocal step_count; step_count += 1
                 log_lines.append(f"[ADB] swipe({x1},{y1}->{x2},{y2})")
-                subprocess.run(['adb', '-s', serial, 'shell', 'input', 'swipe',
-                                str(x1), str(y1), str(x2), str(y2), str(duration)],
-                               capture_output=True, timeout=10)
+                adb.submit('shell', 'input', 'swipe',
+                           str(x1), str(y1), str(x2), str(y2), str(duration))
             def long_press(self, x, y, duration=1000):
                 nonlocal step_count; step_count += 1
                 log_lines.append(f"[ADB] long_press({x}, {y}, {duration}ms)")
-                subprocess.run(['adb', '-s', serial, 'shell', 'input', 'swipe',
-                                str(x), str(y), str(x), str(y), str(duration)],
-                               capture_output=True, timeout=15)
+                adb.submit('shell', 'input', 'swipe',
+                           str(x), str(y), str(x), str(y), str(duration), timeout=15)
             def key(self, keycode):
                 nonlocal step_count; step_count += 1
                 log_lines.append(f"[ADB] key({keycode})")
-                subprocess.run(['adb', '-s', serial, 'shell', 'input', 'keyevent', str(keycode)],
-                               capture_output=True, timeout=10)
+                adb.submit('shell', 'input', 'keyevent', str(keycode))
             def text(self, t):
                 nonlocal step_count; step_count += 1
                 log_lines.append(f"[ADB] text('{t}')")
                 escaped = t.replace(' ', '%s').replace('&', '\\&').replace('<', '\\<')
-                subprocess.run(['adb', '-s', serial, 'shell', 'input', 'text', escaped],
-                               capture_output=True, timeout=10)
+                adb.submit('shell', 'input', 'text', escaped)
             def launch_app(self, package):
                 nonlocal step_count; step_count += 1
                 log_lines.append(f"[ADB] launch_app({package})")
-                subprocess.run(['adb', '-s', serial, 'shell', 'monkey', '-p', package,
-                                '-c', 'android.intent.category.LAUNCHER', '1'],
-                               capture_output=True, timeout=10)
+                adb.submit('shell', 'monkey', '-p', package,
+                           '-c', 'android.intent.category.LAUNCHER', '1')
             def force_stop(self, package):
                 nonlocal step_count; step_count += 1
                 log_lines.append(f"[ADB] force_stop({package})")
-                subprocess.run(['adb', '-s', serial, 'shell', 'am', 'force-stop', package],
-                               capture_output=True, timeout=10)
+                adb.submit('shell', 'am', 'force-stop', package)
             def screenshot(self, filename='screenshot.png'):
                 nonlocal step_count; step_count += 1
                 log_lines.append(f"[ADB] screenshot({filename})")
             def screen_contains_text(self, text):
                 nonlocal step_count; step_count += 1
-                result = api_self.find_text(serial, text)
-                found = result.get('count', 0) > 0
+                adb.flush()
+                found = next(api_self._iter_find_text(serial, text), None) is not None
                 log_lines.append(f"[ADB] screen_contains_text('{text}') -> {found}")
                 return found
             def find_and_tap_text(self, text):
                 nonlocal step_count; step_count += 1
-                result = api_self.find_text(serial, text)
-                matches = result.get('matches', [])
-                if matches:
-                    cx, cy = matches[0]['center_x'], matches[0]['center_y']
+                adb.flush()
+                m = next(api_self._iter_find_text(serial, text), None)
+                if m:
+                    cx, cy = m['center_x'], m['center_y']
                     log_lines.append(f"[ADB] find_and_tap_text('{text}') -> tap({cx},{cy})")
-                    subprocess.run(['adb', '-s', serial, 'shell', 'input', 'tap', str(cx), str(cy)],
-                                   capture_output=True, timeout=10)
+                    adb.submit('shell', 'input', 'tap', str(cx), str(cy))
                     return True
                 log_lines.append(f"[ADB] find_and_tap_text('{text}') -> not found")
                 return False
             def wait_for_text(self, text, timeout_sec=10, interval=1.0):
                 nonlocal step_count; step_count += 1
+                adb.flush()
                 import time
-                deadline = time.time() + timeout_sec
-                while time.time() < deadline:
-                    result = api_self.find_text(serial, text)
-                    if result.get('count', 0) > 0:
+                deadline = time.monotonic_ns() + int(timeout_sec * 1_000_000_000)
+                while time.monotonic_ns() < deadline:
+                    if next(api_self._iter_find_text(serial, text), None) is not None:
                         log_lines.append(f"[ADB] wait_for_text('{text}') -> found")
                         return True
                     time.sleep(interval)
@@ -314,17 +335,20 @@ class MacroEditorAPI:
                 return False
             def tap_element(self, resource_id):
                 nonlocal step_count; step_count += 1
-                result = api_self.dump_ui(serial)
+                adb.flush()
+                result = api_self.dump_ui(serial, TEXT_FIELDS)
                 if 'elements' in result:
                     for e in result['elements']:
                         if resource_id in (e.get('resource_id', '') or ''):
                             cx, cy = e['center_x'], e['center_y']
                             log_lines.append(f"[ADB] tap_element('{resource_id}') -> tap({cx},{cy})")
-                            subprocess.run(['adb', '-s', serial, 'shell', 'input', 'tap', str(cx), str(cy)],
-                                           capture_output=True, timeout=10)
+                            adb.submit('shell', 'input', 'tap', str(cx), str(cy))
                             return True
                 log_lines.append(f"[ADB] tap_element('{resource_id}') -> not found")
                 return False
+            def flush(self):
+                """Wait for queued input commands (use when ordering vs. sleep matters)."""
+                adb.flush()
             def screen_record(self, duration=10):
                 nonlocal step_count; step_count += 1
                 log_lines.append(f"[ADB] screen_record({duration}s) -> stub")
@@ -339,10 +363,13 @@ class MacroEditorAPI:
         namespace = {"device": AdbDevice(), "time": _time, "logging": _logging, "log": _FakeLog()}
         try:
             exec(compile(python_code, "<macro>", "exec"), namespace)
+            adb.flush()
             return {'status': 'ok', 'log': log_lines, 'steps': step_count, 'mode': 'adb_fallback'}
         except Exception as e:
             log_lines.append(f"ERROR: {e}")
             return {'status': 'error', 'log': log_lines, 'steps': step_count, 'error': str(e)}
+        finally:
+            adb.close()
 
     # ==================== Save / Load ====================
 
@@ -1,14 +1,67 @@
 """MirageClient - TCP JSON-RPC client for MacroApiServer (port 19840)"""
+import ast
+import base64
+import collections
+import contextlib
+import hashlib
 import json
+import logging
 import socket
+import struct
+import threading
 import time
-import subprocess
-import re
-import xml.etree.ElementTree as ET
-import os
-import tempfile
 from typing import Optional, Any
 
+from backend.ui_dump import dump_ui, dump_ui_root, iter_root_text_elements, iter_text_elements, TEXT_FIELDS
+from backend.ui_dump import parse_bounds as _parse_bounds
+
+try:
+    import orjson
+    _dumps = orjson.dumps          # -> UTF-8 bytes in one allocation
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    _loads = json.loads
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_BOX = struct.Struct("<4i")
+
+
+def bbox_centers(bboxes) -> tuple:
+    """(cx, cy) for flat x1,y1,x2,y2 boxes (little-endian int32 bytes or ints).
+
+    With NumPy this is one vectorized op over all N boxes; without it, a
+    plain loop over struct.iter_unpack. Both floor like the server's /2.
+    """
+    if np is not None:
+        if isinstance(bboxes, (bytes, bytearray, memoryview)):
+            a = np.frombuffer(bboxes, dtype="<i4")
+        else:
+            a = np.asarray(bboxes, dtype=np.int32)
+        a = a.reshape(-1, 4)
+        return ((a[:, 0] + a[:, 2]) // 2).tolist(), ((a[:, 1] + a[:, 3]) // 2).tolist()
+    if isinstance(bboxes, (bytes, bytearray, memoryview)):
+        boxes = _BOX.iter_unpack(bboxes)
+    else:
+        boxes = zip(*[iter(bboxes)] * 4)
+    cx, cy = [], []
+    for x1, y1, x2, y2 in boxes:
+        cx.append((x1 + x2) // 2)
+        cy.append((y1 + y2) // 2)
+    return cx, cy
+
+
+_BIG_BUF = 8 << 20   # initial binary payload buffer (a 1080p PNG fits)
+
+# (host, port) -> process-wide MirageClient handed out by MirageClient.shared()
+_SHARED: dict = {}
+_SHARED_LOCK = threading.Lock()
+
 
 class MirageClient:
     """Connect to MirageGUI's MacroApiServer via TCP JSON-RPC."""
@@ -19,12 +72,41 @@ class MirageClient:
         self.timeout = timeout
         self._sock: Optional[socket.socket] = None
         self._id = 0
-        self._buf = b""
+        self._buf = bytearray()
+        self._big_buf = bytearray()   # binary payload landing area, reused across reads
+        self._batch_ok = True   # cleared once the server reports batch as unknown
+        self._wait_ok = True    # same for the server-side wait_for_text long-poll
+        self._ocr_raw_ok = True  # same for the columnar ocr_find_text_raw
+        self._ocr_watch_ok = True  # same for the ocr_watch long-poll
+        # One request/response in flight at a time; reentrant so binary readers
+        # can hold it across _call + _read_exact
+        self._lock = threading.RLock()
+        # Second connection for server-side long-polls, opened on first use:
+        # a pending wait must not hold this connection (and its lock) for
+        # other runners' taps and screenshots
+        self._poll: Optional["MirageClient"] = None
+
+    @classmethod
+    def shared(cls, host: str = "127.0.0.1", port: int = 19840, timeout: float = 30.0) -> "MirageClient":
+        """Process-wide connected client for host:port, (re)connected lazily.
+
+        Concurrent MacroRunners share its one socket; requests are serialized
+        by the client lock. timeout only applies when the client is created.
+        """
+        with _SHARED_LOCK:
+            client = _SHARED.get((host, port))
+            if client is None:
+                client = _SHARED[(host, port)] = cls(host, port, timeout)
+            if not client.connected:
+                client.connect()
+            return client
 
     def connect(self) -> bool:
+        self._buf.clear()
         try:
             self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self._sock.settimeout(self.timeout)
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             self._sock.connect((self.host, self.port))
             return True
         except Exception as e:
@@ -36,6 +118,9 @@ class MirageClient:
             try: self._sock.close()
             except Exception: pass
             self._sock = None
+        poll, self._poll = self._poll, None
+        if poll is not None:
+            poll.disconnect()
 
     @property
     def connected(self) -> bool:
@@ -49,29 +134,89 @@ class MirageClient:
         self.disconnect()
 
     def _call(self, method: str, params: dict = None) -> Any:
-        if not self._sock:
-            raise ConnectionError("Not connected")
-        self._id += 1
-        req = {"id": self._id, "method": method}
-        if params:
-            req["params"] = params
-        line = json.dumps(req, ensure_ascii=False) + "\n"
-        self._sock.sendall(line.encode("utf-8"))
-        response = self._read_line()
-        data = json.loads(response)
+        with self._lock:
+            # Checked under the lock: another runner's failed call may have
+            # just disconnected the shared client
+            if not self._sock:
+                raise ConnectionError("Not connected")
+            self._id += 1
+            req = {"id": self._id, "method": method}
+            if params:
+                req["params"] = params
+            try:
+                self._sock.sendall(_dumps(req) + b"\n")
+                data = _loads(self._read_line())
+            except OSError:
+                self.disconnect()   # stream position unknown; next shared() reconnects
+                raise
         if "error" in data:
             err = data["error"]
             raise RuntimeError(f"RPC error {err.get('code', '?')}: {err.get('message', 'unknown')}")
         return data.get("result")
 
-    def _read_line(self) -> str:
-        while b"\n" not in self._buf:
-            chunk = self._sock.recv(4096)
+    def _read_line(self) -> bytes:
+        # bytearray.extend grows in place (amortized O(1)); only the new chunk is searched.
+        idx = self._buf.find(b"\n")
+        while idx < 0:
+            chunk = self._sock.recv(65536)
             if not chunk:
                 raise ConnectionError("Server disconnected")
-            self._buf += chunk
-        line, self._buf = self._buf.split(b"\n", 1)
-        return line.decode("utf-8")
+            start = len(self._buf)
+            self._buf.extend(chunk)
+            idx = self._buf.find(b"\n", start)
+        line = bytes(self._buf[:idx])
+        del self._buf[:idx + 1]
+        return line
+
+    def _read_exact(self, n: int) -> bytes:
+        """Read n raw bytes following a response line (binary side channel).
+
+        Whatever _read_line over-read is used first; the rest is recv_into'd
+        straight into a reused buffer (no per-chunk bytes objects or joins).
+        """
+        buf = self._buf
+        if len(buf) >= n:
+            data = bytes(buf[:n])
+            del buf[:n]
+            return data
+        if n > len(self._big_buf):
+            self._big_buf = bytearray(max(n, _BIG_BUF))
+        view = memoryview(self._big_buf)
+        off = len(buf)
+        view[:off] = buf
+        buf.clear()
+        try:
+            while off < n:
+                k = self._sock.recv_into(view[off:n])
+                if not k:
+                    raise ConnectionError("Server disconnected")
+                off += k
+        except OSError:
+            self.disconnect()
+            raise
+        return bytes(view[:n])
+
+    def batch(self, ops: list) -> list:
+        """Run [(method, params), ...] in one round trip; returns per-op results.
+
+        Falls back to one _call per op on servers without the batch method.
+        """
+        if self._batch_ok:
+            try:
+                res = self._call("batch", {"ops": [{"method": m, "params": p} for m, p in ops]})
+            except RuntimeError as e:
+                if "unknown method" not in str(e):
+                    raise
+                self._batch_ok = False
+            else:
+                results = []
+                for resp in res.get("results", []):
+                    if "error" in resp:
+                        err = resp["error"]
+                        raise RuntimeError(f"RPC error {err.get('code', '?')}: {err.get('message', 'unknown')}")
+                    results.append(resp.get("result"))
+                return results
+        return [self._call(m, p) for m, p in ops]
 
     # ---- high-level API ----
     def ping(self) -> dict: return self._call("ping")
@@ -90,6 +235,45 @@ class MirageClient:
     def force_stop(self, device_id: str, package: str) -> dict: return self._call("force_stop", {"device_id": device_id, "package": package})
     def screenshot(self, device_id: str) -> dict: return self._call("screenshot", {"device_id": device_id})
 
+    def wait_for_text(self, device_id: str, text: str, timeout_sec: float, interval: float = 1.0) -> dict:
+        """Server-side long-poll: replies once text is on screen or timeout_sec elapsed."""
+        return self._long_poll("wait_for_text", {"device_id": device_id, "text": text,
+                                                 "timeout_sec": timeout_sec, "interval_sec": interval})
+
+    def _long_poll(self, method: str, params: dict) -> Any:
+        """_call on the long-poll connection, its timeout stretched by params['timeout_sec']."""
+        with self._lock:
+            if not self._sock:
+                raise ConnectionError("Not connected")
+            poll = self._poll
+            if poll is None or not poll.connected:
+                poll = self._poll = MirageClient(self.host, self.port, self.timeout)
+                poll.connect()
+        with poll._lock:
+            if not poll._sock:
+                raise ConnectionError("Not connected")
+            poll._sock.settimeout(params["timeout_sec"] + poll.timeout)
+            try:
+                return poll._call(method, params)
+            finally:
+                if poll._sock:
+                    poll._sock.settimeout(poll.timeout)
+
+    def screenshot_bytes(self, device_id: str) -> dict:
+        """Screenshot with the raw image in result['data'] (no base64 on the wire).
+
+        Servers without the binary side channel reply with base64 as usual;
+        that is decoded here so callers always get bytes.
+        """
+        with self._lock:
+            res = self._call("screenshot", {"device_id": device_id, "binary": True})
+            n = res.pop("binary", None) if isinstance(res, dict) else None
+            if isinstance(n, int):
+                res["data"] = self._read_exact(n)
+        if n is None and isinstance(res, dict) and res.get("base64"):
+            res["data"] = base64.b64decode(res.pop("base64"))
+        return res
+
     def normalize_coords(self, device_id: str, x: int, y: int, basis_w: int, basis_h: int) -> dict:
         return self._call("normalize_coords", {"device_id": device_id, "x": x, "y": y, "basis_w": basis_w, "basis_h": basis_h})
 
@@ -102,55 +286,45 @@ class MirageClient:
     def ocr_has_text(self, device_id: str, query: str) -> dict: return self._call("ocr_has_text", {"device_id": device_id, "query": query})
     def ocr_tap_text(self, device_id: str, query: str) -> dict: return self._call("ocr_tap_text", {"device_id": device_id, "query": query})
 
+    def ocr_watch(self, device_id: str, query: str, timeout_sec: float, interval: float = 1.0) -> dict:
+        """Server-side OCR long-poll: replies once query is seen or timeout_sec elapsed."""
+        return self._long_poll("ocr_watch", {"device_id": device_id, "query": query,
+                                             "timeout_sec": timeout_sec, "interval_sec": interval})
+
+    def ocr_find_text_raw(self, device_id: str, query: str) -> dict:
+        """ocr_find_text as columns: {'texts': [...], 'bboxes': <N*4 int32 bytes>}.
+
+        The boxes ride the binary side channel; feed them to bbox_centers().
+        """
+        with self._lock:
+            res = self._call("ocr_find_text_raw", {"device_id": device_id, "query": query, "binary": True})
+            n = res.pop("binary", None) if isinstance(res, dict) else None
+            if isinstance(n, int):
+                res["bboxes"] = self._read_exact(n)
+        return res
+
 
 # ===========================================================================
 # Screen Analysis via ADB uiautomator (used by MacroRunner)
 # ===========================================================================
 
-def _parse_bounds(bounds_str):
-    m = re.match(r'\[(\d+),(\d+)\]\[(\d+),(\d+)\]', bounds_str or '')
-    return tuple(int(v) for v in m.groups()) if m else None
+# MacroRunner only needs text matching + tap targets
+_CLIENT_FIELDS = TEXT_FIELDS | {'clickable'}
 
 
 def dump_ui_hierarchy(serial: str) -> list:
     """Run uiautomator dump and parse elements. Returns list of dicts."""
-    try:
-        subprocess.run(['adb', '-s', serial, 'shell', 'uiautomator', 'dump', '/sdcard/mirage_ui.xml'],
-                       capture_output=True, timeout=15)
-        tmp = os.path.join(tempfile.gettempdir(), 'mirage_ui_client.xml')
-        subprocess.run(['adb', '-s', serial, 'pull', '/sdcard/mirage_ui.xml', tmp],
-                       capture_output=True, timeout=10)
-        subprocess.run(['adb', '-s', serial, 'shell', 'rm', '/sdcard/mirage_ui.xml'],
-                       capture_output=True, timeout=5)
-        if not os.path.exists(tmp):
-            return []
-        with open(tmp, 'r', encoding='utf-8') as f:
-            xml_text = f.read()
-        root = ET.fromstring(xml_text)
-        elements = []
-        for node in root.iter('node'):
-            bounds = _parse_bounds(node.get('bounds', ''))
-            if not bounds: continue
-            x1, y1, x2, y2 = bounds
-            if (x2 - x1) < 2 or (y2 - y1) < 2: continue
-            elements.append({
-                'text': node.get('text', '') or '',
-                'resource_id': node.get('resource-id', '') or '',
-                'content_desc': node.get('content-desc', '') or '',
-                'center_x': (x1 + x2) // 2, 'center_y': (y1 + y2) // 2,
-                'clickable': node.get('clickable') == 'true',
-            })
-        return elements
-    except Exception:
-        return []
+    return dump_ui(serial, _CLIENT_FIELDS)
+
+
+def iter_text_on_screen(serial: str, text: str):
+    """Yield elements containing text lazily (stop after the first hit if that is all you need)."""
+    return iter_text_elements(serial, text, _CLIENT_FIELDS)
 
 
 def find_text_on_screen(serial: str, text: str) -> list:
     """Find elements containing text. Returns list of matches."""
-    text_lower = text.lower()
-    return [e for e in dump_ui_hierarchy(serial)
-            if text_lower in (e.get('text', '') or '').lower()
-            or text_lower in (e.get('content_desc', '') or '').lower()]
+    return list(iter_text_on_screen(serial, text))
 
 
 def find_element_by_id(serial: str, resource_id: str) -> Optional[dict]:
@@ -165,76 +339,335 @@ def find_element_by_id(serial: str, resource_id: str) -> Optional[dict]:
 # MacroRunner
 # ===========================================================================
 
+# ---------------------------------------------------------------------------
+# Macro ops: block-generated macros (device.* calls with literal args, sleep,
+# log, `for _ in range(N)`, `if device.x(...)`, assert) are compiled once to a
+# nested op list and run by _run_ops; anything else falls back to exec().
+# ---------------------------------------------------------------------------
+OP_CALL, OP_LOOP, OP_IF, OP_ASSERT = range(4)
+_OP_TARGETS = {"device", "time", "log"}
+_TIME_OPS = {"sleep"}
+_LOG_OPS = {"info", "warning", "error"}
+_NOOP_IMPORTS = {"time", "logging"}   # already bound in the macro namespace
+
+
+class _NotOps(Exception):
+    pass
+
+
+def _op_call(node) -> tuple:
+    """(OP_CALL, target, method, args, kwargs) for target.method(<literals>)."""
+    if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+            and isinstance(node.func.value, ast.Name)):
+        raise _NotOps
+    target, name = node.func.value.id, node.func.attr
+    if target == "device":
+        if name.startswith("_") or not callable(getattr(_DeviceProxy, name, None)):
+            raise _NotOps
+    elif not ((target == "time" and name in _TIME_OPS) or (target == "log" and name in _LOG_OPS)):
+        raise _NotOps
+    try:
+        args = tuple(ast.literal_eval(a) for a in node.args)
+        kwargs = {k.arg: ast.literal_eval(k.value) for k in node.keywords if k.arg}
+    except ValueError:
+        raise _NotOps
+    if len(kwargs) != len(node.keywords):
+        raise _NotOps
+    return (OP_CALL, target, name, args, kwargs)
+
+
+def _op_block(stmts) -> list:
+    ops = []
+    for st in stmts:
+        if isinstance(st, ast.Expr):
+            ops.append(_op_call(st.value))
+        elif isinstance(st, ast.Pass):
+            continue
+        elif isinstance(st, ast.Import) and all(a.name in _NOOP_IMPORTS and a.asname is None
+                                                for a in st.names):
+            continue
+        elif (isinstance(st, ast.For) and not st.orelse and isinstance(st.target, ast.Name)
+              and isinstance(st.iter, ast.Call) and isinstance(st.iter.func, ast.Name)
+              and st.iter.func.id == "range" and len(st.iter.args) == 1 and not st.iter.keywords
+              and st.target.id not in _OP_TARGETS):
+            try:
+                count = ast.literal_eval(st.iter.args[0])
+            except ValueError:
+                raise _NotOps
+            if not isinstance(count, int):
+                raise _NotOps
+            ops.append((OP_LOOP, count, _op_block(st.body)))
+        elif isinstance(st, ast.If):
+            ops.append((OP_IF, _op_call(st.test), _op_block(st.body), _op_block(st.orelse)))
+        elif isinstance(st, ast.Assert):
+            try:
+                msg = ast.literal_eval(st.msg) if st.msg is not None else None
+            except ValueError:
+                raise _NotOps
+            ops.append((OP_ASSERT, _op_call(st.test), msg))
+        else:
+            raise _NotOps
+    return ops
+
+
+def _compile_ops(code: str) -> Optional[list]:
+    """Op list for block-style macro source, None if it needs the full interpreter."""
+    try:
+        return _op_block(ast.parse(code, "<macro>", "exec").body)
+    except (_NotOps, SyntaxError):
+        return None
+
+
+def _run_ops(ops: list, env: dict, runner: "MacroRunner"):
+    """Run an op list; env maps call targets to objects. Cancel is checked per op."""
+    for op in ops:
+        if runner._cancelled:
+            raise _MacroCancelled()
+        kind = op[0]
+        if kind == OP_CALL:
+            getattr(env[op[1]], op[2])(*op[3], **op[4])
+        elif kind == OP_LOOP:
+            body = op[2]
+            for _ in range(op[1]):
+                _run_ops(body, env, runner)
+        elif kind == OP_IF:
+            c = op[1]
+            _run_ops(op[2] if getattr(env[c[1]], c[2])(*c[3], **c[4]) else op[3], env, runner)
+        else:  # OP_ASSERT
+            c = op[1]
+            if not getattr(env[c[1]], c[2])(*c[3], **c[4]):
+                raise AssertionError(op[2]) if op[2] is not None else AssertionError()
+
+
+_LOG_MAX = 10000   # per-run log entries kept (oldest evicted first)
+
+# Namespace entries passed as parameters to the wrapped macro (LOAD_FAST, not LOAD_GLOBAL)
+_MACRO_ARGS = ("device", "time", "logging", "log")
+_MACRO_FUNC = "__macro"
+
+
+def _compile_wrapped(tree: ast.Module):
+    """Compile macro statements as the body of __macro(*_MACRO_ARGS), or None.
+
+    Done on the AST (not by re-indenting source) so multi-line strings and
+    line numbers in tracebacks are untouched. Code whose scoping would change
+    inside a function (global/nonlocal, star imports) stays module-level, as
+    does code that would compile there but not at module level: yield/await,
+    and a return outside any def in the macro.
+    """
+    nested_returns = set()   # ast.walk is breadth-first: a def comes before its returns
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Global, ast.Nonlocal, ast.Yield, ast.YieldFrom, ast.Await)) or (
+                isinstance(node, ast.ImportFrom) and any(a.name == "*" for a in node.names)):
+            return None
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            nested_returns.update(id(n) for n in ast.walk(node) if isinstance(n, ast.Return))
+        elif isinstance(node, ast.Return) and id(node) not in nested_returns:
+            return None
+    fn = ast.parse(f"def {_MACRO_FUNC}({', '.join(_MACRO_ARGS)}):\n    pass").body[0]
+    fn.body = tree.body or fn.body
+    module = ast.Module(body=[fn], type_ignores=[])
+    ast.fix_missing_locations(module)
+    try:
+        return compile(module, "<macro>", "exec")
+    except SyntaxError:
+        return None
+
+
+_CODE_CACHE: dict[bytes, tuple] = {}
+_CODE_CACHE_MAX = 64
+
+
+def _compile_macro(code: str) -> tuple:
+    """(ops, code object, wrapped) for macro source, built once per distinct text.
+
+    ops is set for block-style macros; otherwise the code object is exec()d,
+    and when wrapped it defines __macro to be called with _MACRO_ARGS.
+    """
+    key = hashlib.blake2b(code.encode("utf-8"), digest_size=16).digest()
+    ent = _CODE_CACHE.get(key)
+    if ent is None:
+        ops = _compile_ops(code)
+        if ops is not None:
+            ent = (ops, None, False)
+        else:
+            tree = ast.parse(code, "<macro>", "exec")
+            # Module-level compile first: rejects top-level return/yield exactly as before
+            plain = compile(tree, "<macro>", "exec")
+            co = _compile_wrapped(tree)
+            ent = (None, co, True) if co is not None else (None, plain, False)
+        if len(_CODE_CACHE) >= _CODE_CACHE_MAX:
+            del _CODE_CACHE[next(iter(_CODE_CACHE))]   # oldest first
+        _CODE_CACHE[key] = ent
+    return ent
+
+
 class MacroRunner:
     """Execute generated Python macro code against a device."""
 
-    def __init__(self, client: MirageClient, device_id: str, step_delay: float = 0.3):
-        self.client = client
+    def __init__(self, client: Optional[MirageClient], device_id: str, step_delay: float = 0.3):
+        # None: share the process-wide connection with every other runner
+        self.client = client if client is not None else MirageClient.shared()
         self.device_id = device_id
         self.step_delay = step_delay
-        self.log_lines: list[str] = []
+        # (fmt, args) tuples, formatted only when read; oldest entries drop off
+        self.log_lines: collections.deque = collections.deque(maxlen=_LOG_MAX)
         self._cancelled = False
+        # Set by cancel(); step delays and poll waits block on it instead of
+        # time.sleep so a cancel wakes them immediately
+        self._wake = threading.Event()
+        # Bound once; the proxy calls these on every step / poll
+        self._time_sleep = self._wake.wait
+        self._time_time = time.monotonic
+        self._time_ns = time.monotonic_ns   # integer deadlines for wait loops
 
     def cancel(self):
         self._cancelled = True
+        self._wake.set()
+
+    def _log(self, fmt: str, *args):
+        self.log_lines.append((fmt, args))
+
+    @property
+    def formatted_logs(self) -> list[str]:
+        """log_lines rendered to strings (plain str entries pass through)."""
+        return [e if e.__class__ is str else e[0] % e[1] for e in self.log_lines]
 
     def execute(self, code: str) -> dict:
         self._cancelled = False
-        self.log_lines = []
+        self._wake.clear()
+        self.log_lines.clear()
         device = _DeviceProxy(self)
         namespace = {
             "device": device,
-            "time": __import__("time"),
-            "logging": __import__("logging"),
+            "time": time,
+            "logging": logging,
             "log": _LogProxy(self),
         }
         try:
-            exec(compile(code, "<macro>", "exec"), namespace)
-            return {"status": "ok", "log": self.log_lines, "steps": device.step_count}
+            ops, co, wrapped = _compile_macro(code)
+            if ops is not None:
+                _run_ops(ops, namespace, self)
+            elif wrapped:
+                exec(co, namespace)
+                namespace.pop(_MACRO_FUNC)(*[namespace[a] for a in _MACRO_ARGS])
+            else:
+                exec(co, namespace)
+            return {"status": "ok", "log": self.formatted_logs, "steps": device.step_count}
         except _MacroCancelled:
-            return {"status": "cancelled", "log": self.log_lines, "steps": device.step_count}
+            return {"status": "cancelled", "log": self.formatted_logs, "steps": device.step_count}
         except Exception as e:
-            self.log_lines.append(f"ERROR: {e}")
-            return {"status": "error", "log": self.log_lines, "steps": device.step_count, "error": str(e)}
+            self._log("ERROR: %s", e)
+            return {"status": "error", "log": self.formatted_logs, "steps": device.step_count, "error": str(e)}
 
 
 class _MacroCancelled(Exception):
     pass
 
 
+# Server-side waits are issued in slices so cancel() is honoured between them
+_WAIT_SLICE = 2.0
+
+# Screen reads younger than this are reused (back-to-back text checks on an
+# unchanged screen); kept below the default poll interval, and poll loops
+# with a shorter interval use theirs. Inputs invalidate.
+_SCREEN_TTL = 0.2
+
+_NS = 1_000_000_000   # wait deadlines are monotonic_ns ints
+
+
 class _DeviceProxy:
     """Proxy object injected as `device` into macro namespace."""
 
+    # No per-instance __dict__: attribute reads on the hot step path are slot loads
+    __slots__ = ("_r", "step_count", "_pending", "_dump_cache")
+
     def __init__(self, runner: MacroRunner):
         self._r = runner
         self.step_count = 0
+        self._pending = None   # list of queued (method, params) inside batch()
+        self._dump_cache: dict[tuple, tuple[float, Any]] = {}
 
     def _check(self):
         if self._r._cancelled: raise _MacroCancelled()
 
     def _step(self):
         self.step_count += 1
-        self._check()
-        if self._r.step_delay > 0:
-            __import__("time").sleep(self._r.step_delay)
+        r = self._r
+        if r._cancelled: raise _MacroCancelled()
+        if r.step_delay > 0 and self._pending is None:
+            r._time_sleep(r.step_delay)
+
+    def _cached(self, key: tuple, fetch, ttl: float = _SCREEN_TTL):
+        """fetch() result for key, reused while younger than ttl.
+
+        Poll loops pass min(_SCREEN_TTL, interval) so each poll reads afresh.
+        """
+        ent = self._dump_cache.get(key)
+        if ent is not None and self._r._time_time() - ent[0] < ttl:
+            return ent[1]
+        value = fetch()
+        self._dump_cache[key] = (self._r._time_time(), value)
+        return value
+
+    def _first_text(self, text: str, ttl: float = _SCREEN_TTL) -> Optional[dict]:
+        """First on-screen element containing text (uiautomator, TTL-cached tree)."""
+        dev = self._r.device_id
+        root = self._cached((dev, 'uiautomator'), lambda: dump_ui_root(dev), ttl)
+        return next(iter_root_text_elements(root, text, _CLIENT_FIELDS), None)
+
+    def _op(self, method: str, **params):
+        """Send an input RPC now, or queue it while inside batch()."""
+        self._dump_cache.clear()
+        params["device_id"] = self._r.device_id
+        if self._pending is not None:
+            self._pending.append((method, params))
+            return None
+        return self._r.client._call(method, params)
+
+    def _sync(self):
+        """Flush queued batch ops before anything that reads device state."""
+        if self._pending:
+            ops, self._pending = self._pending, []
+            self._r._log("batch(%s ops)", len(ops))
+            self._r.client.batch(ops)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Queue tap/swipe/key/text/... and send them as one batch RPC on exit.
+
+            with device.batch():
+                device.tap(100, 200)
+                device.key(4)
+        """
+        if self._pending is not None:   # nested: the outer batch flushes
+            yield self
+            return
+        self._pending = []
+        try:
+            yield self
+            self._check()
+            self._sync()
+        finally:
+            self._pending = None
 
     def tap(self, x: int, y: int):
         self._step()
-        self._r.log_lines.append(f"tap({x}, {y})")
-        return self._r.client.tap(self._r.device_id, x, y)
+        self._r._log("tap(%s, %s)", x, y)
+        return self._op("tap", x=x, y=y)
 
     def tap_norm(self, x_norm: float, y_norm: float):
         self._step()
         resolved = self._r.client.resolve_coords(self._r.device_id, x_norm, y_norm, 'preview')
         x = int(resolved.get('x', 0))
         y = int(resolved.get('y', 0))
-        self._r.log_lines.append(f"tap_norm({x_norm:.4f}, {y_norm:.4f}) -> tap({x}, {y})")
-        return self._r.client.tap(self._r.device_id, x, y)
+        self._r._log("tap_norm(%.4f, %.4f) -> tap(%s, %s)", x_norm, y_norm, x, y)
+        return self._op("tap", x=x, y=y)
 
     def swipe(self, x1: int, y1: int, x2: int, y2: int, duration: int = 300):
         self._step()
-        self._r.log_lines.append(f"swipe({x1},{y1}->{x2},{y2}, {duration}ms)")
-        return self._r.client.swipe(self._r.device_id, x1, y1, x2, y2, duration)
+        self._r._log("swipe(%s,%s->%s,%s, %sms)", x1, y1, x2, y2, duration)
+        return self._op("swipe", x1=x1, y1=y1, x2=x2, y2=y2, duration=duration)
 
     def swipe_norm(self, x1_norm: float, y1_norm: float, x2_norm: float, y2_norm: float, duration: int = 300):
         self._step()
@@ -242,156 +675,245 @@ class _DeviceProxy:
         p2 = self._r.client.resolve_coords(self._r.device_id, x2_norm, y2_norm, 'preview')
         x1 = int(p1.get('x', 0)); y1 = int(p1.get('y', 0))
         x2 = int(p2.get('x', 0)); y2 = int(p2.get('y', 0))
-        self._r.log_lines.append(f"swipe_norm({x1_norm:.4f},{y1_norm:.4f}->{x2_norm:.4f},{y2_norm:.4f}) -> swipe({x1},{y1}->{x2},{y2}, {duration}ms)")
-        return self._r.client.swipe(self._r.device_id, x1, y1, x2, y2, duration)
+        self._r._log("swipe_norm(%.4f,%.4f->%.4f,%.4f) -> swipe(%s,%s->%s,%s, %sms)", x1_norm, y1_norm, x2_norm, y2_norm, x1, y1, x2, y2, duration)
+        return self._op("swipe", x1=x1, y1=y1, x2=x2, y2=y2, duration=duration)
 
     def long_press(self, x: int, y: int, duration: int = 1000):
         self._step()
-        self._r.log_lines.append(f"long_press({x}, {y}, {duration}ms)")
-        return self._r.client.long_press(self._r.device_id, x, y, duration)
+        self._r._log("long_press(%s, %s, %sms)", x, y, duration)
+        return self._op("long_press", x=x, y=y, duration=duration)
 
     def long_press_norm(self, x_norm: float, y_norm: float, duration: int = 1000):
         self._step()
         resolved = self._r.client.resolve_coords(self._r.device_id, x_norm, y_norm, 'preview')
         x = int(resolved.get('x', 0))
         y = int(resolved.get('y', 0))
-        self._r.log_lines.append(f"long_press_norm({x_norm:.4f}, {y_norm:.4f}, {duration}ms) -> long_press({x}, {y})")
-        return self._r.client.long_press(self._r.device_id, x, y, duration)
+        self._r._log("long_press_norm(%.4f, %.4f, %sms) -> long_press(%s, %s)", x_norm, y_norm, duration, x, y)
+        return self._op("long_press", x=x, y=y, duration=duration)
 
     def key(self, keycode: int):
         self._step()
-        self._r.log_lines.append(f"key({keycode})")
-        return self._r.client.key(self._r.device_id, keycode)
+        self._r._log("key(%s)", keycode)
+        return self._op("key", keycode=keycode)
 
     def text(self, t: str):
         self._step()
-        self._r.log_lines.append(f"text('{t}')")
-        return self._r.client.text(self._r.device_id, t)
+        self._r._log("text('%s')", t)
+        return self._op("text", text=t)
 
     def launch_app(self, package: str):
         self._step()
-        self._r.log_lines.append(f"launch_app({package})")
-        return self._r.client.launch_app(self._r.device_id, package)
+        self._r._log("launch_app(%s)", package)
+        return self._op("launch_app", package=package)
 
     def force_stop(self, package: str):
         self._step()
-        self._r.log_lines.append(f"force_stop({package})")
-        return self._r.client.force_stop(self._r.device_id, package)
+        self._r._log("force_stop(%s)", package)
+        return self._op("force_stop", package=package)
 
     def screenshot(self, filename: str = "screenshot.png"):
         self._step()
-        self._r.log_lines.append(f"screenshot({filename})")
+        self._sync()
+        self._r._log("screenshot(%s)", filename)
         return self._r.client.screenshot(self._r.device_id)
 
     def screen_contains_text(self, text: str) -> bool:
         """Real implementation via uiautomator dump."""
         self._check()
-        matches = find_text_on_screen(self._r.device_id, text)
-        found = len(matches) > 0
-        self._r.log_lines.append(f"screen_contains_text('{text}') -> {found}")
+        self._sync()
+        found = self._first_text(text) is not None
+        self._r._log("screen_contains_text('%s') -> %s", text, found)
         return found
 
     def find_and_tap_text(self, text: str) -> bool:
         """Find text on screen and tap its center."""
         self._step()
-        matches = find_text_on_screen(self._r.device_id, text)
-        if matches:
-            cx, cy = matches[0]['center_x'], matches[0]['center_y']
-            self._r.log_lines.append(f"find_and_tap_text('{text}') -> tap({cx},{cy})")
-            self._r.client.tap(self._r.device_id, cx, cy)
+        self._sync()
+        m = self._first_text(text)
+        if m:
+            cx, cy = m['center_x'], m['center_y']
+            self._r._log("find_and_tap_text('%s') -> tap(%s,%s)", text, cx, cy)
+            self._op("tap", x=cx, y=cy)
             return True
-        self._r.log_lines.append(f"find_and_tap_text('{text}') -> not found")
+        self._r._log("find_and_tap_text('%s') -> not found", text)
         return False
 
+    def _server_wait(self, method: str, flag: str, query: str,
+                     deadline: int, interval: float) -> Optional[bool]:
+        """Long-poll client.<method> on the server in _WAIT_SLICE slices until deadline.
+
+        None if it cannot (old server: client.<flag> is cleared / unknown device),
+        possibly partway through; the caller's local polling then runs to the
+        same monotonic_ns deadline, not a fresh timeout.
+        """
+        client = self._r.client
+        if not getattr(client, flag, False):
+            return None
+        call = getattr(client, method)
+        now = self._r._time_ns
+        while True:
+            self._check()
+            remaining = max(0, deadline - now()) / _NS
+            try:
+                res = call(self._r.device_id, query, min(remaining, _WAIT_SLICE), interval)
+            except RuntimeError as e:
+                if "unknown method" not in str(e):
+                    raise
+                setattr(client, flag, False)
+                return None
+            if not isinstance(res, dict) or res.get("status") != "ok":
+                return None
+            if res.get("found"):
+                return True
+            if now() >= deadline:
+                return False
+
     def wait_for_text(self, text: str, timeout_sec: int = 10, interval: float = 1.0) -> bool:
-        """Poll screen until text appears."""
+        """Wait until text appears (server long-poll, local polling as fallback)."""
         self._step()
-        deadline = __import__("time").time() + timeout_sec
-        while __import__("time").time() < deadline:
+        self._sync()
+        now, sleep = self._r._time_ns, self._r._time_sleep
+        deadline = now() + int(timeout_sec * _NS)
+        found = self._server_wait("wait_for_text", "_wait_ok", text, deadline, interval)
+        if found:
+            self._r._log("wait_for_text('%s') -> found", text)
+            return True
+        if found is False:
+            self._r._log("wait_for_text('%s', %ss) -> timeout", text, timeout_sec)
+            return False
+        ttl = min(_SCREEN_TTL, interval)
+        while now() < deadline:
             self._check()
-            matches = find_text_on_screen(self._r.device_id, text)
-            if matches:
-                self._r.log_lines.append(f"wait_for_text('{text}') -> found")
+            if self._first_text(text, ttl) is not None:
+                self._r._log("wait_for_text('%s') -> found", text)
                 return True
-            __import__("time").sleep(interval)
-        self._r.log_lines.append(f"wait_for_text('{text}', {timeout_sec}s) -> timeout")
+            # one timeout: the interval, cut short by the deadline or cancel()
+            sleep(min(interval, max(0, deadline - now()) / _NS))
+        self._r._log("wait_for_text('%s', %ss) -> timeout", text, timeout_sec)
         return False
 
     def tap_element(self, resource_id: str) -> bool:
         """Find element by resource-id and tap."""
         self._step()
+        self._sync()
         elem = find_element_by_id(self._r.device_id, resource_id)
         if elem:
             cx, cy = elem['center_x'], elem['center_y']
-            self._r.log_lines.append(f"tap_element('{resource_id}') -> tap({cx},{cy})")
-            self._r.client.tap(self._r.device_id, cx, cy)
+            self._r._log("tap_element('%s') -> tap(%s,%s)", resource_id, cx, cy)
+            self._op("tap", x=cx, y=cy)
             return True
-        # Fallback: try AOA click_id if available
+        # Fallback: try AOA click_id if available. Sent now even inside batch():
+        # whether the element exists decides the return value
         try:
-            self._r.client.click_id(self._r.device_id, resource_id)
-            self._r.log_lines.append(f"tap_element('{resource_id}') -> click_id (AOA)")
+            self._dump_cache.clear()
+            self._r.client._call("click_id", {"device_id": self._r.device_id,
+                                              "resource_id": resource_id})
+            self._r._log("tap_element('%s') -> click_id (AOA)", resource_id)
             return True
         except Exception:
-            self._r.log_lines.append(f"tap_element('{resource_id}') -> not found")
+            self._r._log("tap_element('%s') -> not found", resource_id)
             return False
 
     def screen_record(self, duration: int = 10):
         self._step()
-        self._r.log_lines.append(f"screen_record({duration}s) -> stub")
+        self._sync()
+        self._r._log("screen_record(%ss) -> stub", duration)
 
     # ---- OCR methods (H264 frame-based, no ADB screenshot needed) ----
     def ocr_analyze(self) -> dict:
         """OCR full text extraction from live H264 frame."""
         self._step()
+        self._sync()
         result = self._r.client.ocr_analyze(self._r.device_id)
-        self._r.log_lines.append(f"ocr_analyze() -> {result.get('word_count', 0)} words")
+        self._r._log("ocr_analyze() -> %s words", result.get('word_count', 0))
         return result
 
     def ocr_find_text(self, query: str) -> list:
         """Find text via OCR. Returns list of matches with bounding boxes."""
         self._step()
+        self._sync()
         result = self._r.client.ocr_find_text(self._r.device_id, query)
         matches = result.get('matches', [])
-        self._r.log_lines.append(f"ocr_find_text('{query}') -> {len(matches)} matches")
+        self._r._log("ocr_find_text('%s') -> %s matches", query, len(matches))
         return matches
 
+    def ocr_text_centers(self, query: str) -> list:
+        """Find text via OCR. Returns [(text, center_x, center_y), ...]."""
+        self._step()
+        self._sync()
+        client, dev = self._r.client, self._r.device_id
+        res = None
+        if getattr(client, "_ocr_raw_ok", False):
+            try:
+                res = client.ocr_find_text_raw(dev, query)
+            except RuntimeError as e:
+                if "unknown method" not in str(e):
+                    raise
+                client._ocr_raw_ok = False
+        if res is not None:
+            texts = res.get('texts', [])
+            centers = list(zip(texts, *bbox_centers(res.get('bboxes', b''))))
+        else:
+            centers = [(m.get('text', ''), m.get('center_x'), m.get('center_y'))
+                       for m in client.ocr_find_text(dev, query).get('matches', [])]
+        self._r._log("ocr_text_centers('%s') -> %s matches", query, len(centers))
+        return centers
+
     def ocr_has_text(self, query: str) -> bool:
         """Check if text exists on screen via OCR."""
+        return self._ocr_has_text(query, _SCREEN_TTL)
+
+    def _ocr_has_text(self, query: str, ttl: float) -> bool:
         self._check()
-        result = self._r.client.ocr_has_text(self._r.device_id, query)
+        self._sync()
+        dev = self._r.device_id
+        result = self._cached((dev, 'ocr', query), lambda: self._r.client.ocr_has_text(dev, query), ttl)
         found = result.get('found', False)
-        self._r.log_lines.append(f"ocr_has_text('{query}') -> {found}")
+        self._r._log("ocr_has_text('%s') -> %s", query, found)
         return found
 
     def ocr_tap_text(self, query: str) -> bool:
         """Find text via OCR and tap its center."""
         self._step()
+        self._sync()
+        self._dump_cache.clear()
         result = self._r.client.ocr_tap_text(self._r.device_id, query)
         found = result.get('found', False)
         if found:
-            self._r.log_lines.append(f"ocr_tap_text('{query}') -> tap({result.get('x')},{result.get('y')})")
+            self._r._log("ocr_tap_text('%s') -> tap(%s,%s)", query, result.get('x'), result.get('y'))
         else:
-            self._r.log_lines.append(f"ocr_tap_text('{query}') -> not found")
+            self._r._log("ocr_tap_text('%s') -> not found", query)
         return found
 
     def ocr_wait_for_text(self, query: str, timeout_sec: int = 10, interval: float = 1.0) -> bool:
-        """Poll OCR until text appears on screen."""
+        """Wait until OCR sees text (server ocr_watch, ocr_has_text polling as fallback)."""
         self._step()
-        import time as _time
-        deadline = _time.time() + timeout_sec
-        while _time.time() < deadline:
+        self._sync()
+        now, sleep = self._r._time_ns, self._r._time_sleep
+        deadline = now() + int(timeout_sec * _NS)
+        found = self._server_wait("ocr_watch", "_ocr_watch_ok", query, deadline, interval)
+        if found:
+            self._r._log("ocr_wait_for_text('%s') -> found", query)
+            return True
+        if found is False:
+            self._r._log("ocr_wait_for_text('%s', %ss) -> timeout", query, timeout_sec)
+            return False
+        ttl = min(_SCREEN_TTL, interval)
+        while now() < deadline:
             self._check()
-            if self.ocr_has_text(query):
-                self._r.log_lines.append(f"ocr_wait_for_text('{query}') -> found")
+            if self._ocr_has_text(query, ttl):
+                self._r._log("ocr_wait_for_text('%s') -> found", query)
                 return True
-            _time.sleep(interval)
-        self._r.log_lines.append(f"ocr_wait_for_text('{query}', {timeout_sec}s) -> timeout")
+            sleep(min(interval, max(0, deadline - now()) / _NS))
+        self._r._log("ocr_wait_for_text('%s', %ss) -> timeout", query, timeout_sec)
         return False
 
 
 class _LogProxy:
+    __slots__ = ("_r",)
+
     def __init__(self, runner: MacroRunner):
         self._r = runner
-    def info(self, msg: str): self._r.log_lines.append(f"[LOG] {msg}")
-    def warning(self, msg: str): self._r.log_lines.append(f"[WARN] {msg}")
-    def error(self, msg: str): self._r.log_lines.append(f"[ERROR] {msg}")
+    def info(self, msg: str): self._r._log("[LOG] %s", msg)
+    def warning(self, msg: str): self._r._log("[WARN] %s", msg)
+    def error(self, msg: str): self._r._log("[ERROR] %s", msg)
@@ -0,0 +1,212 @@
+"""ui_dump - uiautomator dump + parse shared by MacroEditorAPI and MacroRunner"""
+import os
+import re
+import subprocess
+import tempfile
+import threading
+
+try:
+    from lxml import etree as _etree
+    HAS_LXML = True
+    _XMLError = _etree.XMLSyntaxError
+except ImportError:
+    import xml.etree.ElementTree as _etree
+    HAS_LXML = False
+    _XMLError = _etree.ParseError
+
+try:
+    import uiautomator2 as _u2
+except ImportError:
+    _u2 = None
+
+_BOUNDS_RE = re.compile(r'\[(\d+),(\d+)\]\[(\d+),(\d+)\]')
+_HIERARCHY_END = b'</hierarchy>'
+
+_BOOL_FIELDS = ('clickable', 'scrollable', 'checkable', 'checked', 'focused', 'enabled')
+ALL_FIELDS = frozenset({'text', 'resource_id', 'content_desc', 'class_name', 'bounds',
+                        'center_x', 'center_y', 'width', 'height', 'label', *_BOOL_FIELDS})
+TEXT_FIELDS = frozenset({'text', 'content_desc', 'center_x', 'center_y', 'resource_id'})
+CLICKABLE_FIELDS = frozenset({'clickable', 'scrollable', 'checkable', 'bounds', 'label',
+                              'center_x', 'center_y'})
+
+# serial -> uiautomator2 device (False = connect failed, don't retry every poll)
+_u2_devices = {}
+_u2_lock = threading.Lock()
+
+
+def parse_bounds(bounds_str):
+    m = _BOUNDS_RE.match(bounds_str or '')
+    return tuple(int(v) for v in m.groups()) if m else None
+
+
+def parse_ui_root(xml_bytes):
+    """Parse uiautomator XML (bytes or str) into an element tree root, None if malformed."""
+    try:
+        return _etree.fromstring(xml_bytes)
+    except (_XMLError, ValueError):
+        return None
+
+
+def nodes_to_elements(nodes, fields=None) -> list:
+    """Build element dicts from <node> elements.
+
+    fields: optional frozenset of keys to emit (center_x/center_y always);
+    None emits every key. Hot paths pass TEXT_FIELDS / CLICKABLE_FIELDS.
+    """
+    elements = []
+    want = ALL_FIELDS if fields is None else fields
+    for node in nodes:
+        bounds = parse_bounds(node.get('bounds', ''))
+        if not bounds:
+            continue
+        x1, y1, x2, y2 = bounds
+        w, h = x2 - x1, y2 - y1
+        if w < 2 or h < 2:
+            continue
+        get = node.get
+        e = {'center_x': (x1 + x2) // 2, 'center_y': (y1 + y2) // 2}
+        if 'text' in want: e['text'] = get('text', '') or ''
+        if 'resource_id' in want: e['resource_id'] = get('resource-id', '') or ''
+        if 'content_desc' in want: e['content_desc'] = get('content-desc', '') or ''
+        if 'class_name' in want: e['class_name'] = (get('class', '') or '').split('.')[-1]
+        if 'bounds' in want: e['bounds'] = {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2}
+        if 'width' in want: e['width'] = w
+        if 'height' in want: e['height'] = h
+        if 'label' in want:
+            resource_id = get('resource-id', '') or ''
+            label = (get('text', '') or get('content-desc', '')
+                     or (resource_id.split('/')[-1] if resource_id else ''))
+            e['label'] = label[:40]
+        for key in _BOOL_FIELDS:
+            if key in want:
+                e[key] = get(key) == 'true'
+        elements.append(e)
+    return elements
+
+
+def parse_ui_elements(xml_bytes, fields=None) -> list:
+    """Parse uiautomator XML (bytes or str) into a list of element dicts."""
+    root = parse_ui_root(xml_bytes)
+    if root is None:
+        return []
+    return nodes_to_elements(root.iter('node'), fields)
+
+
+if HAS_LXML:
+    # Compiled once; predicates run inside libxml2 instead of per-node Python checks
+    _XPATH_CLICKABLE = _etree.XPath(
+        './/node[@clickable="true" or @scrollable="true" or @checkable="true"]')
+    _XPATH_TEXT = _etree.XPath(
+        './/node[contains(translate(@text, $up, $lo), $q)'
+        ' or contains(translate(@content-desc, $up, $lo), $q)]')
+    _ASCII_UP = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    _ASCII_LO = 'abcdefghijklmnopqrstuvwxyz'
+
+
+def select_clickable_nodes(root) -> list:
+    """<node>s that are clickable, scrollable or checkable."""
+    if HAS_LXML:
+        return _XPATH_CLICKABLE(root)
+    return [n for n in root.iter('node')
+            if n.get('clickable') == 'true' or n.get('scrollable') == 'true'
+            or n.get('checkable') == 'true']
+
+
+def select_text_nodes(root, text: str):
+    """<node>s whose text/content-desc contains text (case-insensitive)."""
+    text_lower = text.lower()
+    # XPath translate() only folds ASCII; other scripts keep Python's lower()
+    if HAS_LXML and text.isascii():
+        return _XPATH_TEXT(root, q=text_lower, up=_ASCII_UP, lo=_ASCII_LO)
+    return (n for n in root.iter('node')
+            if text_lower in (n.get('text', '') or '').lower()
+            or text_lower in (n.get('content-desc', '') or '').lower())
+
+
+def _dump_ui_pull(serial: str) -> bytes:
+    """Legacy path: dump to /sdcard, pull, rm (3 adb calls)."""
+    subprocess.run(['adb', '-s', serial, 'shell', 'uiautomator', 'dump', '/sdcard/mirage_ui.xml'],
+                   capture_output=True, timeout=15)
+    tmp = os.path.join(tempfile.gettempdir(), 'mirage_ui.xml')
+    subprocess.run(['adb', '-s', serial, 'pull', '/sdcard/mirage_ui.xml', tmp],
+                   capture_output=True, timeout=10)
+    subprocess.run(['adb', '-s', serial, 'shell', 'rm', '/sdcard/mirage_ui.xml'],
+                   capture_output=True, timeout=5)
+    if not os.path.exists(tmp):
+        return b''
+    with open(tmp, 'rb') as f:
+        return f.read()
+
+
+def _get_u2(serial: str):
+    """Cached uiautomator2 connection for serial, None if unavailable."""
+    if _u2 is None:
+        return None
+    with _u2_lock:
+        d = _u2_devices.get(serial)
+        if d is None:
+            try:
+                d = _u2.connect(serial)
+            except Exception:
+                d = False
+            _u2_devices[serial] = d
+        return d or None
+
+
+def dump_ui_xml(serial: str) -> bytes:
+    """Return raw uiautomator XML for serial, b'' if the dump failed.
+
+    Prefers the persistent uiautomator2 agent (tree served over adb forward,
+    no per-call `uiautomator dump` startup). Without it, streams the dump over
+    `adb exec-out` (1 adb call, no temp file) and falls back to dump/pull/rm
+    on devices where /dev/tty output is not supported.
+    """
+    d = _get_u2(serial)
+    if d is not None:
+        try:
+            return d.dump_hierarchy(compressed=True, pretty=False).encode('utf-8')
+        except Exception:
+            with _u2_lock:
+                _u2_devices.pop(serial, None)
+    r = subprocess.run(['adb', '-s', serial, 'exec-out', 'uiautomator', 'dump', '/dev/tty'],
+                       capture_output=True, timeout=15)
+    out = r.stdout or b''
+    end = out.rfind(_HIERARCHY_END)
+    if end >= 0:
+        start = out.find(b'<?xml')
+        return out[max(start, 0):end + len(_HIERARCHY_END)]
+    return _dump_ui_pull(serial)
+
+
+def dump_ui(serial: str, fields=None) -> list:
+    """Run uiautomator dump and parse elements. Returns list of dicts."""
+    try:
+        return parse_ui_elements(dump_ui_xml(serial), fields)
+    except Exception:
+        return []
+
+
+def dump_ui_root(serial: str):
+    """Dump serial's UI and return the parsed tree root, None on failure."""
+    try:
+        xml_bytes = dump_ui_xml(serial)
+    except Exception:
+        return None
+    return parse_ui_root(xml_bytes) if xml_bytes else None
+
+
+def iter_root_text_elements(root, text: str, fields=TEXT_FIELDS):
+    """Lazily yield dicts for nodes under root containing text.
+
+    The text predicate runs on the tree (XPath under lxml) so non-matching
+    nodes never become dicts; pollers that stop at the first hit build one.
+    """
+    if root is None:
+        return
+    for node in select_text_nodes(root, text):
+        yield from nodes_to_elements((node,), fields)
+
+
+def iter_text_elements(serial: str, text: str, fields=TEXT_FIELDS):
+    """Dump serial's UI and lazily yield dicts for nodes containing text."""
+    yield from iter_root_text_elements(dump_ui_root(serial), text, fields)
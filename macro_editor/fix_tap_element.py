@@ -1,19 +1,27 @@
+import mmap
+import os
 import sys
 sys.stdout.reconfigure(encoding='utf-8')
 
-with open('backend/api.py', 'r', encoding='utf-8') as f:
-    lines = f.readlines()
+SRC = 'backend/api.py'
+ANCHOR = b'def screen_record(self, duration=10):'
 
-# Find "def screen_record" line inside AdbDevice
-insert_idx = None
-for i, line in enumerate(lines):
-    if 'def screen_record(self, duration=10):' in line and i > 200:
-        insert_idx = i
-        break
+with open(SRC, 'rb') as f:
+    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
 
-if insert_idx is None:
+# Find "def screen_record" line inside AdbDevice (line index > 200)
+start = 0
+for _ in range(201):
+    start = mm.find(b'\n', start) + 1
+    if not start:
+        break
+idx = mm.find(ANCHOR, start) if start else -1
+if idx < 0:
+    mm.close()
     print("ERROR: screen_record not found")
     sys.exit(1)
+insert_at = mm.rfind(b'\n', 0, idx) + 1   # start of the anchor line
+insert_idx = 201 + mm[start:insert_at].count(b'\n')
 
 # Build the tap_element method with matching indentation
 patch = [
@@ -32,9 +40,13 @@ patch = [
     "                return False\n",
 ]
 
-lines[insert_idx:insert_idx] = patch
-
-with open('backend/api.py', 'w', encoding='utf-8') as f:
-    f.writelines(lines)
+# Stream head + patch + tail into a temp file, then swap it in atomically
+tmp = SRC + '.tmp'
+with open(tmp, 'wb') as out:
+    out.write(mm[:insert_at])
+    out.write(''.join(patch).encode('utf-8'))
+    out.write(mm[insert_at:])
+mm.close()
+os.replace(tmp, SRC)
 
 print(f"PATCHED: tap_element inserted at line {insert_idx+1}")
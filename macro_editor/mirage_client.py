@@ -27,8 +27,26 @@ import struct
 import base64
 import time
 import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from typing import Optional, Any, Callable
 
+# JSON エンコード/デコード: orjson > ujson > json (いずれも bytes を返す/受ける)
+try:
+    import orjson
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    try:
+        import ujson as _json
+    except ImportError:
+        _json = json
+
+    def _dumps(obj) -> bytes:
+        return _json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    _loads = _json.loads
+
+_U32BE = struct.Struct(">I")   # 長さプレフィックス (書式は一度だけ解析)
+
 
 class MirageClient:
     """MirageGUI MacroApiServer (TCP JSON-RPC) クライアント"""
@@ -38,73 +56,122 @@ class MirageClient:
         self.port = port
         self._sock: Optional[socket.socket] = None
         self._request_id = 0
-        self._lock = threading.Lock()
+        self._lock = threading.Lock()    # id 採番 + 送信 + _pending のみ保護
+        self._pending: dict[int, Future] = {}
+        self._reader: Optional[threading.Thread] = None
+        self._rxbuf = bytearray(65536)   # 受信用 (足りなければ拡張して使い回す)
 
     def connect(self) -> bool:
-        """サーバーに接続"""
+        """サーバーに接続 (応答は受信スレッドが id で振り分け)"""
         if self._sock:
             return True
         try:
-            self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self._sock.settimeout(5.0)
-            self._sock.connect((self.host, self.port))
-            return True
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.settimeout(5.0)
+            # 小さなリクエストを即送信 (Nagle による遅延を回避)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.connect((self.host, self.port))
+            # 受信スレッドは待ち続ける; タイムアウトは各リクエストの Future 側で判定
+            sock.settimeout(None)
         except Exception as e:
-            self._sock = None
             raise ConnectionError(f"MirageGUI connection failed: {e}")
+        self._sock = sock
+        self._reader = threading.Thread(target=self._reader_loop, args=(sock,),
+                                        name="MirageClient-reader", daemon=True)
+        self._reader.start()
+        return True
 
     def disconnect(self):
-        """接続を閉じる"""
-        if self._sock:
+        """接続を閉じる (受信スレッドは recv 失敗で終了し、待機中の要求を失敗させる)"""
+        sock, self._sock = self._sock, None
+        if sock:
             try:
-                self._sock.close()
+                sock.shutdown(socket.SHUT_RDWR)
             except Exception:
                 pass
-            self._sock = None
+            try:
+                sock.close()
+            except Exception:
+                pass
+        if self._reader and self._reader is not threading.current_thread():
+            self._reader.join(timeout=2.0)
+        self._reader = None
 
-    def _send_request(self, method: str, params: dict = None) -> Any:
-        """JSON-RPC リクエスト送信"""
+    def _reader_loop(self, sock: socket.socket):
+        """応答を読み続け、id が一致する Future に渡す"""
+        try:
+            while True:
+                resp_len = _U32BE.unpack(self._recv_exact(sock, 4))[0]
+                response = _loads(self._recv_exact(sock, resp_len))
+                # binary 応答: JSON の直後に生データが続く (result.binary = バイト数)
+                result = response.get("result")
+                if isinstance(result, dict) and isinstance(result.get("binary"), int):
+                    result["data"] = self._recv_exact(sock, result.pop("binary"))
+                with self._lock:
+                    fut = self._pending.pop(response.get("id"), None)
+                if fut is not None:
+                    fut.set_result(response)
+        except Exception as e:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                if self._sock is sock:
+                    self._sock = None
+            for fut in pending.values():
+                fut.set_exception(ConnectionError(f"Connection closed: {e}"))
+
+    def _send_request(self, method: str, params: dict = None, timeout: float = 5.0) -> Any:
+        """JSON-RPC リクエスト送信 (ロックは送信まで; 応答待ちは並行可能)"""
+        fut = Future()
         with self._lock:
             if not self._sock:
                 self.connect()
 
             self._request_id += 1
+            request_id = self._request_id
             request = {
                 "jsonrpc": "2.0",
-                "id": self._request_id,
+                "id": request_id,
                 "method": method,
                 "params": params or {}
             }
 
             # プロトコル: 4バイト長プレフィックス + JSON
-            data = json.dumps(request, ensure_ascii=False).encode("utf-8")
-            header = struct.pack(">I", len(data))
-
-            self._sock.sendall(header + data)
-
-            # レスポンス受信
-            resp_header = self._recv_exact(4)
-            resp_len = struct.unpack(">I", resp_header)[0]
-            resp_data = self._recv_exact(resp_len)
-
-            response = json.loads(resp_data.decode("utf-8"))
-
-            if "error" in response:
-                raise RuntimeError(f"RPC Error: {response['error']}")
+            data = _dumps(request)
+            packet = bytearray(4 + len(data))
+            _U32BE.pack_into(packet, 0, len(data))
+            packet[4:] = data
 
-            return response.get("result")
+            self._pending[request_id] = fut
+            try:
+                self._sock.sendall(packet)
+            except Exception:
+                self._pending.pop(request_id, None)
+                raise
 
-    def _recv_exact(self, n: int) -> bytes:
-        """指定バイト数を確実に受信"""
-        chunks = []
-        remaining = n
-        while remaining > 0:
-            chunk = self._sock.recv(min(remaining, 4096))
-            if not chunk:
+        try:
+            response = fut.result(timeout=timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self._pending.pop(request_id, None)
+            raise TimeoutError(f"RPC timeout: {method}")
+
+        if "error" in response:
+            raise RuntimeError(f"RPC Error: {response['error']}")
+
+        return response.get("result")
+
+    def _recv_exact(self, sock: socket.socket, n: int) -> bytes:
+        """指定バイト数を確実に受信 (再利用バッファへ recv_into; 受信スレッド専用)"""
+        if n > len(self._rxbuf):
+            self._rxbuf = bytearray(n)
+        view = memoryview(self._rxbuf)
+        got = 0
+        while got < n:
+            k = sock.recv_into(view[got:n])
+            if not k:
                 raise ConnectionError("Connection closed")
-            chunks.append(chunk)
-            remaining -= len(chunk)
-        return b"".join(chunks)
+            got += k
+        return bytes(view[:n])
 
     # ============ 接続確認 ============
 
@@ -225,8 +292,10 @@ class MirageClient:
     # ============ スクリーンショット・録画 ============
 
     def screenshot(self, device_index: int) -> bytes:
-        """スクリーンショット取得 (PNG bytes)"""
-        result = self._send_request("screenshot", {"device_index": device_index})
+        """スクリーンショット取得 (PNG bytes; 対応サーバーでは base64 を経由しない)"""
+        result = self._send_request("screenshot", {"device_index": device_index, "binary": True})
+        if isinstance(result, dict) and "data" in result:
+            return result["data"]
         if isinstance(result, str):
             return base64.b64decode(result)
         return result
@@ -275,7 +344,7 @@ class MirageClient:
             "text": text,
             "timeout_sec": timeout_sec,
             "interval_sec": interval_sec
-        })
+        }, timeout=timeout_sec + 5.0)
 
     def tap_element(self, device_index: int, element_id: str = None,
                     element_text: str = None) -> bool:
@@ -1,16 +1,37 @@
 #!/usr/bin/env python3
 """Patch index.html to include OCR JS files."""
-with open('frontend/index.html', 'r', encoding='utf-8') as f:
-    lines = f.readlines()
+import mmap
+import os
 
-new_lines = []
-for line in lines:
-    new_lines.append(line)
-    if 'adb_touch.js' in line:
-        new_lines.append('    <script src="js/blocks/ocr_blocks.js"></script>\n')
-    if 'python_adb.js' in line:
-        new_lines.append('    <script src="js/generators/python_ocr.js"></script>\n')
+SRC = 'frontend/index.html'
+# anchor -> line inserted after every line containing it
+INSERTS = {
+    b'adb_touch.js': b'    <script src="js/blocks/ocr_blocks.js"></script>\n',
+    b'python_adb.js': b'    <script src="js/generators/python_ocr.js"></script>\n',
+}
 
-with open('frontend/index.html', 'w', encoding='utf-8') as f:
-    f.writelines(new_lines)
+with open(SRC, 'rb') as f:
+    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+# (end-of-line offset, order, bytes) for each anchor hit
+points = []
+for order, (anchor, line) in enumerate(INSERTS.items()):
+    pos = mm.find(anchor)
+    while pos >= 0:
+        eol = mm.find(b'\n', pos) + 1 or len(mm)
+        points.append((eol, order, line))
+        pos = mm.find(anchor, eol)
+points.sort()
+
+# Stream the original with the new lines spliced in, then swap atomically
+tmp = SRC + '.tmp'
+with open(tmp, 'wb') as out:
+    prev = 0
+    for eol, _, line in points:
+        out.write(mm[prev:eol])
+        out.write(line)
+        prev = eol
+    out.write(mm[prev:])
+mm.close()
+os.replace(tmp, SRC)
 print("OK")
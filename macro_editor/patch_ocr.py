@@ -1,8 +1,34 @@
 #!/usr/bin/env python3
 """Patch mirage_client.py to add OCR methods."""
+import re
 import sys
 
+
+def scan_markers(content, needles):
+    """First offset of each needle in content, found in one pass ({} entries absent if missing).
+
+    One alternation regex walks the buffer once instead of one `in` /
+    str.replace scan per needle.
+    """
+    pattern = re.compile("|".join(re.escape(n) for n in needles))
+    offsets = {}
+    for m in pattern.finditer(content):
+        offsets.setdefault(m.group(), m.start())
+        if len(offsets) == len(needles):
+            break
+    return offsets
+
+
 filepath = "backend/mirage_client.py"
+# Stamped on the first line by a completed run; later runs only read the head
+PATCHED_MARK = "# PATCHED_OCR_V1\n"
+
+with open(filepath, "rb") as f:
+    head = f.read(64)
+if head.startswith(PATCHED_MARK.encode()):
+    print("OCR methods already patched (header)")
+    sys.exit(0)
+
 with open(filepath, "r", encoding="utf-8") as f:
     content = f.read()
 
@@ -20,18 +46,22 @@ ocr_client_methods = '''
 
     def ocr_tap_text(self, device_id: str, query: str) -> dict:
         return self._call("ocr_tap_text", {"device_id": device_id, "query": query})
+
+    def ocr_watch(self, device_id: str, query: str, timeout_sec: float, interval: float = 1.0) -> dict:
+        """Server-side OCR long-poll: replies once query is seen or timeout_sec elapsed."""
+        with self._lock:
+            if not self._sock:
+                raise ConnectionError("Not connected")
+            self._sock.settimeout(timeout_sec + self.timeout)
+            try:
+                return self._call("ocr_watch", {"device_id": device_id, "query": query,
+                                                "timeout_sec": timeout_sec, "interval_sec": interval})
+            finally:
+                if self._sock:
+                    self._sock.settimeout(self.timeout)
 '''
 
 marker1 = '    def screenshot(self, device_id: str) -> dict: return self._call("screenshot", {"device_id": device_id})\n'
-if "def ocr_analyze(self, device_id" not in content:
-    if marker1 in content:
-        content = content.replace(marker1, marker1 + ocr_client_methods)
-        print("Added OCR methods to MirageClient")
-    else:
-        print("ERROR: Could not find MirageClient.screenshot marker")
-        sys.exit(1)
-else:
-    print("OCR client methods already present")
 
 # ---- 2. Add OCR proxy methods to _DeviceProxy (before screen_record) ----
 ocr_proxy_methods = '''    # ---- OCR (H264 frame analysis, no ADB needed) ----
@@ -71,8 +101,21 @@ ocr_proxy_methods = '''    # ---- OCR (H264 frame analysis, no ADB needed) ----
         return found
 
     def ocr_wait_for_text(self, query: str, timeout_sec: int = 10, interval: float = 1.0) -> bool:
-        """OCR: poll until text appears on screen."""
+        """OCR: wait until text appears (one server-side ocr_watch; polls on older servers)."""
         self._step()
+        try:
+            result = self._r.client.ocr_watch(self._r.device_id, query, timeout_sec, interval)
+        except RuntimeError as e:
+            if "unknown method" not in str(e):
+                raise
+            result = None
+        if result is not None:
+            found = result.get("found", False)
+            if found:
+                self._r.log_lines.append(f"ocr_wait_for_text('{query}') -> found")
+            else:
+                self._r.log_lines.append(f"ocr_wait_for_text('{query}', {timeout_sec}s) -> timeout")
+            return found
         import time as _t
         deadline = _t.time() + timeout_sec
         while _t.time() < deadline:
@@ -88,9 +131,25 @@ ocr_proxy_methods = '''    # ---- OCR (H264 frame analysis, no ADB needed) ----
 '''
 
 marker2 = '    def screen_record(self, duration: int = 10):\n'
-if "def ocr_analyze(self) -> dict:" not in content:
-    if marker2 in content:
-        content = content.replace(marker2, ocr_proxy_methods + marker2)
+sentinel1 = "def ocr_analyze(self, device_id"
+sentinel2 = "def ocr_analyze(self) -> dict:"
+
+found = scan_markers(content, (marker1, marker2, sentinel1, sentinel2))
+parts = []   # (offset, text) insertions, spliced in one join below
+
+if sentinel1 not in found:
+    if marker1 in found:
+        parts.append((found[marker1] + len(marker1), ocr_client_methods))
+        print("Added OCR methods to MirageClient")
+    else:
+        print("ERROR: Could not find MirageClient.screenshot marker")
+        sys.exit(1)
+else:
+    print("OCR client methods already present")
+
+if sentinel2 not in found:
+    if marker2 in found:
+        parts.append((found[marker2], ocr_proxy_methods))
         print("Added OCR proxy methods to _DeviceProxy")
     else:
         print("ERROR: Could not find _DeviceProxy.screen_record marker")
@@ -98,6 +157,13 @@ if "def ocr_analyze(self) -> dict:" not in content:
 else:
     print("OCR proxy methods already present")
 
+pieces, prev = [], 0
+for off, text in sorted(parts):
+    pieces += [content[prev:off], text]
+    prev = off
+pieces.append(content[prev:])
+content = PATCHED_MARK + "".join(pieces)
+
 with open(filepath, "w", encoding="utf-8") as f:
     f.write(content)
 print("DONE")
@@ -1,15 +1,22 @@
-"""Macro Editor comprehensive validation test"""
+"""Macro Editor comprehensive validation test
+
+Usage: python test_validate.py [--fast]
+  --fast  stop at the first failure (exit status 1)
+"""
 import ast
+import mmap
 import sys
 import os
 import re
 import json
+from concurrent.futures import ThreadPoolExecutor
 
 sys.path.insert(0, os.path.dirname(__file__))
 
 errors = []
 warnings = []
 passes = 0
+FAST = '--fast' in sys.argv
 
 def ok(msg):
     global passes
@@ -19,11 +26,77 @@ def ok(msg):
 def fail(msg):
     errors.append(msg)
     print(f"  [FAIL] {msg}")
+    if FAST:
+        sys.exit(1)
 
 def warn(msg):
     warnings.append(msg)
     print(f"  [WARN] {msg}")
 
+_FILE_CACHE = {}
+
+def read(path):
+    """Raw file bytes, read once per run (several sections check the same files).
+
+    Every check is an ASCII substring/regex match (ast.parse takes bytes too),
+    so nothing is decoded to str.
+    """
+    data = _FILE_CACHE.get(path)
+    if data is None:
+        with open(path, 'rb') as fh:
+            data = _FILE_CACHE[path] = fh.read()
+    return data
+
+def read_opt(path):
+    """read(path), or None if the file does not exist (the open is the existence check)."""
+    try:
+        return read(path)
+    except FileNotFoundError:
+        return None
+
+def scan_needles(src, needles):
+    """Subset of (str) needles occurring in the bytes src, from one pass over src.
+
+    The zero-width alternation is tried at every offset (longest needle
+    first); needles that are prefixes of a hit matched at the same offset.
+    """
+    order = sorted(set(needles), key=len, reverse=True)
+    enc = [n.encode('utf-8') for n in order]
+    pattern = re.compile(b'(?=(' + b'|'.join(map(re.escape, enc)) + b'))')
+    hits = {m.group(1) for m in pattern.finditer(src)}
+    return {n for n, e in zip(order, enc) if any(h.startswith(e) for h in hits)}
+
+# Block type extraction (section 8), compiled once
+BLOCK_TYPE_RE = re.compile(rb'"type":\s*"(adb_\w+)"')
+GEN_TYPE_RE = re.compile(rb"python\.forBlock\['(adb_\w+)'\]")
+# C++ handler names (section 13)
+HANDLER_RE = re.compile(rb'\bhandle_\w+\b')
+
+# Expected public surface (sections 3-5)
+EXPECTED_API = frozenset({
+    'get_devices', 'capture_screen', 'run_macro', 'cancel_macro',
+    'save_macro', 'load_macro', 'list_macros', 'ping',
+    'dump_ui', 'find_text', 'get_clickables', 'capture_screen_with_elements'
+})
+EXPECTED_PROXY = frozenset({
+    'tap', 'swipe', 'long_press', 'key', 'text',
+    'launch_app', 'force_stop', 'screenshot',
+    'screen_contains_text', 'find_and_tap_text',
+    'wait_for_text', 'tap_element', 'screen_record'
+})
+EXPECTED_RPC = frozenset({
+    'connect', 'disconnect', 'ping', 'list_devices', 'device_info',
+    'tap', 'swipe', 'long_press', 'key', 'text',
+    'click_id', 'click_text', 'launch_app', 'force_stop', 'screenshot'
+})
+
+def check_surface(expected, have, label):
+    """PASS each expected name present in have, FAIL each missing one."""
+    for m in sorted(expected & have):
+        ok(f"{label}.{m}()")
+    for m in sorted(expected - have):
+        fail(f"{label}.{m}() MISSING")
+
 
 # ================================================================
 print("=" * 60)
@@ -32,10 +105,9 @@ print("=" * 60)
 
 # 1. Python Syntax
 print("\n--- 1. Python Syntax ---")
-for f in ['app.py', 'backend/api.py', 'backend/mirage_client.py']:
+for f in ['app.py', 'backend/api.py', 'backend/mirage_client.py', 'backend/ui_dump.py']:
     try:
-        with open(f, encoding='utf-8') as fh:
-            ast.parse(fh.read())
+        ast.parse(read(f))
         ok(f)
     except SyntaxError as e:
         fail(f"{f}: {e}")
@@ -62,59 +134,31 @@ except Exception as e:
 # 3. API method completeness
 print("\n--- 3. MacroEditorAPI Methods ---")
 api = MacroEditorAPI()
-expected_api = [
-    'get_devices', 'capture_screen', 'run_macro', 'cancel_macro',
-    'save_macro', 'load_macro', 'list_macros', 'ping',
-    'dump_ui', 'find_text', 'get_clickables', 'capture_screen_with_elements'
-]
-pub = [m for m in dir(api) if not m.startswith('_')]
-for m in expected_api:
-    if m in pub:
-        ok(f"api.{m}()")
-    else:
-        fail(f"api.{m}() MISSING")
+pub = {m for m in dir(api) if not m.startswith('_')}
+check_surface(EXPECTED_API, pub, 'api')
 
 # 4. DeviceProxy completeness
 print("\n--- 4. _DeviceProxy Methods ---")
-expected_proxy = [
-    'tap', 'swipe', 'long_press', 'key', 'text',
-    'launch_app', 'force_stop', 'screenshot',
-    'screen_contains_text', 'find_and_tap_text',
-    'wait_for_text', 'tap_element', 'screen_record'
-]
-prx = [m for m in dir(_DeviceProxy) if not m.startswith('_')]
-for m in expected_proxy:
-    if m in prx:
-        ok(f"device.{m}()")
-    else:
-        fail(f"device.{m}() MISSING")
+prx = {m for m in dir(_DeviceProxy) if not m.startswith('_')}
+check_surface(EXPECTED_PROXY, prx, 'device')
 
 # 5. MirageClient RPC methods
 print("\n--- 5. MirageClient RPC ---")
-expected_rpc = [
-    'connect', 'disconnect', 'ping', 'list_devices', 'device_info',
-    'tap', 'swipe', 'long_press', 'key', 'text',
-    'click_id', 'click_text', 'launch_app', 'force_stop', 'screenshot'
-]
-cli = dir(MirageClient)
-for m in expected_rpc:
-    if m in cli:
-        ok(f"client.{m}()")
-    else:
-        fail(f"client.{m}() MISSING")
+cli = set(dir(MirageClient))
+check_surface(EXPECTED_RPC, cli, 'client')
 
 # 6. ADB fallback methods
 print("\n--- 6. ADB Fallback (_run_macro_adb) ---")
-with open('backend/api.py', encoding='utf-8') as f:
-    api_src = f.read()
+api_src = read('backend/api.py')
 adb_expected = [
     'def tap(', 'def swipe(', 'def long_press(', 'def key(', 'def text(',
     'def launch_app(', 'def force_stop(', 'def screenshot(',
     'def screen_contains_text(', 'def find_and_tap_text(',
     'def wait_for_text(', 'def screen_record('
 ]
+api_found = scan_needles(api_src, adb_expected)
 for sig in adb_expected:
-    if sig in api_src:
+    if sig in api_found:
         ok(f"AdbDevice.{sig.split('(')[0].replace('def ','')}")
     else:
         fail(f"AdbDevice.{sig} MISSING in api.py")
@@ -128,54 +172,59 @@ js_files = {
     'frontend/js/workspace.js': None,
     'frontend/index.html': None,
 }
-for f in js_files:
-    if os.path.exists(f):
-        with open(f, encoding='utf-8') as fh:
-            js_files[f] = fh.read()
+# Independent reads overlap in a small pool; reporting stays in order
+with ThreadPoolExecutor(max_workers=4) as ex:
+    js_files = dict(zip(js_files, ex.map(read_opt, js_files)))
+for f, data in js_files.items():
+    if data is not None:
         ok(f"File exists: {f}")
     else:
         fail(f"File missing: {f}")
 
 # 8. Block definitions vs generators
 print("\n--- 8. Block-Generator Consistency ---")
-blocks_src = js_files.get('frontend/js/blocks/adb_touch.js', '')
-gen_src = js_files.get('frontend/js/generators/python_adb.js', '')
-toolbox_src = js_files.get('frontend/js/toolbox.js', '')
+blocks_src = js_files.get('frontend/js/blocks/adb_touch.js') or b''
+gen_src = js_files.get('frontend/js/generators/python_adb.js') or b''
+toolbox_src = js_files.get('frontend/js/toolbox.js') or b''
+
+def _names(matches):
+    return [m.decode('ascii') for m in matches]
 
 # Extract block types from definitions
-block_types = re.findall(r'"type":\s*"(adb_\w+)"', blocks_src)
+block_types = _names(BLOCK_TYPE_RE.findall(blocks_src))
 block_types = list(dict.fromkeys(block_types))  # dedupe preserving order
 
 # Extract generator registrations
-gen_types = re.findall(r"python\.forBlock\['(adb_\w+)'\]", gen_src)
+gen_types = _names(GEN_TYPE_RE.findall(gen_src))
 
 # Extract toolbox entries
-toolbox_types = re.findall(r'"type":\s*"(adb_\w+)"', toolbox_src)
+toolbox_types = _names(BLOCK_TYPE_RE.findall(toolbox_src))
 
 print(f"  Blocks defined: {len(block_types)}")
 print(f"  Generators: {len(gen_types)}")
 print(f"  Toolbox entries: {len(toolbox_types)}")
 
+gen_set, toolbox_set, block_set = set(gen_types), set(toolbox_types), set(block_types)
 for bt in block_types:
-    if bt in gen_types:
+    if bt in gen_set:
         ok(f"Block {bt} has generator")
     else:
         fail(f"Block {bt} MISSING generator")
 
 for bt in block_types:
-    if bt in toolbox_types:
+    if bt in toolbox_set:
         ok(f"Block {bt} in toolbox")
     else:
         fail(f"Block {bt} MISSING from toolbox")
 
 # Check for generators without block definitions
 for gt in gen_types:
-    if gt not in block_types:
+    if gt not in block_set:
         warn(f"Generator {gt} has no block definition")
 
 # 9. workspace.js function checks
 print("\n--- 9. Workspace Functions ---")
-ws_src = js_files.get('frontend/js/workspace.js', '')
+ws_src = js_files.get('frontend/js/workspace.js') or b''
 expected_funcs = [
     'refreshDevices', 'runMacro', 'stopMacro', 'saveMacro', 'loadMacro',
     'exportCode', 'registerContextMenu', 'executeBlockLive',
@@ -184,48 +233,39 @@ expected_funcs = [
     'startRecording', 'stopRecording', 'showScreenPicker',
     'openPickerModal', 'handlePickerClick', 'createContainerFromRecording'
 ]
+# 'async function X' contains 'function X'
+ws_found = scan_needles(ws_src, [f'function {fn}' for fn in expected_funcs])
 for fn in expected_funcs:
-    if f'function {fn}' in ws_src or f'async function {fn}' in ws_src:
+    if f'function {fn}' in ws_found:
         ok(f"workspace.{fn}()")
     else:
         fail(f"workspace.{fn}() MISSING")
 
 # 10. HTML integrity
 print("\n--- 10. HTML Integrity ---")
-html_src = js_files.get('frontend/index.html', '')
+html_src = js_files.get('frontend/index.html') or b''
 required_elements = [
     'id="blocklyDiv"', 'id="device-select"', 'id="code-output"',
     'id="toolbar-buttons"', 'id="btn-run"',
     'adb_touch.js', 'python_adb.js', 'toolbox.js', 'workspace.js',
     'blockly.min.js'
 ]
+html_found = scan_needles(html_src, required_elements)
 for elem in required_elements:
-    if elem in html_src:
+    if elem in html_found:
         ok(f"HTML: {elem}")
     else:
         fail(f"HTML: {elem} MISSING")
 
 # 11. Cross-reference: Blockly block types used in workspace.js
 print("\n--- 11. Cross-References ---")
-if 'adb_container' in ws_src:
-    ok("workspace references adb_container for recording")
-else:
-    fail("workspace missing adb_container reference")
-
-if 'adb_tap' in ws_src:
-    ok("workspace references adb_tap for recording")
-else:
-    fail("workspace missing adb_tap reference")
-
-if 'adb_swipe' in ws_src:
-    ok("workspace references adb_swipe for recording")
-else:
-    fail("workspace missing adb_swipe reference")
-
-if 'adb_long_press' in ws_src:
-    ok("workspace references adb_long_press for recording")
-else:
-    fail("workspace missing adb_long_press reference")
+expected_elements = ['adb_container', 'adb_tap', 'adb_swipe', 'adb_long_press']
+ws_refs = scan_needles(ws_src, expected_elements)
+for elem in expected_elements:
+    if elem in ws_refs:
+        ok(f"workspace references {elem} for recording")
+    else:
+        fail(f"workspace missing {elem} reference")
 
 # 12. _parse_bounds validation
 print("\n--- 12. Utility Functions ---")
@@ -245,27 +285,113 @@ ok("_parse_bounds(None) -> None")
 print("\n--- 13. C++ MacroApiServer ---")
 cpp_hpp = '../src/macro_api_server.hpp'
 cpp_cpp = '../src/macro_api_server.cpp'
+cpp_size = {}   # one stat per file: existence and size together
 for f in [cpp_hpp, cpp_cpp]:
-    if os.path.exists(f):
-        with open(f, encoding='utf-8') as fh:
-            content = fh.read()
-        ok(f"C++ file: {os.path.basename(f)} ({len(content)} bytes)")
-    else:
+    try:
+        cpp_size[f] = os.stat(f).st_size
+        ok(f"C++ file: {os.path.basename(f)} ({cpp_size[f]} bytes)")
+    except FileNotFoundError:
         warn(f"C++ file not found: {f} (may be in different path)")
 
 # Check C++ server has required handlers
-if os.path.exists(cpp_cpp):
-    with open(cpp_cpp, encoding='utf-8') as fh:
-        cpp_src = fh.read()
+if cpp_cpp in cpp_size:
     cpp_handlers = ['handle_tap', 'handle_swipe', 'handle_long_press', 'handle_key',
                     'handle_text', 'handle_screenshot', 'handle_launch_app',
                     'handle_force_stop', 'handle_click_id', 'handle_click_text']
+    # Scan the mapped bytes: no UTF-8 decode or in-memory copy of the source
+    with open(cpp_cpp, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        cpp_found = {h.decode('ascii') for h in HANDLER_RE.findall(mm)}
     for h in cpp_handlers:
-        if h in cpp_src:
+        if h in cpp_found:
             ok(f"C++ handler: {h}")
         else:
             fail(f"C++ handler: {h} MISSING")
 
+# 14. Shared client: a server-side wait leaves room for other callers
+print("\n--- 14. Shared Client Concurrency ---")
+import socket
+import threading
+import time
+from backend.mirage_client import _NS, _WAIT_SLICE
+
+
+def _fake_conn(conn):
+    # Long-polls are held for their full timeout_sec, as a server with
+    # nothing on screen would; everything else answers at once
+    with conn, conn.makefile('rb') as rf:
+        for line in rf:
+            req = json.loads(line)
+            params = req.get('params', {})
+            if req['method'] == 'wait_for_text':
+                time.sleep(params['timeout_sec'])
+                result = {'status': 'ok', 'found': False}
+            else:
+                result = {'status': 'ok'}
+            conn.sendall(json.dumps({'id': req['id'], 'result': result}).encode() + b'\n')
+
+
+def _fake_server(srv):
+    # One thread per connection, like MacroApiServer
+    while True:
+        try:
+            conn, _ = srv.accept()
+        except OSError:
+            return
+        threading.Thread(target=_fake_conn, args=(conn,), daemon=True).start()
+
+
+srv = socket.create_server(('127.0.0.1', 0))
+threading.Thread(target=_fake_server, args=(srv,), daemon=True).start()
+shared = MirageClient('127.0.0.1', srv.getsockname()[1], timeout=5.0)
+shared.connect()
+waiter = _DeviceProxy(MacroRunner(shared, 'dev', step_delay=0))
+wait_deadline = time.monotonic_ns() + int(1.5 * _NS)
+wait_thread = threading.Thread(
+    target=waiter._server_wait,
+    args=('wait_for_text', '_wait_ok', 'never', wait_deadline, 0.1), daemon=True)
+wait_thread.start()
+time.sleep(0.05)   # the first slice is in flight
+t0 = time.monotonic()
+shared._call('tap', {'device_id': 'dev', 'x': 1, 'y': 1})
+tap_s = time.monotonic() - t0
+# Queued behind the wait, the tap would take most of the slice
+if tap_s < 0.25:
+    ok(f"_call during a server wait: {tap_s:.2f}s (slice {_WAIT_SLICE}s)")
+else:
+    fail(f"_call during a server wait took {tap_s:.2f}s (slice {_WAIT_SLICE}s)")
+wait_thread.join()
+shared.disconnect()
+srv.close()
+
+# 15. Poll loops shorter than the screen cache TTL
+print("\n--- 15. Poll Interval vs Screen Cache ---")
+from backend.mirage_client import _SCREEN_TTL
+
+
+class _OcrCountingClient:
+    """No ocr_watch on the server; ocr_has_text finds the text on its 3rd call."""
+    _ocr_watch_ok = False
+
+    def __init__(self):
+        self.calls = 0
+
+    def ocr_has_text(self, device_id, query):
+        self.calls += 1
+        return {'found': self.calls >= 3}
+
+
+ocr_client = _OcrCountingClient()
+poller = _DeviceProxy(MacroRunner(ocr_client, 'dev', step_delay=0))
+poll_interval = _SCREEN_TTL / 4
+t0 = time.monotonic()
+found = poller.ocr_wait_for_text('x', timeout_sec=2, interval=poll_interval)
+poll_s = time.monotonic() - t0
+# A cached miss reused for the whole TTL would push the 3rd read past it
+if found and poll_s < _SCREEN_TTL:
+    ok(f"ocr_wait_for_text(interval={poll_interval}s): found after {ocr_client.calls} reads, {poll_s:.2f}s")
+else:
+    fail(f"ocr_wait_for_text(interval={poll_interval}s): found={found} after {poll_s:.2f}s")
+
 
 # ================================================================
 print("\n" + "=" * 60)
@@ -1,40 +1,14 @@
-path = r'C:\MirageWork\MirageVulkan\android\capture\src\main\AndroidManifest.xml'
-with open(path, 'rb') as f:
-    raw = f.read()
-
-# Detect line endings
-crlf = b'\r\n' in raw
-sep = b'\r\n' if crlf else b'\n'
-text = raw.decode('utf-8')
+from patch_session import PatchSession
 
-changes = []
+path = r'C:\MirageWork\MirageVulkan\android\capture\src\main\AndroidManifest.xml'
 
 # 1. Add RECEIVE_BOOT_COMPLETED permission after REQUEST_IGNORE_BATTERY_OPTIMIZATIONS
 PERM_ANCHOR = 'android.permission.REQUEST_IGNORE_BATTERY_OPTIMIZATIONS" />'
 BOOT_PERM = '    <uses-permission android:name="android.permission.RECEIVE_BOOT_COMPLETED" />'
-if 'RECEIVE_BOOT_COMPLETED' not in text:
-    text = text.replace(PERM_ANCHOR, PERM_ANCHOR + '\n' + BOOT_PERM, 1)
-    changes.append('Added RECEIVE_BOOT_COMPLETED')
-else:
-    changes.append('RECEIVE_BOOT_COMPLETED already present')
 
 # 2. WatchdogService: add foregroundServiceType
 OLD_WDG = '        <service\n            android:name=".svc.WatchdogService"\n            android:exported="false" />'
 NEW_WDG = '        <service\n            android:name=".svc.WatchdogService"\n            android:exported="false"\n            android:foregroundServiceType="shortService" />'
-if OLD_WDG in text:
-    text = text.replace(OLD_WDG, NEW_WDG, 1)
-    changes.append('WatchdogService shortService added')
-elif 'foregroundServiceType' in text and 'WatchdogService' in text:
-    changes.append('WatchdogService type already set')
-else:
-    # Try CRLF variant
-    OLD_WDG_CR = OLD_WDG.replace('\n', '\r\n')
-    NEW_WDG_CR = NEW_WDG.replace('\n', '\r\n')
-    if OLD_WDG_CR in text:
-        text = text.replace(OLD_WDG_CR, NEW_WDG_CR, 1)
-        changes.append('WatchdogService shortService added (CRLF)')
-    else:
-        changes.append('WARNING: WatchdogService entry not matched, skipping')
 
 # 3. Add CaptureBootReceiver before </application>
 BOOT_RECV = '''
@@ -50,22 +24,68 @@ BOOT_RECV = '''
         </receiver>
 
     </application>'''
-if 'CaptureBootReceiver' not in text:
-    text = text.replace('    </application>', BOOT_RECV, 1)
-    changes.append('CaptureBootReceiver added')
-else:
-    changes.append('CaptureBootReceiver already present')
-
-with open(path, 'wb') as f:
-    f.write(text.encode('utf-8'))
-
-print('SAVED')
-for c in changes:
-    print(' ', c)
-
-# Verify
-with open(path, 'rb') as f:
-    check = f.read().decode('utf-8')
-print('VERIFY BOOT_PERM:', 'RECEIVE_BOOT_COMPLETED' in check)
-print('VERIFY BootReceiver:', 'CaptureBootReceiver' in check)
-print('VERIFY shortService:', 'shortService' in check)
+
+PERM_ANCHOR_B = PERM_ANCHOR.encode('utf-8')
+BOOT_PERM_B = (PERM_ANCHOR + '\n' + BOOT_PERM).encode('utf-8')
+# WatchdogService anchor per line ending; apply() picks one up front from
+# the manifest's first line
+WDG_B = {
+    nl: (OLD_WDG.replace('\n', nl).encode('utf-8'), NEW_WDG.replace('\n', nl).encode('utf-8'))
+    for nl in ('\n', '\r\n')
+}
+APP_END_B = b'    </application>'
+BOOT_RECV_B = BOOT_RECV.encode('utf-8')
+
+
+PATCH_ID = 'patch2_boot_receiver_manifest'
+
+
+def apply(session):
+    if session.is_applied(PATCH_ID, path):
+        print('  SKIP: manifest already patched')
+        return
+    # None of the edits below add the markers the later checks look for,
+    # so one snapshot of the original text serves every check
+    text = session.get(path)
+    changes = []
+    warned = False
+
+    if b'RECEIVE_BOOT_COMPLETED' not in text:
+        session.edit(path, PERM_ANCHOR_B, BOOT_PERM_B)
+        changes.append('Added RECEIVE_BOOT_COMPLETED')
+    else:
+        changes.append('RECEIVE_BOOT_COMPLETED already present')
+
+    crlf = session.newline(path) == b'\r\n'
+    old_wdg, new_wdg = WDG_B['\r\n' if crlf else '\n']
+    if session.edit(path, old_wdg, new_wdg):
+        changes.append('WatchdogService shortService added' + (' (CRLF)' if crlf else ''))
+    elif b'foregroundServiceType' in text and b'WatchdogService' in text:
+        changes.append('WatchdogService type already set')
+    else:
+        changes.append('WARNING: WatchdogService entry not matched, skipping')
+        warned = True
+
+    if b'CaptureBootReceiver' not in text:
+        session.edit(path, APP_END_B, BOOT_RECV_B)
+        changes.append('CaptureBootReceiver added')
+    else:
+        changes.append('CaptureBootReceiver already present')
+
+    if not warned:
+        session.mark_applied(PATCH_ID, path)
+    for c in changes:
+        print(' ', c)
+
+
+if __name__ == '__main__':
+    session = PatchSession()
+    apply(session)
+    session.flush()
+    print('SAVED')
+
+    # Verify against the flushed bytes still held by the session
+    check = session.get(path)
+    print('VERIFY BOOT_PERM:', b'RECEIVE_BOOT_COMPLETED' in check)
+    print('VERIFY BootReceiver:', b'CaptureBootReceiver' in check)
+    print('VERIFY shortService:', b'shortService' in check)
@@ -1,16 +1,31 @@
+from patch_session import PatchSession
+
 path = r'C:\MirageWork\MirageVulkan\android\settings.gradle.kts'
-with open(path, 'rb') as f:
-    text = f.read().decode('utf-8')
 
 OLD = 'rootProject.name = "MirageAndroid"\r\ninclude(":app")         // Legacy unified app (deprecated)\r\ninclude(":capture")     // MirageCapture - screen capture + video sending\r\ninclude(":accessory")   // MirageAccessory - AOA + command receiving'
 
 NEW = 'rootProject.name = "MirageAndroid"\r\n// :app (Legacy unified monolith) excluded 2026-02-24. Replaced by :capture + :accessory.\r\n// Sources remain in android/app/ for reference. Do NOT re-include without discussion.\r\ninclude(":capture")     // MirageCapture - screen capture + video sending\r\ninclude(":accessory")   // MirageAccessory - AOA + command receiving'
 
-if OLD in text:
-    text = text.replace(OLD, NEW, 1)
-    with open(path, 'wb') as f:
-        f.write(text.encode('utf-8'))
-    print('OK: :app excluded from settings.gradle.kts')
-    with open(path,'rb') as f: print(f.read().decode('utf-8'))
-else:
-    print('ERROR: not found')
+OLD_B = OLD.encode('utf-8')
+NEW_B = NEW.encode('utf-8')
+
+
+PATCH_ID = 'patch3_exclude_app_module'
+
+
+def apply(session):
+    if session.is_applied(PATCH_ID, path):
+        print('SKIP: :app already excluded')
+        return
+    if session.edit(path, OLD_B, NEW_B):
+        session.mark_applied(PATCH_ID, path)
+        print('OK: :app excluded from settings.gradle.kts')
+    else:
+        print('ERROR: not found')
+
+
+if __name__ == '__main__':
+    session = PatchSession()
+    apply(session)
+    if session.flush():
+        print(session.get(path).decode('utf-8'))
@@ -1,11 +1,9 @@
 #!/usr/bin/env python3
 """Fix: trigger scrcpy launch on connect failures, not just no-data"""
+from patch_session import PatchSession
 
 filepath = r'C:\MirageWork\MirageVulkan\src\tcp_video_receiver.cpp'
 
-with open(filepath, 'r', encoding='utf-8-sig') as f:
-    content = f.read()
-
 # The connect failure path currently only increases backoff.
 # We need to also count connect failures and trigger scrcpy after N failures.
 
@@ -38,11 +36,22 @@ new_connect_fail = '''        if (connect(sock, (struct sockaddr*)&addr, sizeof(
             continue;
         }'''
 
-assert old_connect_fail in content, "connect failure block not found!"
-content = content.replace(old_connect_fail, new_connect_fail)
-print("FIX applied: scrcpy auto-launch on connect failure")
 
-with open(filepath, 'w', encoding='utf-8-sig') as f:
-    f.write(content)
+PATCH_ID = 'connect_fix_scrcpy_on_connect_failure'
+
+
+def apply(session):
+    if session.is_applied(PATCH_ID, filepath):
+        print("SKIP: connect failure fix already applied")
+        return
+    patched = session.edit(filepath, old_connect_fail, new_connect_fail)
+    assert patched, "connect failure block not found!"
+    session.mark_applied(PATCH_ID, filepath)
+    print("FIX applied: scrcpy auto-launch on connect failure")
+
 
-print("Written to", filepath)
+if __name__ == '__main__':
+    session = PatchSession()
+    apply(session)
+    if session.flush():
+        print("Written to", filepath)
@@ -1,11 +1,9 @@
 #!/usr/bin/env python3
 """Patch gui_threads.cpp: Add deferred TCP receiver startup after device discovery"""
+from patch_session import PatchSession
 
 filepath = r'C:\MirageWork\MirageVulkan\src\gui\gui_threads.cpp'
 
-with open(filepath, 'r', encoding='utf-8-sig') as f:
-    content = f.read()
-
 # Find the early_registration_done = true block and add TCP receiver startup after it
 old_block = '''            early_registration_done = true;
         }
@@ -36,10 +34,21 @@ new_block = '''            early_registration_done = true;
 
         auto now = std::chrono::steady_clock::now();'''
 
-assert old_block in content, "Target block not found in gui_threads.cpp!"
-content = content.replace(old_block, new_block)
 
-with open(filepath, 'w', encoding='utf-8-sig') as f:
-    f.write(content)
+PATCH_ID = 'deferred_tcp_receiver_startup'
+
+
+def apply(session):
+    if session.is_applied(PATCH_ID, filepath):
+        print("SKIP: deferred TCP receiver startup already applied")
+        return
+    patched = session.edit(filepath, old_block, new_block)
+    assert patched, "Target block not found in gui_threads.cpp!"
+    session.mark_applied(PATCH_ID, filepath)
+    print("Patch applied: deferred TCP receiver startup after device discovery")
+
 
-print("Patch applied: deferred TCP receiver startup after device discovery")
+if __name__ == '__main__':
+    session = PatchSession()
+    apply(session)
+    session.flush()
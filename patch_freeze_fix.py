@@ -1,11 +1,9 @@
 #!/usr/bin/env python3
 """Patch MirageVulkan gui_application.cpp to fix GUI freeze issues"""
+from patch_session import PatchSession
 
 filepath = r'C:\MirageWork\MirageVulkan\src\gui_application.cpp'
 
-with open(filepath, 'r', encoding='utf-8-sig') as f:
-    content = f.read()
-
 # === FIX 1: vulkanBeginFrame - fence timeout + resizing guard ===
 old_begin = '''void GuiApplication::vulkanBeginFrame() {
     frame_valid_ = false;
@@ -68,9 +66,6 @@ new_begin = '''void GuiApplication::vulkanBeginFrame() {
         return;
     }'''
 
-assert old_begin in content, "FIX1: old beginFrame block not found!"
-content = content.replace(old_begin, new_begin)
-print("FIX 1 applied: fence timeout + resizing guard in vulkanBeginFrame")
 
 # === FIX 2: vulkanEndFrame - frame_valid guard + submit error handling ===
 old_end = '''void GuiApplication::vulkanEndFrame() {
@@ -191,11 +186,25 @@ new_end = '''void GuiApplication::vulkanEndFrame() {
     vk_current_frame_ = (vk_current_frame_ + 1) % VK_MAX_FRAMES_IN_FLIGHT;
 }'''
 
-assert old_end in content, "FIX2: old endFrame block not found!"
-content = content.replace(old_end, new_end)
-print("FIX 2 applied: frame_valid guard + submit error handling in vulkanEndFrame")
 
-with open(filepath, 'w', encoding='utf-8-sig') as f:
-    f.write(content)
+PATCH_ID = 'freeze_fix_vulkan_frame_guards'
+
+
+def apply(session):
+    if session.is_applied(PATCH_ID, filepath):
+        print("SKIP: GUI freeze fixes already applied")
+        return
+    session.apply_edits(filepath, [
+        ("FIX1 beginFrame", old_begin, new_begin),
+        ("FIX2 endFrame", old_end, new_end),
+    ])
+    print("FIX 1 applied: fence timeout + resizing guard in vulkanBeginFrame")
+    print("FIX 2 applied: frame_valid guard + submit error handling in vulkanEndFrame")
+    session.mark_applied(PATCH_ID, filepath)
+
 
-print("\nAll fixes written to", filepath)
+if __name__ == '__main__':
+    session = PatchSession()
+    apply(session)
+    if session.flush():
+        print("\nAll fixes written to", filepath)
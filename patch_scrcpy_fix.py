@@ -1,11 +1,9 @@
 #!/usr/bin/env python3
 """Patch auto_setup.hpp to fix multi-device scrcpy startup issues"""
+from patch_session import PatchSession
 
 filepath = r'C:\MirageWork\MirageVulkan\src\auto_setup.hpp'
 
-with open(filepath, 'r', encoding='utf-8-sig') as f:
-    content = f.read()
-
 # === FIX 1: Remove global pkill that kills other devices' scrcpy ===
 # Also increase wait time and bridge retry timeout
 
@@ -42,8 +40,9 @@ old_start = '''        // 1. Push scrcpy-server (idempotent, fast if already the
         // 5. Wait for server to start, then launch TCP->UDP bridge
         std::this_thread::sleep_for(std::chrono::milliseconds(2000));'''
 
-new_start = '''        // 1. Push scrcpy-server (idempotent, fast if already there)
-        adb_executor_("push tools/scrcpy-server-v3.3.4 /data/local/tmp/scrcpy-server.jar");
+new_start = '''        // 1. Push scrcpy-server (idempotent; --sync skips the transfer when the
+        //    device already has this jar)
+        adb_executor_("push --sync tools/scrcpy-server-v3.3.4 /data/local/tmp/scrcpy-server.jar");
 
         // 2. Kill ONLY our own scrcpy (by scid), NOT all scrcpy processes!
         // Using pkill -f scrcpy would kill other devices' scrcpy too.
@@ -74,15 +73,28 @@ new_start = '''        // 1. Push scrcpy-server (idempotent, fast if already the
         });
         server_thread_.detach();
 
-        // 5. Wait for server to start (WiFi ADB is slower than USB)
-        std::this_thread::sleep_for(std::chrono::milliseconds(3000));'''
+        // 5. No fixed startup wait: the bridge's connect loop probes for
+        // readiness (scrcpy is usually up in 0.3-0.8s, WiFi ADB takes longer)'''
 
-assert old_start in content, "FIX1: old start_screen_capture block not found!"
-content = content.replace(old_start, new_start)
-print("FIX 1 applied: removed global pkill, increased startup wait")
 
 # === FIX 2: Increase bridge retry count and add better logging ===
-old_bridge_retry = '''        // Retry connect
+old_bridge_retry = '''        // Connect TCP to scrcpy-server
+        SOCKET tcp_sock = socket(AF_INET, SOCK_STREAM, IPPROTO_TCP);
+        if (tcp_sock == INVALID_SOCKET) {
+            MLOG_ERROR("adb", "Failed to create TCP socket");
+            return;
+        }
+
+        // TCP_NODELAY for low latency
+        int nodelay = 1;
+        setsockopt(tcp_sock, IPPROTO_TCP, TCP_NODELAY, (char*)&nodelay, sizeof(nodelay));
+
+        sockaddr_in server_addr{};
+        server_addr.sin_family = AF_INET;
+        server_addr.sin_port = htons(static_cast<u_short>(tcp_port_));
+        inet_pton(AF_INET, "127.0.0.1", &server_addr.sin_addr);
+
+        // Retry connect
         bool connected = false;
         for (int i = 0; i < 20 && bridge_running_; i++) {
             if (connect(tcp_sock, (sockaddr*)&server_addr, sizeof(server_addr)) == 0) {
@@ -101,57 +113,106 @@ old_bridge_retry = '''        // Retry connect
         MLOG_INFO("adb", "Bridge: TCP connected to scrcpy on port %d", tcp_port_);
         bridge_connected_ = true;'''
 
-new_bridge_retry = '''        // Retry connect with extended timeout for WiFi ADB (scrcpy startup is slow)
-        bool connected = false;
-        for (int i = 0; i < 50 && bridge_running_; i++) {
-            if (connect(tcp_sock, (sockaddr*)&server_addr, sizeof(server_addr)) == 0) {
-                connected = true;
+new_bridge_retry = '''        sockaddr_in server_addr{};
+        server_addr.sin_family = AF_INET;
+        server_addr.sin_port = htons(static_cast<u_short>(tcp_port_));
+        inet_pton(AF_INET, "127.0.0.1", &server_addr.sin_addr);
+
+        // One non-blocking connect attempt, capped at 200ms by WSAPoll instead
+        // of the OS SYN retry (a refused loopback connect blocks ~2s on
+        // Windows). A socket whose connect failed can't be reused on Winsock,
+        // so every attempt gets a fresh one.
+        auto try_connect = [&server_addr]() -> SOCKET {
+            SOCKET s = socket(AF_INET, SOCK_STREAM, IPPROTO_TCP);
+            if (s == INVALID_SOCKET) return s;
+            u_long nb = 1;
+            ioctlsocket(s, FIONBIO, &nb);
+            bool ok = connect(s, (sockaddr*)&server_addr, sizeof(server_addr)) == 0;
+            if (!ok && WSAGetLastError() == WSAEWOULDBLOCK) {
+                WSAPOLLFD pfd{};
+                pfd.fd = s;
+                pfd.events = POLLWRNORM;
+                if (WSAPoll(&pfd, 1, 200) == 1 && (pfd.revents & POLLWRNORM)) {
+                    int err = 0;
+                    int len = sizeof(err);
+                    ok = getsockopt(s, SOL_SOCKET, SO_ERROR, (char*)&err, &len) == 0 && err == 0;
+                }
+            }
+            if (!ok) {
+                closesocket(s);
+                return INVALID_SOCKET;
+            }
+            nb = 0;
+            ioctlsocket(s, FIONBIO, &nb);  // back to blocking for recv()
+            return s;
+        };
+
+        // Probe until scrcpy accepts: backoff 50ms doubling to 500ms, 15s budget
+        // for WiFi ADB (scrcpy startup is slow there); the first success ends it
+        SOCKET tcp_sock = INVALID_SOCKET;
+        int attempts = 0;
+        const auto deadline = std::chrono::steady_clock::now() + std::chrono::seconds(15);
+        auto delay = std::chrono::milliseconds(50);
+        while (bridge_running_ && std::chrono::steady_clock::now() < deadline) {
+            ++attempts;
+            tcp_sock = try_connect();
+            if (tcp_sock != INVALID_SOCKET) {
                 break;
             }
-            if (i % 10 == 9) {
-                MLOG_INFO("adb", "Bridge: TCP connect retry %d/50 (port %d)", i+1, tcp_port_);
+            if (attempts % 10 == 0) {
+                MLOG_INFO("adb", "Bridge: TCP connect retry %d (port %d)", attempts, tcp_port_);
             }
-            std::this_thread::sleep_for(std::chrono::milliseconds(200));
+            std::this_thread::sleep_for(delay);
+            delay = (std::min)(delay * 2, std::chrono::milliseconds(500));
         }
 
-        if (!connected) {
-            MLOG_ERROR("adb", "Bridge: TCP connect failed after 50 retries (10s) on port %d", tcp_port_);
-            closesocket(tcp_sock);
+        if (tcp_sock == INVALID_SOCKET) {
+            MLOG_ERROR("adb", "Bridge: TCP connect failed after %d attempts (15s) on port %d", attempts, tcp_port_);
             return;
         }
 
+        // TCP_NODELAY for low latency
+        int nodelay = 1;
+        setsockopt(tcp_sock, IPPROTO_TCP, TCP_NODELAY, (char*)&nodelay, sizeof(nodelay));
+
         // Read and skip scrcpy device metadata header (device name + codec info)
-        // scrcpy sends a header before the raw H.264 stream
+        // scrcpy sends a header before the raw H.264 stream: 64-byte device
+        // name, then 12 bytes of codec id / width / height. One recv for both.
         {
-            char dummy_name[64] = {};
-            int hdr_n = recv(tcp_sock, dummy_name, 64, MSG_WAITALL);
-            if (hdr_n == 64) {
-                // Read 12-byte codec/size header
-                char codec_hdr[12] = {};
-                int codec_n = recv(tcp_sock, codec_hdr, 12, MSG_WAITALL);
-                if (codec_n == 12) {
-                    // Extract width/height from bytes 8-11 (big-endian uint16 each)
-                    int w = (static_cast<uint8_t>(codec_hdr[8]) << 8) | static_cast<uint8_t>(codec_hdr[9]);
-                    int h = (static_cast<uint8_t>(codec_hdr[10]) << 8) | static_cast<uint8_t>(codec_hdr[11]);
-                    MLOG_INFO("adb", "Bridge: scrcpy header: device='%.64s' codec=%02x%02x%02x%02x size=%dx%d",
-                             dummy_name,
-                             (uint8_t)codec_hdr[0], (uint8_t)codec_hdr[1],
-                             (uint8_t)codec_hdr[2], (uint8_t)codec_hdr[3],
-                             w, h);
-                } else {
-                    MLOG_WARN("adb", "Bridge: short codec header read: %d/12", codec_n);
-                }
+            char hdr[76] = {};
+            int hdr_n = recv(tcp_sock, hdr, sizeof(hdr), MSG_WAITALL);
+            if (hdr_n == 76) {
+                // Codec id (bytes 64-67) and width/height (72-75) are big-endian;
+                // memcpy + ntohl/ntohs compiles to one load + bswap per field
+                uint32_t codec_be;
+                uint16_t w_be, h_be;
+                std::memcpy(&codec_be, hdr + 64, 4);
+                std::memcpy(&w_be, hdr + 72, 2);
+                std::memcpy(&h_be, hdr + 74, 2);
+                MLOG_INFO("adb", "Bridge: scrcpy header: device='%.64s' codec=%08x size=%dx%d",
+                         hdr, static_cast<unsigned>(ntohl(codec_be)),
+                         static_cast<int>(ntohs(w_be)), static_cast<int>(ntohs(h_be)));
             } else {
-                MLOG_WARN("adb", "Bridge: short device name read: %d/64", hdr_n);
+                MLOG_WARN("adb", "Bridge: short scrcpy header read: %d/76", hdr_n);
             }
         }
 
         MLOG_INFO("adb", "Bridge: TCP connected to scrcpy on port %d (header consumed)", tcp_port_);
-        bridge_connected_ = true;'''
+        bridge_connected_ = true;
+        { std::lock_guard<std::mutex> lk(bridge_mtx_); }  // no lost wakeup vs. wait_for's predicate
+        bridge_cv_.notify_all();'''
+
+
+# std::memcpy in the header parse above, mutex/condition_variable for FIX 3
+old_includes = '''#include <string>
+'''
+
+new_includes = '''#include <condition_variable>
+#include <cstring>
+#include <mutex>
+#include <string>
+'''
 
-assert old_bridge_retry in content, "FIX2: old bridge retry block not found!"
-content = content.replace(old_bridge_retry, new_bridge_retry)
-print("FIX 2 applied: extended retry, added scrcpy header consumption")
 
 # === FIX 3: complete_and_verify - longer wait for WiFi ===
 old_verify = '''    SetupStepResult complete_and_verify() {
@@ -168,20 +229,49 @@ old_verify = '''    SetupStepResult complete_and_verify() {
 
 new_verify = '''    SetupStepResult complete_and_verify() {
         SetupStepResult result;
-        if (!bridge_connected_) {
-            // Wait longer for WiFi ADB (bridge connects async, scrcpy startup is slow)
-            for (int i = 0; i < 20 && !bridge_connected_; i++) {
-                std::this_thread::sleep_for(std::chrono::milliseconds(500));
-            }
+        {
+            // Wait longer for WiFi ADB (bridge connects async, scrcpy startup is slow);
+            // bridge_loop() signals bridge_cv_ the moment it connects
+            std::unique_lock<std::mutex> lk(bridge_mtx_);
+            bridge_cv_.wait_for(lk, std::chrono::seconds(10),
+                                [this] { return bridge_connected_.load(); });
         }
         result.status = bridge_connected_ ? SetupStatus::COMPLETED : SetupStatus::FAILED;
         result.message = bridge_connected_ ? "" : "Bridge not connected after 10s";'''
 
-assert old_verify in content, "FIX3: old complete_and_verify block not found!"
-content = content.replace(old_verify, new_verify)
-print("FIX 3 applied: extended verify wait for WiFi ADB")
 
-with open(filepath, 'w', encoding='utf-8-sig') as f:
-    f.write(content)
+# complete_and_verify() waits on this instead of polling bridge_connected_
+old_members = '''    std::atomic<bool> bridge_connected_{false};
+'''
+
+new_members = '''    std::atomic<bool> bridge_connected_{false};
+    std::mutex bridge_mtx_;               // pairs with bridge_cv_ for complete_and_verify()
+    std::condition_variable bridge_cv_;
+'''
+
+
+PATCH_ID = 'scrcpy_fix_multi_device_startup'
+
+
+def apply(session):
+    if session.is_applied(PATCH_ID, filepath):
+        print("SKIP: scrcpy startup fixes already applied")
+        return
+    session.apply_edits(filepath, [
+        ("FIX1 start_screen_capture", old_start, new_start),
+        ("FIX2 bridge retry", old_bridge_retry, new_bridge_retry),
+        ("FIX3 complete_and_verify", old_verify, new_verify),
+        ("#include <string>", old_includes, new_includes),
+        ("bridge_connected_ member", old_members, new_members),
+    ])
+    print("FIX 1 applied: removed global pkill, increased startup wait")
+    print("FIX 2 applied: extended retry, added scrcpy header consumption")
+    print("FIX 3 applied: extended verify wait for WiFi ADB")
+    session.mark_applied(PATCH_ID, filepath)
+
 
-print("\nAll fixes written to", filepath)
+if __name__ == '__main__':
+    session = PatchSession()
+    apply(session)
+    if session.flush():
+        print("\nAll fixes written to", filepath)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""PatchSession: shared in-memory file cache for the patch*.py scripts.
+
+Each target file is read once, edited in memory by every patch that touches
+it, and written once by flush() - instead of one read/replace/write round
+trip per patch script. Patch IDs recorded in patches_cache let repeat runs
+skip a patch on a stat() alone.
+"""
+import difflib
+import threading
+
+import patches_cache
+
+
+class PatchSession:
+    def __init__(self):
+        # path -> [content bytes, dirty]
+        self.cache = {}
+        self._applied = None   # patches_cache contents, loaded on first use
+        self._ids = {}         # path -> patch IDs valid for the content in memory
+        self._marked = set()   # paths whose IDs flush() must record
+        self._encoders = {}    # path -> str-to-bytes encoder for its line ending
+        self._load_lock = threading.Lock()   # apply_patches runs files in parallel
+
+    def _ids_for(self, path):
+        ids = self._ids.get(path)
+        if ids is None:
+            # Under the lock: a hash-confirmed entry is re-recorded and saved
+            with self._load_lock:
+                if self._applied is None:
+                    self._applied = patches_cache.load_cache()
+                ids = self._ids[path] = patches_cache.applied_ids(path, self._applied)
+        return ids
+
+    def is_applied(self, pid, path):
+        """True if patch pid is recorded for path and the file is unchanged since."""
+        return pid in self._ids_for(path)
+
+    def mark_applied(self, pid, path):
+        """Record pid for path; persisted by flush() once the file is written."""
+        self._ids_for(path).add(pid)
+        self._marked.add(path)
+
+    def get(self, path):
+        """Raw file bytes, read on first use.
+
+        Files stay bytes end to end: no UTF-8 decode/encode round trip, and a
+        leading BOM is carried through untouched.
+        """
+        entry = self.cache.get(path)
+        if entry is None:
+            with open(path, 'rb') as f:
+                entry = self.cache[path] = [f.read(), False]
+        return entry[0]
+
+    def newline(self, path):
+        """The file's line ending, b'\\r\\n' or b'\\n', judged from its first line."""
+        content = self.get(path)
+        eol = content.find(b'\n')
+        return b'\r\n' if eol > 0 and content[eol - 1] == 0x0D else b'\n'
+
+    def _encode(self, path, text):
+        """str -> bytes for path: UTF-8, '\\n' turned into the file's line ending."""
+        enc = self._encoders.get(path)
+        if enc is None:
+            if self.newline(path) == b'\n':
+                enc = lambda s: s.encode('utf-8')
+            else:
+                enc = lambda s: s.replace('\n', '\r\n').encode('utf-8')
+            self._encoders[path] = enc
+        return enc(text)
+
+    def edit(self, path, old, new):
+        """Replace the first occurrence of old with new; False if old is absent.
+
+        One find() locates the anchor and the splice reuses that offset, so the
+        buffer is not scanned a second time by replace(). old/new may be str
+        (LF-separated source text, encoded for the file) or bytes (as is).
+        """
+        if isinstance(old, str):
+            old, new = self._encode(path, old), self._encode(path, new)
+        content = self.get(path)
+        off = content.find(old)
+        if off < 0:
+            return False
+        entry = self.cache[path]
+        entry[0] = content[:off] + new + content[off + len(old):]
+        entry[1] = True
+        return True
+
+    def edit_all(self, path, pairs):
+        """Apply several (old, new) edits in one splice; per-pair found flags.
+
+        Every old is located in the current content, then the untouched spans
+        and the replacements are joined once - one copy of the file instead of
+        one per edit. Edits must not overlap (ValueError); pairs whose old is
+        absent are skipped. Pairs are str or bytes, as for edit().
+        """
+        content = self.get(path)
+        hits = []
+        found = []
+        for old, new in pairs:
+            if isinstance(old, str):
+                old, new = self._encode(path, old), self._encode(path, new)
+            off = content.find(old)
+            found.append(off >= 0)
+            if off >= 0:
+                hits.append((off, off + len(old), new))
+        self._splice(path, content, hits)
+        return found
+
+    def apply_edits(self, path, edits):
+        """Apply (tag, old, new) edits all or nothing, in one splice.
+
+        Every anchor is located first. If any is missing the content is left
+        as it was and one ValueError names every missing tag, each with the
+        closest line in the file - a stale script reports all its broken
+        anchors in one run instead of one per rerun.
+        """
+        content = self.get(path)
+        hits = []
+        missing = []
+        for tag, old, new in edits:
+            if isinstance(old, str):
+                old, new = self._encode(path, old), self._encode(path, new)
+            off = content.find(old)
+            if off < 0:
+                missing.append((tag, old))
+            else:
+                hits.append((off, off + len(old), new))
+        if missing:
+            lines = [l.strip() for l in content.decode('utf-8', 'replace').splitlines()]
+            report = []
+            for tag, old in missing:
+                first = next((l.strip() for l in old.decode('utf-8', 'replace').splitlines()
+                              if l.strip()), '')[:60]
+                near = difflib.get_close_matches(first, [l[:60] for l in lines if l], n=1)
+                report.append(f'  {tag}: not found' + (f' (closest line: {near[0]!r})' if near else ''))
+            raise ValueError(f'{path}: {len(missing)} of {len(edits)} edits not found\n'
+                             + '\n'.join(report))
+        self._splice(path, content, hits)
+
+    def _splice(self, path, content, hits):
+        """Join content with each (start, end, new) hit replaced; one copy."""
+        if not hits:
+            return
+        hits.sort(key=lambda h: h[0])
+        pieces, prev = [], 0
+        for start, end, new in hits:
+            if start < prev:
+                raise ValueError(f'overlapping edits in {path} at offset {start}')
+            pieces += [content[prev:start], new]
+            prev = end
+        pieces.append(content[prev:])
+        entry = self.cache[path]
+        entry[0] = b''.join(pieces)
+        entry[1] = True
+
+    def flush(self):
+        """Write every edited file once; returns the written paths."""
+        written = []
+        for path, entry in self.cache.items():
+            content, dirty = entry
+            if not dirty:
+                continue
+            with open(path, 'wb') as f:
+                f.write(content)
+            entry[1] = False
+            written.append(path)
+        # After the writes: the recorded stat must be the post-write one
+        if self._marked:
+            for path in self._marked:
+                entry = self.cache.get(path)
+                patches_cache.mark_applied(self._ids[path], path, self._applied,
+                                           entry[0] if entry else None)
+            patches_cache.save_cache(self._applied)
+            self._marked.clear()
+        return written
@@ -1,12 +1,9 @@
 #!/usr/bin/env python3
 """Fix tcp_video_receiver.cpp: connect failures trigger scrcpy auto-launch"""
-import sys
+from patch_session import PatchSession
 
 filepath = r'C:\MirageWork\MirageVulkan\src\tcp_video_receiver.cpp'
 
-with open(filepath, 'r', encoding='utf-8-sig') as f:
-    content = f.read()
-
 # Key change: in the connect() failure block, increment fail counter + trigger scrcpy
 # Original has: connect fail -> backoff -> continue (no_data_count never incremented)
 # Fix: connect fail -> fail_count++ -> if fail_count>=2 launch scrcpy
@@ -110,12 +107,6 @@ new_block = '''    int reconnect_delay_ms = RECONNECT_INIT_MS;
             continue;
         }'''
 
-if old_block not in content:
-    print("ERROR: old block not found!")
-    sys.exit(1)
-
-content = content.replace(old_block, new_block)
-print("FIX 1: connect failures now count toward scrcpy trigger")
 
 # Also fix the no_data section at the bottom of the loop
 old_nodata = '''            if (!got_data) {
@@ -148,14 +139,25 @@ new_nodata = '''            if (!got_data) {
                 MLOG_INFO("tcpvideo", "Reconnecting %s in %dms...", hardware_id.c_str(), reconnect_delay_ms);
             }'''
 
-if old_nodata not in content:
-    print("ERROR: old no_data block not found!")
-    sys.exit(1)
 
-content = content.replace(old_nodata, new_nodata)
-print("FIX 2: unified fail_count replaces no_data_count")
+PATCH_ID = 'tcp_fix_connect_failure_count'
+
+
+def apply(session):
+    if session.is_applied(PATCH_ID, filepath):
+        print("SKIP: connect failure count fixes already applied")
+        return
+    session.apply_edits(filepath, [
+        ("FIX1 connect failure block", old_block, new_block),
+        ("FIX2 no_data block", old_nodata, new_nodata),
+    ])
+    print("FIX 1: connect failures now count toward scrcpy trigger")
+    print("FIX 2: unified fail_count replaces no_data_count")
+    session.mark_applied(PATCH_ID, filepath)
 
-with open(filepath, 'w', encoding='utf-8-sig') as f:
-    f.write(content)
 
-print("All fixes written to", filepath)
+if __name__ == '__main__':
+    session = PatchSession()
+    apply(session)
+    if session.flush():
+        print("All fixes written to", filepath)
@@ -4,12 +4,10 @@ Patch tcp_video_receiver.cpp to:
 1. Auto-detect VID0 vs raw H.264 streams
 2. Auto-launch scrcpy-server when APK is not responding
 """
+from patch_session import PatchSession
 
 filepath = r'C:\MirageWork\MirageVulkan\src\tcp_video_receiver.cpp'
 
-with open(filepath, 'r', encoding='utf-8-sig') as f:
-    content = f.read()
-
 # ============================================================
 # PATCH 1: Add scrcpy launcher + raw H.264 parser method
 # ============================================================
@@ -22,35 +20,145 @@ new_methods_and_tail = r'''
 // scrcpy-server auto-launch (fallback when APK not running)
 // =============================================================================
 
+namespace {
+// "adb -s <serial> forward <local> <remote>" as one request to the adb server
+// on 127.0.0.1:5037 instead of an adb.exe spawn (~40-80ms on Windows). Host
+// protocol: 4 hex digit length + "host-serial:<serial>:forward:<local>;<remote>",
+// answered by OKAY OKAY (transport, then forward) or FAIL + 4 hex digit length
+// + message. Returns false with error empty if the server couldn't be asked,
+// with the server's message if it refused.
+bool adbHostForward(const std::string& serial, const std::string& local,
+                    const std::string& remote, std::string& error) {
+    error.clear();
+    SOCKET s = socket(AF_INET, SOCK_STREAM, IPPROTO_TCP);
+    if (s == INVALID_SOCKET) return false;
+#ifdef _WIN32
+    DWORD tv = 2000;
+    setsockopt(s, SOL_SOCKET, SO_RCVTIMEO, (const char*)&tv, sizeof(tv));
+#else
+    struct timeval tv; tv.tv_sec = 2; tv.tv_usec = 0;
+    setsockopt(s, SOL_SOCKET, SO_RCVTIMEO, &tv, sizeof(tv));
+#endif
+    struct sockaddr_in addr{};
+    addr.sin_family = AF_INET;
+    addr.sin_port = htons(5037);
+    inet_pton(AF_INET, "127.0.0.1", &addr.sin_addr);
+    if (connect(s, (struct sockaddr*)&addr, sizeof(addr)) != 0) {
+        closesocket(s);
+        return false;
+    }
+
+    std::string req = "host-serial:" + serial + ":forward:" + local + ";" + remote;
+    char len_hex[5];
+    snprintf(len_hex, sizeof(len_hex), "%04x", static_cast<unsigned>(req.size()));
+    req.insert(0, len_hex);
+    auto recv_all = [s](char* buf, int n) {
+        for (int got = 0; got < n; ) {
+            int r = recv(s, buf + got, n - got, 0);
+            if (r <= 0) return false;
+            got += r;
+        }
+        return true;
+    };
+
+    bool ok = false;
+    if (send(s, req.data(), static_cast<int>(req.size()), 0) == static_cast<int>(req.size())) {
+        char status[4] = {};
+        ok = recv_all(status, 4) && memcmp(status, "OKAY", 4) == 0 &&
+             recv_all(status, 4) && memcmp(status, "OKAY", 4) == 0;
+        char msg_len[5] = {};
+        if (!ok && memcmp(status, "FAIL", 4) == 0 && recv_all(msg_len, 4)) {
+            error.resize(static_cast<size_t>(strtol(msg_len, nullptr, 16)));
+            if (error.empty() || !recv_all(&error[0], static_cast<int>(error.size()))) {
+                error = "adb server refused forward";
+            }
+        }
+    }
+    closesocket(s);
+    return ok;
+}
+} // anonymous namespace
+
 bool TcpVideoReceiver::launchScrcpyServer(const std::string& serial, int local_port) {
-    // Generate unique SCID for this session
-    uint32_t scid = static_cast<uint32_t>(std::chrono::steady_clock::now().time_since_epoch().count() & 0x7FFFFFFF) | 0x20000000;
+    // A server launched for this serial:port in the last 30s is still starting
+    // or already serving: re-point the forward at its scid instead of pushing
+    // the jar and starting a second one. No connect probe to check it - the
+    // first connection to a tunnel_forward server becomes its video socket.
+    static std::mutex launch_mutex;
+    static std::map<std::string, std::pair<std::chrono::steady_clock::time_point, uint32_t>> last_launch;
+    static std::set<std::string> pushed_serials;   // jar already pushed this session
+    const std::string launch_key = serial + ":" + std::to_string(local_port);
+    const auto launch_time = std::chrono::steady_clock::now();
+    uint32_t scid = 0;
+    bool reuse = false;
+    bool pushed = false;
+    {
+        std::lock_guard<std::mutex> lock(launch_mutex);
+        auto it = last_launch.find(launch_key);
+        if (it != last_launch.end() && launch_time - it->second.first < std::chrono::seconds(30)) {
+            scid = it->second.second;
+            reuse = true;
+        }
+        pushed = pushed_serials.count(serial) != 0;
+    }
+    if (!reuse) {
+        // Unique SCID for this session from a seeded RNG: a clock tick would
+        // hand two devices launched back to back the same scrcpy_<scid> socket
+        static thread_local std::mt19937 rng{std::random_device{}()};
+        scid = (static_cast<uint32_t>(rng()) & 0x0FFFFFFF) | 0x20000000;
+    }
+
     char scid_str[16];
     snprintf(scid_str, sizeof(scid_str), "%08x", scid);
 
-    MLOG_INFO("tcpvideo", "[scrcpy] Launching for %s (scid=%s)", serial.c_str(), scid_str);
-
-    // Kill any existing scrcpy process on device
-    std::string kill_cmd = "adb -s " + serial + " shell pkill -f scrcpy 2>&1";
-    execCommandHidden(kill_cmd);
+    if (reuse) {
+        MLOG_INFO("tcpvideo", "[scrcpy] Server for %s launched <30s ago, refreshing forward only (scid=%s)",
+                  serial.c_str(), scid_str);
+    } else {
+        MLOG_INFO("tcpvideo", "[scrcpy] Launching for %s (scid=%s)", serial.c_str(), scid_str);
+    }
 
-    // Remove old forward
-    std::string rm_fwd = "adb -s " + serial + " forward --remove tcp:" + std::to_string(local_port) + " 2>&1";
-    execCommandHidden(rm_fwd);
+    // Two adb.exe spawns at most (push, server start) and the forward through
+    // the adb server socket: no global pkill (it would kill other devices'
+    // scrcpy, and each scid is fresh anyway) and no forward --remove (a new
+    // forward on the same local port replaces the old one).
+    // execCommandHidden runs adb directly via CreateProcessA on Windows, with
+    // stderr already on the pipe and no shell to interpret a redirect.
+#ifdef _WIN32
+    const std::string err_to_out;
+#else
+    const std::string err_to_out = " 2>&1";
+#endif
 
-    // Push scrcpy-server jar (idempotent)
-    std::string push_cmd = "adb -s " + serial + " push tools\\scrcpy-server-v3.3.4 /data/local/tmp/scrcpy-server.jar 2>&1";
-    std::string push_result = execCommandHidden(push_cmd);
-    MLOG_INFO("tcpvideo", "[scrcpy] push: %s", push_result.c_str());
+    // Push scrcpy-server jar once per device per session; --sync skips the
+    // transfer when the device copy is already current (e.g. from a previous run)
+    if (!reuse && !pushed) {
+        std::string push_cmd = "adb -s " + serial + " push --sync tools\\scrcpy-server-v3.3.4 /data/local/tmp/scrcpy-server.jar" + err_to_out;
+        std::string push_result = execCommandHidden(push_cmd);
+        MLOG_INFO("tcpvideo", "[scrcpy] push: %s", push_result.c_str());
+        if (!adbReportedError(push_result)) {
+            std::lock_guard<std::mutex> lock(launch_mutex);
+            pushed_serials.insert(serial);
+        }
+    }
 
     // Setup forward to scrcpy abstract socket
     std::string abstract_name = std::string("localabstract:scrcpy_") + scid_str;
-    std::string fwd_cmd = "adb -s " + serial + " forward tcp:" + std::to_string(local_port) + " " + abstract_name + " 2>&1";
-    std::string fwd_result = execCommandHidden(fwd_cmd);
-    if (fwd_result.find("error") != std::string::npos) {
+    std::string fwd_result;
+    bool fwd_ok = adbHostForward(serial, "tcp:" + std::to_string(local_port), abstract_name, fwd_result);
+    if (!fwd_ok && fwd_result.empty()) {
+        // adb server not reachable: adb.exe starts it and sets the forward
+        std::string fwd_cmd = "adb -s " + serial + " forward tcp:" + std::to_string(local_port) + " " + abstract_name + err_to_out;
+        fwd_result = execCommandHidden(fwd_cmd);
+        fwd_ok = !adbReportedError(fwd_result);
+    }
+    if (!fwd_ok) {
         MLOG_ERROR("tcpvideo", "[scrcpy] forward failed: %s", fwd_result.c_str());
         return false;
     }
+    if (reuse) {
+        return true;
+    }
 
     // Start scrcpy-server in background (fire-and-forget via shell)
     std::string start_cmd = "adb -s " + serial + " shell "
@@ -82,9 +190,14 @@ bool TcpVideoReceiver::launchScrcpyServer(const std::string& serial, int local_p
     system(bg_cmd.c_str());
 #endif
 
-    // Wait for server to initialize
-    std::this_thread::sleep_for(std::chrono::milliseconds(3000));
-    MLOG_INFO("tcpvideo", "[scrcpy] Ready, forward tcp:%d -> %s", local_port, abstract_name.c_str());
+    {
+        std::lock_guard<std::mutex> lock(launch_mutex);
+        last_launch[launch_key] = {launch_time, scid};
+    }
+
+    // No fixed wait for the server: the caller's reconnect loop is the
+    // readiness probe, and its first successful read ends it
+    MLOG_INFO("tcpvideo", "[scrcpy] Launched, forward tcp:%d -> %s", local_port, abstract_name.c_str());
     return true;
 }
 
@@ -93,7 +206,7 @@ bool TcpVideoReceiver::launchScrcpyServer(const std::string& serial, int local_p
 // =============================================================================
 
 void TcpVideoReceiver::parseRawH264Stream(const std::string& hardware_id,
-                                            std::vector<uint8_t>& buffer) {
+                                            const uint8_t* data, size_t len) {
     MirrorReceiver* decoder = nullptr;
     {
         std::lock_guard<std::mutex> lock(devices_mutex_);
@@ -104,17 +217,22 @@ void TcpVideoReceiver::parseRawH264Stream(const std::string& hardware_id,
 
     // Feed raw H.264 Annex B data directly to decoder's process_raw_h264
     // The MirrorReceiver will handle NAL unit splitting internally
-    if (!buffer.empty()) {
-        decoder->process_raw_h264(buffer.data(), buffer.size());
-        buffer.clear();
+    if (len > 0) {
+        decoder->process_raw_h264(data, len);
     }
 }
 
 } // namespace gui'''
 
-assert old_tail in content, "PATCH1: tail not found!"
-content = content.replace(old_tail, new_methods_and_tail, 1)  # Replace only last occurrence
-print("PATCH 1 applied: Added scrcpy launcher + raw H.264 parser")
+
+# std::mt19937 for the scid and std::set for the pushed serials in launchScrcpyServer
+old_includes = '''#include <chrono>
+'''
+
+new_includes = '''#include <chrono>
+#include <random>
+#include <set>
+'''
 
 
 # ============================================================
@@ -154,21 +272,24 @@ old_recv_loop = '''        bool got_data = false;
 new_recv_loop = '''        bool got_data = false;
         bool is_raw_h264 = false;  // auto-detected on first data
         bool format_detected = false;
-        std::vector<uint8_t> stream_buffer;
-        std::vector<uint8_t> recv_buf(TCP_RECV_BUF_SIZE);
+        // recv() writes straight behind the unparsed bytes - no staging copy.
+        // The VID0 parser leaves at most one partial packet and raw H.264 is
+        // consumed whole, so there is always room for a full recv.
+        std::vector<uint8_t> stream_buffer(TCP_RECV_BUF_SIZE + mirage::video::VID0_HEADER_SIZE + mirage::video::RTP_MAX_LEN);
+        size_t fill = 0;
 
         while (running_.load()) {
-            int received = recv(sock, reinterpret_cast<char*>(recv_buf.data()),
-                               static_cast<int>(recv_buf.size()), 0);
+            int received = recv(sock, reinterpret_cast<char*>(stream_buffer.data() + fill),
+                               static_cast<int>(stream_buffer.size() - fill), 0);
             if (received > 0) {
                 if (!got_data) {
                     got_data = true;
                     reconnect_delay_ms = RECONNECT_INIT_MS;
                 }
-                stream_buffer.insert(stream_buffer.end(), recv_buf.begin(), recv_buf.begin() + received);
+                fill += static_cast<size_t>(received);
 
                 // Auto-detect stream format on first data chunk
-                if (!format_detected && stream_buffer.size() >= 4) {
+                if (!format_detected && fill >= 4) {
                     if (stream_buffer[0] == 0x56 && stream_buffer[1] == 0x49 &&
                         stream_buffer[2] == 0x44 && stream_buffer[3] == 0x30) {
                         is_raw_h264 = false;
@@ -181,10 +302,15 @@ new_recv_loop = '''        bool got_data = false;
                 }
 
                 if (format_detected) {
+                    size_t consumed = fill;  // raw H.264 has no framing to reassemble
                     if (is_raw_h264) {
-                        parseRawH264Stream(hardware_id, stream_buffer);
+                        parseRawH264Stream(hardware_id, stream_buffer.data(), fill);
                     } else {
-                        parseVid0Stream(hardware_id, stream_buffer);
+                        consumed = parseVid0Stream(hardware_id, stream_buffer.data(), fill);
+                    }
+                    fill -= consumed;
+                    if (consumed > 0 && fill > 0) {
+                        std::memmove(stream_buffer.data(), stream_buffer.data() + consumed, fill);
                     }
                 }
             } else if (received == 0) {
@@ -201,10 +327,6 @@ new_recv_loop = '''        bool got_data = false;
             }
         }'''
 
-assert old_recv_loop in content, "PATCH2: recv loop not found!"
-content = content.replace(old_recv_loop, new_recv_loop)
-print("PATCH 2 applied: Auto-detect VID0 vs raw H.264")
-
 
 # ============================================================
 # PATCH 3: Add scrcpy auto-launch on repeated "No data"
@@ -242,10 +364,6 @@ new_no_data = '''        if (running_.load()) {
             std::this_thread::sleep_for(std::chrono::milliseconds(reconnect_delay_ms));
         }'''
 
-assert old_no_data in content, "PATCH3: no_data block not found!"
-content = content.replace(old_no_data, new_no_data)
-print("PATCH 3 applied: scrcpy auto-launch on repeated No data")
-
 
 # ============================================================
 # PATCH 4: Add counter variables at start of receiverThread
@@ -257,12 +375,30 @@ new_thread_start = '''    int reconnect_delay_ms = RECONNECT_INIT_MS;
     int no_data_count = 0;
     bool scrcpy_launched = false;'''
 
-assert old_thread_start in content, "PATCH4: thread start not found!"
-content = content.replace(old_thread_start, new_thread_start, 1)
-print("PATCH 4 applied: Added no_data_count and scrcpy_launched vars")
-
-
-with open(filepath, 'w', encoding='utf-8-sig') as f:
-    f.write(content)
 
-print("\nAll patches written to", filepath)
+PATCH_ID = 'tcp_scrcpy_autodetect_launch'
+
+
+def apply(session):
+    if session.is_applied(PATCH_ID, filepath):
+        print("SKIP: scrcpy auto-detect patches already applied")
+        return
+    session.apply_edits(filepath, [
+        ("PATCH1 tail", old_tail, new_methods_and_tail),
+        ("PATCH2 recv loop", old_recv_loop, new_recv_loop),
+        ("PATCH3 no_data block", old_no_data, new_no_data),
+        ("PATCH4 thread start", old_thread_start, new_thread_start),
+        ("#include <chrono>", old_includes, new_includes),
+    ])
+    print("PATCH 1 applied: Added scrcpy launcher + raw H.264 parser")
+    print("PATCH 2 applied: Auto-detect VID0 vs raw H.264")
+    print("PATCH 3 applied: scrcpy auto-launch on repeated No data")
+    print("PATCH 4 applied: Added no_data_count and scrcpy_launched vars")
+    session.mark_applied(PATCH_ID, filepath)
+
+
+if __name__ == '__main__':
+    session = PatchSession()
+    apply(session)
+    if session.flush():
+        print("\nAll patches written to", filepath)
@@ -1,11 +1,9 @@
 #!/usr/bin/env python3
 """Fix TcpVideoReceiver to use WiFi ADB connections (not just USB)"""
+from patch_session import PatchSession
 
 filepath = r'C:\MirageWork\MirageVulkan\src\tcp_video_receiver.cpp'
 
-with open(filepath, 'r', encoding='utf-8-sig') as f:
-    content = f.read()
-
 # === FIX: Use preferred_adb_id instead of requiring usb_connections ===
 old_start = '''    for (const auto& dev : devices) {
         if (dev.usb_connections.empty()) {
@@ -31,17 +29,30 @@ new_start = '''    for (const auto& dev : devices) {
         }
         int local_port = base_port + port_offset;'''
 
-assert old_start in content, "FIX: old start block not found!"
-content = content.replace(old_start, new_start)
-print("FIX applied: TCP receiver now uses preferred_adb_id (WiFi+USB)")
-
 # Also fix the "No USB devices" warning message
 old_msg = '''    if (devices_.empty()) { running_.store(false); MLOG_WARN("tcpvideo", "No USB devices"); return false; }'''
 new_msg = '''    if (devices_.empty()) { running_.store(false); MLOG_WARN("tcpvideo", "No devices available for TCP video"); return false; }'''
-content = content.replace(old_msg, new_msg)
-print("FIX applied: Updated warning message")
 
-with open(filepath, 'w', encoding='utf-8-sig') as f:
-    f.write(content)
 
-print("\nAll fixes written to", filepath)
+PATCH_ID = 'tcp_wifi_preferred_adb_id'
+
+
+def apply(session):
+    if session.is_applied(PATCH_ID, filepath):
+        print("SKIP: WiFi ADB receiver fix already applied")
+        return
+    found = session.edit_all(filepath, [
+        (old_start, new_start),
+        (old_msg, new_msg),   # optional: message may already be updated
+    ])
+    assert found[0], "FIX: old start block not found!"
+    print("FIX applied: TCP receiver now uses preferred_adb_id (WiFi+USB)")
+    print("FIX applied: Updated warning message")
+    session.mark_applied(PATCH_ID, filepath)
+
+
+if __name__ == '__main__':
+    session = PatchSession()
+    apply(session)
+    if session.flush():
+        print("\nAll fixes written to", filepath)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""patches_cache: remember which patch IDs were applied to which file.
+
+.patches.cache.json maps a target path to the (mtime_ns, size) and SHA-256
+it had after the last recorded patch, plus the IDs applied up to then. A
+patch whose ID is recorded for the file's current stat is skipped without
+reading the file. When the stat differs (a checkout or copy that rewrote the
+same bytes) the file is hashed once: a matching hash keeps the IDs and
+re-records the stat; any real edit invalidates the entry.
+"""
+import hashlib
+import json
+import os
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.patches.cache.json')
+
+
+def _stat_key(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_cache():
+    try:
+        with open(CACHE_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache):
+    tmp = CACHE_FILE + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    os.replace(tmp, CACHE_FILE)
+
+
+def applied_ids(path, cache=None):
+    """IDs recorded for path, empty if the file changed since they were recorded.
+
+    A stat mismatch with an unchanged hash refreshes the recorded stat and
+    saves the cache, so the next run is back on the stat-only check.
+    """
+    cache = load_cache() if cache is None else cache
+    entry = cache.get(os.path.abspath(path))
+    if not entry:
+        return set()
+    try:
+        stat = _stat_key(path)
+        if entry['stat'] == stat:
+            return set(entry['applied'])
+        if entry.get('sha256') and entry['sha256'] == _sha256(path):
+            entry['stat'] = stat
+            save_cache(cache)
+            return set(entry['applied'])
+    except OSError:
+        pass
+    return set()
+
+
+def is_applied(pid, path, cache=None):
+    return pid in applied_ids(path, cache)
+
+
+def mark_applied(pids, path, cache=None, content=None):
+    """Record pids as every patch the file now carries, at its current stat.
+
+    Call after the file is written. Pass the IDs that were already valid
+    before the write too (applied_ids() taken beforehand): the write changes
+    the stat, so the old entry no longer vouches for them. content, if given,
+    is the file's bytes as written and saves re-reading it for the hash.
+    """
+    own = cache is None
+    cache = load_cache() if own else cache
+    digest = hashlib.sha256(content).hexdigest() if content is not None else _sha256(path)
+    cache[os.path.abspath(path)] = {'stat': _stat_key(path), 'sha256': digest,
+                                    'applied': sorted(set(pids))}
+    if own:
+        save_cache(cache)
@@ -0,0 +1,115 @@
+"""PNG decoding helpers for png_analyze.py / png_zones.py (8-bit RGB/RGBA)."""
+import zlib
+
+import numpy as np
+
+try:
+    from PIL import Image
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+
+def idat_chunks(d):
+    """IDAT payloads of PNG file bytes d, in order, as memoryview slices (no copies)."""
+    mv = memoryview(d)
+    i = 8
+    while i < len(mv):
+        n = int.from_bytes(mv[i:i + 4], 'big')
+        if mv[i + 4:i + 8] == b'IDAT':
+            yield mv[i + 8:i + 8 + n]
+        i += 12 + n
+
+
+def inflate(d, size):
+    """The first size bytes of the decompressed IDAT stream of d, as a bytearray.
+
+    Each IDAT chunk is fed to one decompressobj and the output lands in a
+    buffer allocated once at its final size; the compressed chunks are never
+    joined, and decompression stops as soon as size bytes are out.
+    """
+    out = bytearray(size)
+    pos = 0
+    dec = zlib.decompressobj()
+    for data in idat_chunks(d):
+        while data and pos < size:
+            piece = dec.decompress(data, size - pos)
+            out[pos:pos + len(piece)] = piece
+            pos += len(piece)
+            data = dec.unconsumed_tail
+        if pos == size:
+            return out
+    raise ValueError(f'IDAT stream ends after {pos} of {size} bytes')
+
+
+def _paeth(a, b, c):
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    return b if pb <= pc else c
+
+
+def pixels(raw, w, h, channels):
+    """Decompressed IDAT -> (h, w, channels) uint8 array with every row unfiltered.
+
+    Rows with filter 0 (None) are used as they are; when every row is
+    unfiltered the result is a view of raw. Sub and Up are undone with one
+    NumPy op per row (uint8 arithmetic wraps mod 256 exactly as PNG does);
+    Average and Paeth depend on the pixel just reconstructed to their left,
+    so those rows go through a per-byte loop.
+    """
+    stride = w * channels + 1
+    arr = np.frombuffer(raw, np.uint8, h * stride).reshape(h, stride)
+    filters = arr[:, 0]
+    rows = arr[:, 1:]
+    if not filters.any():
+        return rows.reshape(h, w, channels)
+
+    out = rows.copy()
+    zero = np.zeros(w * channels, np.uint8)
+    for y in np.flatnonzero(filters):
+        f = filters[y]
+        prior = out[y - 1] if y else zero
+        if f == 1:
+            out[y] = out[y].reshape(w, channels).cumsum(axis=0, dtype=np.uint8).ravel()
+        elif f == 2:
+            out[y] += prior
+        elif f in (3, 4):
+            cur = out[y].tolist()
+            up = prior.tolist()
+            for x in range(len(cur)):
+                left = cur[x - channels] if x >= channels else 0
+                if f == 3:
+                    cur[x] = (cur[x] + ((left + up[x]) >> 1)) & 0xFF
+                else:
+                    upleft = up[x - channels] if x >= channels else 0
+                    cur[x] = (cur[x] + _paeth(left, up[x], upleft)) & 0xFF
+            out[y] = cur
+        else:
+            raise ValueError(f'row {y}: unknown PNG filter type {f}')
+    return out.reshape(h, w, channels)
+
+
+def decode(path, top_half=False):
+    """PNG file -> ((rows, w, 3) uint8 RGB array, w, h).
+
+    With Pillow the image is decoded by libpng (any bit depth or color type)
+    and top_half only trims the result. Without it the pure-NumPy path below
+    handles 8-bit RGB/RGBA; there top_half stops after row h//2 - enough for
+    the center pixel - and, as filters only reach upward, the rows below it
+    are neither decompressed nor unfiltered.
+    """
+    if HAS_PIL:
+        with Image.open(path) as im:
+            rgb = np.asarray(im.convert('RGB'))
+        h, w = rgb.shape[:2]
+        return (rgb[:h // 2 + 1] if top_half else rgb), w, h
+    with open(path, 'rb') as f:
+        d = f.read()
+    w = int.from_bytes(d[16:20], 'big')
+    h = int.from_bytes(d[20:24], 'big')
+    channels = 4 if d[25] == 6 else 3
+    rows = h // 2 + 1 if top_half else h
+    raw = inflate(d, rows * (w * channels + 1))
+    return pixels(raw, w, rows, channels)[..., :3], w, h
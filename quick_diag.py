@@ -1,31 +1,68 @@
 import os
+from collections import deque
 p = os.path.expandvars(r'%APPDATA%\MirageSystem\mirage_vulkan.log')
+
+
+def lines_with(block, needle):
+    """Lines of block that contain needle, in order, each once.
+
+    str.find scans the whole block in C; only the lines it hits are sliced
+    out, instead of every line going through the tests in Python.
+    """
+    find = block.find
+    i = find(needle)
+    while i >= 0:
+        start = block.rfind('\n', 0, i) + 1
+        end = find('\n', i)
+        end = len(block) if end < 0 else end + 1
+        yield block[start:end].rstrip()
+        i = find(needle, end)
+
+
+# Read 1MB blocks cut at line ends; a line lands in every bucket it matches
+mainview, stage, recorded, vktex, errors = [], [], [], [], []
+bf_recent = deque(maxlen=5)
+bf_count = 0
+total = 0
 with open(p, 'r', encoding='utf-8', errors='replace') as f:
-    lines = f.readlines()
-print(f'Total: {len(lines)} lines')
+    carry = ''
+    while True:
+        chunk = f.read(1 << 20)
+        block = carry + chunk
+        if chunk:
+            cut = block.rfind('\n') + 1
+            block, carry = block[:cut], block[cut:]
+        if block:
+            total += block.count('\n') + (not block.endswith('\n'))
+            mainview += lines_with(block, 'MAINVIEW diag')
+            stage += lines_with(block, 'stageUpdate')
+            recorded += (l for l in lines_with(block, 'Recorded') if 'texture' in l)
+            vktex += (l for l in lines_with(block, 'VkTex')
+                      if 'Skipping' in l or 'Size upgrade' in l or 'mismatch' in l)
+            for l in lines_with(block, 'beginFrame'):
+                if 'fi=' in l:
+                    bf_count += 1
+                    bf_recent.append(l)
+            errors += lines_with(block, '[ERROR]')
+        if not chunk:
+            break
+print(f'Total: {total} lines')
 
 print('\n=== MAINVIEW diag (all) ===')
-for l in lines:
-    if 'MAINVIEW diag' in l: print(l.rstrip())
+for l in mainview: print(l)
 
 print('\n=== stageUpdate (device breakdown) ===')
-for l in lines:
-    if 'stageUpdate' in l: print(l.rstrip())
+for l in stage: print(l)
 
 print('\n=== Recorded texture uploads ===')
-for l in lines:
-    if 'Recorded' in l and 'texture' in l: print(l.rstrip())
+for l in recorded: print(l)
 
 print('\n=== VkTex Skipping/Mismatch ===')
-for l in lines:
-    if ('Skipping' in l or 'Size upgrade' in l or 'mismatch' in l) and 'VkTex' in l:
-        print(l.rstrip())
+for l in vktex: print(l)
 
 print('\n=== beginFrame recent (fi/img distribution) ===')
-bf = [l.rstrip() for l in lines if 'beginFrame' in l and 'fi=' in l]
-print(f'  total beginFrame logs: {len(bf)}')
-for l in bf[-5:]: print(' ', l)
+print(f'  total beginFrame logs: {bf_count}')
+for l in bf_recent: print(' ', l)
 
 print('\n=== Errors ===')
-for l in lines:
-    if '[ERROR]' in l: print(l.rstrip())
+for l in errors: print(l)
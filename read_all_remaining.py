@@ -1,4 +1,6 @@
-import os, sys
+import os
+
+from listing import find_sources, read_lines, write_numbered
 
 # 全ktファイルを一括で読み込んでまとめて出力
 base = r'C:\MirageWork\MirageVulkan\android'
@@ -27,13 +29,8 @@ targets = [
 
 for mod, pkg in mods:
     src = os.path.join(base, mod, 'src', 'main', 'java')
-    for root, dirs, files in os.walk(src):
-        for f in files:
-            if f in targets:
-                p = os.path.join(root, f)
-                with open(p, 'rb') as fh:
-                    lines = fh.read().decode('utf-8','replace').splitlines()
-                print(f'=== [{mod}] {f} ({len(lines)}L) ===')
-                for i, l in enumerate(lines, 1):
-                    print(f'{i}: {l}')
-                print()
+    for e in find_sources(src, targets):
+        lines = read_lines(e.path)
+        print(f'=== [{mod}] {e.name} ({len(lines)}L) ===')
+        write_numbered(lines)
+        print()
@@ -1,4 +1,4 @@
-import os
+from listing import read_lines, write_numbered
 
 # 重要ファイルを個別に読む
 files_priority = [
@@ -12,7 +12,7 @@ files_priority = [
 ]
 
 for p, name in files_priority:
-    with open(p, 'rb') as f: lines = f.read().decode('utf-8','replace').splitlines()
+    lines = read_lines(p)
     print(f'=== {name} ({len(lines)}L) ===')
-    for i, l in enumerate(lines, 1): print(f'{i}: {l}')
+    write_numbered(lines)
     print()
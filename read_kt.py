@@ -1,9 +1,7 @@
-import os
+from listing import walk_files
 
-for root, dirs, fs in os.walk(r'C:\MirageWork\MirageVulkan\android\capture\src'):
-    for f in fs:
-        if any(x in f for x in ['Boot','Watchdog','Activity','Config']):
-            p = os.path.join(root, f)
-            print(f'=== {f} ({os.path.getsize(p)}B) ===')
-            with open(p,'rb') as fh: print(fh.read().decode('utf-8','replace'))
-            print()
+for e in walk_files(r'C:\MirageWork\MirageVulkan\android\capture\src'):
+    if any(x in e.name for x in ['Boot','Watchdog','Activity','Config']):
+        print(f'=== {e.name} ({e.stat().st_size}B) ===')
+        with open(e.path,'rb') as fh: print(fh.read().decode('utf-8','replace'))
+        print()
@@ -1,13 +1,11 @@
-import os
+from listing import read_lines, walk_files
 
-targets = ['ScreenAnalyzer','OcrEngine','UiDetector','TiledEncoder','TileRepeater','MtilFraming']
-for root, dirs, fs in os.walk(r'C:\MirageWork\MirageVulkan\android\capture\src'):
-    for f in fs:
-        if any(f.startswith(x) for x in targets):
-            p = os.path.join(root, f)
-            print(f'=== {f} ({os.path.getsize(p)}B) ===')
-            with open(p,'rb') as fh:
-                lines = fh.read().decode('utf-8','replace').splitlines()
-            for l in lines[:55]: print(l)
-            if len(lines)>55: print(f'  ... ({len(lines)} lines total)')
-            print()
+# str.startswith takes the whole tuple in one call
+targets = ('ScreenAnalyzer','OcrEngine','UiDetector','TiledEncoder','TileRepeater','MtilFraming')
+for e in walk_files(r'C:\MirageWork\MirageVulkan\android\capture\src'):
+    if e.name.startswith(targets):
+        print(f'=== {e.name} ({e.stat().st_size}B) ===')
+        lines = read_lines(e.path)
+        for l in lines[:55]: print(l)
+        if len(lines)>55: print(f'  ... ({len(lines)} lines total)')
+        print()
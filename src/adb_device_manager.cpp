@@ -39,6 +39,10 @@ using UniquePipe = std::unique_ptr<FILE, PipeDeleter>;
 
 // Execute command without showing console window (Windows)
 // Returns command output as string, or empty on failure
+// The program is started directly, not through "cmd /c": no extra cmd.exe per
+// call, and |, &, > reach adb (and so the device shell) instead of being
+// taken by the local shell. stdout and stderr share the pipe, so callers
+// need no "2>&1".
 std::string execCommandHidden(const std::string& cmd) {
     std::string result;
 
@@ -68,7 +72,7 @@ std::string execCommandHidden(const std::string& cmd) {
     si.wShowWindow = SW_HIDE;
 
     PROCESS_INFORMATION pi = {};
-    std::string cmd_copy = "cmd /c " + cmd;
+    std::string cmd_copy = cmd;
 
     if (CreateProcessA(nullptr, cmd_copy.data(), nullptr, nullptr, TRUE,
                        CREATE_NO_WINDOW, nullptr, nullptr, &si, &pi)) {
@@ -234,7 +238,7 @@ std::string AdbDeviceManager::adbCommand(const std::string& adb_id, const std::s
     }
 
     // Build command safely
-    std::string cmd = adb_exe_ + " -s " + adb_id + " " + sanitized_cmd + " 2>&1";
+    std::string cmd = adb_exe_ + " -s " + adb_id + " " + sanitized_cmd;
 
     // Use hidden window execution to prevent console flash
     std::string result = execCommandHidden(cmd);
@@ -256,7 +260,7 @@ std::string AdbDeviceManager::adbCommand(const std::string& adb_id, const std::s
 std::vector<std::string> AdbDeviceManager::parseAdbDevices() {
     std::vector<std::string> devices;
 
-    std::string cmd = adb_exe_ + " devices 2>&1";
+    std::string cmd = adb_exe_ + " devices";
 
     // Use hidden window execution to prevent console flash
     std::string result = execCommandHidden(cmd);
@@ -6,10 +6,14 @@
 // =============================================================================
 #pragma once
 
+#include <algorithm>
+#include <chrono>
+#include <condition_variable>
 #include <string>
 #include <functional>
 #include <thread>
 #include <atomic>
+#include <mutex>
 #include <cstdlib>
 #include <cstdio>
 
@@ -156,11 +160,12 @@ public:
 
     SetupStepResult complete_and_verify() {
         SetupStepResult result;
-        if (!bridge_connected_) {
-            // Wait longer for WiFi ADB (bridge connects async, scrcpy startup is slow)
-            for (int i = 0; i < 20 && !bridge_connected_; i++) {
-                std::this_thread::sleep_for(std::chrono::milliseconds(500));
-            }
+        {
+            // Wait longer for WiFi ADB (bridge connects async, scrcpy startup is slow);
+            // bridge_loop() signals bridge_cv_ the moment it connects
+            std::unique_lock<std::mutex> lk(bridge_mtx_);
+            bridge_cv_.wait_for(lk, std::chrono::seconds(10),
+                                [this] { return bridge_connected_.load(); });
         }
         result.status = bridge_connected_ ? SetupStatus::COMPLETED : SetupStatus::FAILED;
         result.message = bridge_connected_ ? "" : "Bridge not connected after 10s";
@@ -180,6 +185,8 @@ private:
     std::atomic<bool> server_running_{false};
     std::atomic<bool> bridge_running_{false};
     std::atomic<bool> bridge_connected_{false};
+    std::mutex bridge_mtx_;               // pairs with bridge_cv_ for complete_and_verify()
+    std::condition_variable bridge_cv_;
     std::thread server_thread_;
     std::thread bridge_thread_;
 
@@ -208,55 +215,91 @@ private:
     void bridge_loop() {
         MLOG_INFO("adb", "Bridge thread starting: TCP:%d -> UDP:%d", tcp_port_, udp_port_);
 
-        // Connect TCP to scrcpy-server
-        SOCKET tcp_sock = socket(AF_INET, SOCK_STREAM, IPPROTO_TCP);
-        if (tcp_sock == INVALID_SOCKET) {
-            MLOG_ERROR("adb", "Failed to create TCP socket");
-            return;
-        }
-
-        // TCP_NODELAY for low latency
-        int nodelay = 1;
-        setsockopt(tcp_sock, IPPROTO_TCP, TCP_NODELAY, (char*)&nodelay, sizeof(nodelay));
-
         sockaddr_in server_addr{};
         server_addr.sin_family = AF_INET;
         server_addr.sin_port = htons(static_cast<u_short>(tcp_port_));
         inet_pton(AF_INET, "127.0.0.1", &server_addr.sin_addr);
 
-        // Retry connect with extended timeout for WiFi ADB (scrcpy startup is slow)
-        bool connected = false;
-        for (int i = 0; i < 50 && bridge_running_; i++) {
-            if (connect(tcp_sock, (sockaddr*)&server_addr, sizeof(server_addr)) == 0) {
-                connected = true;
+        // One non-blocking connect attempt, capped at 200ms by WSAPoll instead
+        // of the OS SYN retry (a refused loopback connect blocks ~2s on
+        // Windows). A socket whose connect failed can't be reused on Winsock,
+        // so every attempt gets a fresh one.
+        auto try_connect = [&server_addr]() -> SOCKET {
+            SOCKET s = socket(AF_INET, SOCK_STREAM, IPPROTO_TCP);
+            if (s == INVALID_SOCKET) return s;
+            u_long nb = 1;
+            ioctlsocket(s, FIONBIO, &nb);
+            bool ok = connect(s, (sockaddr*)&server_addr, sizeof(server_addr)) == 0;
+            if (!ok && WSAGetLastError() == WSAEWOULDBLOCK) {
+                WSAPOLLFD pfd{};
+                pfd.fd = s;
+                pfd.events = POLLWRNORM;
+                if (WSAPoll(&pfd, 1, 200) == 1 && (pfd.revents & POLLWRNORM)) {
+                    int err = 0;
+                    int len = sizeof(err);
+                    ok = getsockopt(s, SOL_SOCKET, SO_ERROR, (char*)&err, &len) == 0 && err == 0;
+                }
+            }
+            if (!ok) {
+                closesocket(s);
+                return INVALID_SOCKET;
+            }
+            nb = 0;
+            ioctlsocket(s, FIONBIO, &nb);  // back to blocking for recv()
+            return s;
+        };
+
+        // Probe until scrcpy accepts: backoff 50ms doubling to 500ms, 15s budget
+        // for WiFi ADB (scrcpy startup is slow there); the first success ends it
+        SOCKET tcp_sock = INVALID_SOCKET;
+        int attempts = 0;
+        const auto deadline = std::chrono::steady_clock::now() + std::chrono::seconds(15);
+        auto delay = std::chrono::milliseconds(50);
+        while (bridge_running_ && std::chrono::steady_clock::now() < deadline) {
+            ++attempts;
+            tcp_sock = try_connect();
+            if (tcp_sock != INVALID_SOCKET) {
                 break;
             }
-            if (i % 10 == 9) {
-                MLOG_INFO("adb", "Bridge: TCP connect retry %d/50 (port %d)", i+1, tcp_port_);
+            if (attempts % 10 == 0) {
+                MLOG_INFO("adb", "Bridge: TCP connect retry %d (port %d)", attempts, tcp_port_);
             }
-            std::this_thread::sleep_for(std::chrono::milliseconds(200));
+            std::this_thread::sleep_for(delay);
+            delay = (std::min)(delay * 2, std::chrono::milliseconds(500));
         }
 
-        if (!connected) {
-            MLOG_ERROR("adb", "Bridge: TCP connect failed after 50 retries (10s) on port %d", tcp_port_);
-            closesocket(tcp_sock);
+        if (tcp_sock == INVALID_SOCKET) {
+            MLOG_ERROR("adb", "Bridge: TCP connect failed after %d attempts (15s) on port %d", attempts, tcp_port_);
             return;
         }
 
+        // TCP_NODELAY for low latency
+        int nodelay = 1;
+        setsockopt(tcp_sock, IPPROTO_TCP, TCP_NODELAY, (char*)&nodelay, sizeof(nodelay));
+
         // scrcpy raw_stream=true sends pure H.264 Annex B stream with NO header.
         // Just log and proceed - do NOT consume any bytes.
         MLOG_INFO("adb", "Bridge: TCP connected to scrcpy on port %d (raw_stream=true, no header to skip)", tcp_port_);
         bridge_connected_ = true;
+        { std::lock_guard<std::mutex> lk(bridge_mtx_); }  // no lost wakeup vs. wait_for's predicate
+        bridge_cv_.notify_all();
 
-        // Create UDP sender
+        // Create UDP sender; 4MB send buffer like the TCP receiver's, so a
+        // burst of 64KB datagrams doesn't stall sendto() while the
+        // MirrorReceiver catches up
         SOCKET udp_sock = socket(AF_INET, SOCK_DGRAM, IPPROTO_UDP);
+        int udp_sndbuf = 4 * 1024 * 1024;
+        setsockopt(udp_sock, SOL_SOCKET, SO_SNDBUF, (const char*)&udp_sndbuf, sizeof(udp_sndbuf));
         sockaddr_in udp_dest{};
         udp_dest.sin_family = AF_INET;
         udp_dest.sin_port = htons(static_cast<u_short>(udp_port_));
         inet_pton(AF_INET, "127.0.0.1", &udp_dest.sin_addr);
 
-        // Bridge: read H.264 from TCP, send to UDP
-        char buf[65536];
+        // Bridge: read H.264 from TCP, send to UDP. One recv becomes one
+        // datagram, so read at most the largest UDP payload (65507 bytes): a
+        // full 64KB read made sendto() fail with WSAEMSGSIZE and drop it
+        constexpr int kMaxDatagram = 65507;
+        char buf[kMaxDatagram];
         long long total = 0;
         auto start = std::chrono::steady_clock::now();
         auto last_log = start;
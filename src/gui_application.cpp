@@ -105,8 +105,7 @@ void GuiApplication::onResize(int width, int height) {
 
     // Recreate Vulkan swapchain
     if (vk_swapchain_ && vk_context_) {
-        vkDeviceWaitIdle(vk_context_->device());
-        vk_swapchain_->recreate(width, height);
+        vk_swapchain_->recreate(width, height);  // drains the graphics queue itself
     }
 
     // Update font scale based on window height (base: 1080p)
@@ -838,26 +837,46 @@ bool GuiApplication::createVulkanResources(HWND hwnd) {
     cai.commandBufferCount = VK_MAX_FRAMES_IN_FLIGHT;
     if (vkAllocateCommandBuffers(dev, &cai, vk_command_buffers_.data()) != VK_SUCCESS) return false;
 
-    // Sync objects
-    vk_image_available_.resize(VK_MAX_FRAMES_IN_FLIGHT);
-    vk_render_finished_.resize(VK_MAX_FRAMES_IN_FLIGHT);
+    // Sync objects: fences per frame in flight, semaphores per swapchain image
     vk_in_flight_.resize(VK_MAX_FRAMES_IN_FLIGHT);
 
-    VkSemaphoreCreateInfo sci{}; sci.sType = VK_STRUCTURE_TYPE_SEMAPHORE_CREATE_INFO;
     VkFenceCreateInfo fci{}; fci.sType = VK_STRUCTURE_TYPE_FENCE_CREATE_INFO;
     fci.flags = VK_FENCE_CREATE_SIGNALED_BIT;
 
     for (uint32_t i = 0; i < VK_MAX_FRAMES_IN_FLIGHT; i++) {
-        if (vkCreateSemaphore(dev, &sci, nullptr, &vk_image_available_[i]) != VK_SUCCESS ||
-            vkCreateSemaphore(dev, &sci, nullptr, &vk_render_finished_[i]) != VK_SUCCESS ||
-            vkCreateFence(dev, &fci, nullptr, &vk_in_flight_[i]) != VK_SUCCESS)
+        if (vkCreateFence(dev, &fci, nullptr, &vk_in_flight_[i]) != VK_SUCCESS)
             return false;
     }
+    if (!createSwapchainSemaphores()) return false;
 
     MLOG_INFO("app", "Vulkan resources created");
     return true;
 }
 
+// (Re)build the swapchain semaphores for the current image count; the graphics
+// queue must be idle. Semaphores are never indexed by frame in flight: with fewer
+// frames than images, acquire could be handed a semaphore an earlier present
+// still waits on (VUID-vkAcquireNextImageKHR-semaphore-01779), which hangs
+// some drivers. Render-finished semaphores follow the swapchain image, and
+// acquire rotates through imageCount + 1 so its next semaphore is always free.
+bool GuiApplication::createSwapchainSemaphores() {
+    VkDevice dev = vk_context_->device();
+    for (auto& s : vk_image_available_) if (s) vkDestroySemaphore(dev, s, nullptr);
+    for (auto& s : vk_render_finished_) if (s) vkDestroySemaphore(dev, s, nullptr);
+
+    const uint32_t images = vk_swapchain_->imageCount();
+    vk_image_available_.assign(images + 1, VK_NULL_HANDLE);
+    vk_render_finished_.assign(images, VK_NULL_HANDLE);
+    vk_acquire_sem_next_ = 0;
+
+    VkSemaphoreCreateInfo sci{}; sci.sType = VK_STRUCTURE_TYPE_SEMAPHORE_CREATE_INFO;
+    for (auto& s : vk_image_available_)
+        if (vkCreateSemaphore(dev, &sci, nullptr, &s) != VK_SUCCESS) return false;
+    for (auto& s : vk_render_finished_)
+        if (vkCreateSemaphore(dev, &sci, nullptr, &s) != VK_SUCCESS) return false;
+    return true;
+}
+
 void GuiApplication::cleanupVulkanResources() {
     if (vk_context_ && vk_context_->device()) {
         VkDevice dev = vk_context_->device();
@@ -957,11 +976,23 @@ void GuiApplication::vulkanBeginFrame() {
     VkDevice dev = vk_context_->device();
     uint32_t fi = vk_current_frame_;
 
-    // Use 3-second timeout instead of UINT64_MAX to prevent permanent freeze
+    // Bounded timeout instead of UINT64_MAX to prevent permanent freeze, scaled
+    // to this device: 10x the p99 frame interval, clamped to [0.5s, 10s]
+    // (3s until the first full window of frame times)
+    const uint64_t fence_timeout_ns = frame_time_p99_ns_
+        ? (std::min<uint64_t>)((std::max<uint64_t>)(500000000ULL, 10ULL * frame_time_p99_ns_), 10000000000ULL)
+        : 3000000000ULL;
     // TIMING: measure vkWaitForFences latency to diagnose GPU bottleneck
     static std::atomic<int> fence_log_cnt{0};
     auto fence_t0 = std::chrono::steady_clock::now();
-    VkResult fence_r = vkWaitForFences(dev, 1, &vk_in_flight_[fi], VK_TRUE, 3000000000ULL);
+    VkResult fence_r = vkWaitForFences(dev, 1, &vk_in_flight_[fi], VK_TRUE, fence_timeout_ns);
+    if (fence_r == VK_TIMEOUT) {
+        // Grace period before recovery: a driver that just missed the deadline
+        // signals moments later. 100us waits, up to 100ms in total.
+        for (int i = 0; i < 1000 && fence_r == VK_TIMEOUT; i++) {
+            fence_r = vkWaitForFences(dev, 1, &vk_in_flight_[fi], VK_TRUE, 100000ULL);
+        }
+    }
     auto fence_wait_us = std::chrono::duration_cast<std::chrono::microseconds>(
         std::chrono::steady_clock::now() - fence_t0).count();
     {
@@ -971,14 +1002,26 @@ void GuiApplication::vulkanBeginFrame() {
         }
     }
     if (fence_r == VK_TIMEOUT) {
-        MLOG_WARN("vkframe", "Fence timeout (3s), recovering...");
+        MLOG_WARN("vkframe", "Fence timeout (%llums), recovering...",
+                  (unsigned long long)(fence_timeout_ns / 1000000));
         vkDeviceWaitIdle(dev);
-        // Recreate ALL fences in signaled state to break deadlock
+        // Every submitted fence is signaled once the device is idle. One still
+        // unsignaled was reset without a submit: an empty submit signals it,
+        // so the fences are reused instead of destroyed and recreated. (A plain
+        // vkResetFences would leave them unsignaled and the next wait would
+        // time out again.) If that submit fails, the fence is recreated
+        // signaled as before.
         for (uint32_t i = 0; i < VK_MAX_FRAMES_IN_FLIGHT; i++) {
-            vkDestroyFence(dev, vk_in_flight_[i], nullptr);
-            VkFenceCreateInfo fci{}; fci.sType = VK_STRUCTURE_TYPE_FENCE_CREATE_INFO;
-            fci.flags = VK_FENCE_CREATE_SIGNALED_BIT;
-            vkCreateFence(dev, &fci, nullptr, &vk_in_flight_[i]);
+            if (vkGetFenceStatus(dev, vk_in_flight_[i]) != VK_NOT_READY) continue;
+            VkResult sr = vk_context_->safeQueueSubmit(vk_context_->graphicsQueue(),
+                                                       0, nullptr, vk_in_flight_[i]);
+            if (sr != VK_SUCCESS) {
+                MLOG_WARN("vkframe", "Fence %u signal submit failed (%d), recreating", i, (int)sr);
+                vkDestroyFence(dev, vk_in_flight_[i], nullptr);
+                VkFenceCreateInfo fci{}; fci.sType = VK_STRUCTURE_TYPE_FENCE_CREATE_INFO;
+                fci.flags = VK_FENCE_CREATE_SIGNALED_BIT;
+                vkCreateFence(dev, &fci, nullptr, &vk_in_flight_[i]);
+            }
         }
         return;  // Skip this frame, next iteration will succeed
     }
@@ -990,10 +1033,28 @@ void GuiApplication::vulkanBeginFrame() {
     // Resetting before acquire is wrong: if acquire fails, fence stays
     // UNSIGNALED and the next vkWaitForFences blocks for 3 seconds.
 
+    // A swapchain recreate may have changed the image count
+    if (vk_render_finished_.size() != vk_swapchain_->imageCount()) {
+        vk_context_->safeQueueWaitIdle(vk_context_->graphicsQueue());
+        if (!createSwapchainSemaphores()) {
+            MLOG_ERROR("vkframe", "swapchain semaphore rebuild failed");
+            return;
+        }
+    }
+    const uint32_t sem = vk_acquire_sem_next_;
+    vk_acquire_sem_next_ = (sem + 1) % static_cast<uint32_t>(vk_image_available_.size());
+    // Replaces vk_image_available_[sem]: an acquire that did not lead to a
+    // submit may leave it signaled (SUBOPTIMAL) or undefined (TIMEOUT)
+    auto renew_acquire_sem = [&]() {
+        vkDestroySemaphore(dev, vk_image_available_[sem], nullptr);
+        VkSemaphoreCreateInfo sci{}; sci.sType = VK_STRUCTURE_TYPE_SEMAPHORE_CREATE_INFO;
+        vkCreateSemaphore(dev, &sci, nullptr, &vk_image_available_[sem]);
+    };
+
     uint32_t imageIndex;
     auto acquire_t0 = std::chrono::steady_clock::now();
     VkResult r = vkAcquireNextImageKHR(dev, vk_swapchain_->swapchain(),
-        1000000000ULL, vk_image_available_[fi], VK_NULL_HANDLE, &imageIndex);
+        1000000000ULL, vk_image_available_[sem], VK_NULL_HANDLE, &imageIndex);
     {
         static std::atomic<int> acq_cnt{0};
         int ac = acq_cnt.fetch_add(1);
@@ -1005,24 +1066,23 @@ void GuiApplication::vulkanBeginFrame() {
     }
     if (r == VK_ERROR_OUT_OF_DATE_KHR || r == VK_SUBOPTIMAL_KHR) {
         MLOG_INFO("vkframe", "acquire OUT_OF_DATE/SUBOPTIMAL (%d), recreating", (int)r);
-        vkDeviceWaitIdle(dev);
-        vk_swapchain_->recreate(window_width_, window_height_);
+        vk_swapchain_->recreate(window_width_, window_height_);  // graphics queue now idle
+        renew_acquire_sem();  // SUBOPTIMAL signaled it, and nothing will wait on it
         return;
     }
     if (r != VK_SUCCESS) {
         MLOG_ERROR("vkframe", "acquire failed: %d fi=%u, recreating semaphore", (int)r, fi);
         // VK_TIMEOUT leaves semaphore in undefined state (Vulkan spec) - must recreate
-        vkDestroySemaphore(dev, vk_image_available_[fi], nullptr);
-        VkSemaphoreCreateInfo sci{}; sci.sType = VK_STRUCTURE_TYPE_SEMAPHORE_CREATE_INFO;
-        vkCreateSemaphore(dev, &sci, nullptr, &vk_image_available_[fi]);
+        renew_acquire_sem();
         // Do NOT advance vk_current_frame_ here.
         // endFrame will also advance it when !frame_valid_ → net +2 mod 2 = 0 (bug).
         // Leave fi unchanged; fence is still SIGNALED so next iteration retries immediately.
         return;
     }
 
-    // Store imageIndex for endFrame
+    // Store imageIndex and the acquire semaphore for endFrame
     vk_current_image_index_ = imageIndex;
+    vk_acquire_sem_used_ = sem;
 
     VkCommandBuffer cmd = vk_command_buffers_[fi];
     auto reset_t0 = std::chrono::steady_clock::now();
@@ -1107,12 +1167,12 @@ void GuiApplication::vulkanEndFrame() {
     VkSubmitInfo si{};
     si.sType = VK_STRUCTURE_TYPE_SUBMIT_INFO;
     si.waitSemaphoreCount = 1;
-    si.pWaitSemaphores = &vk_image_available_[fi];
+    si.pWaitSemaphores = &vk_image_available_[vk_acquire_sem_used_];
     si.pWaitDstStageMask = &waitStage;
     si.commandBufferCount = 1;
     si.pCommandBuffers = &cmd;
     si.signalSemaphoreCount = 1;
-    si.pSignalSemaphores = &vk_render_finished_[fi];
+    si.pSignalSemaphores = &vk_render_finished_[vk_current_image_index_];
     // Reset fence HERE (correct Vulkan pattern: reset only right before submit)
     vkResetFences(dev, 1, &vk_in_flight_[fi]);
     auto submit_t0 = std::chrono::steady_clock::now();
@@ -1139,7 +1199,7 @@ void GuiApplication::vulkanEndFrame() {
     VkPresentInfoKHR pi{};
     pi.sType = VK_STRUCTURE_TYPE_PRESENT_INFO_KHR;
     pi.waitSemaphoreCount = 1;
-    pi.pWaitSemaphores = &vk_render_finished_[fi];
+    pi.pWaitSemaphores = &vk_render_finished_[vk_current_image_index_];
     pi.swapchainCount = 1;
     pi.pSwapchains = &sc;
     pi.pImageIndices = &vk_current_image_index_;
@@ -1157,9 +1217,27 @@ void GuiApplication::vulkanEndFrame() {
 
     if (r == VK_ERROR_OUT_OF_DATE_KHR || r == VK_SUBOPTIMAL_KHR) {
         MLOG_INFO("vkframe", "present OUT_OF_DATE/SUBOPTIMAL (%d), recreating", (int)r);
-        vkDeviceWaitIdle(dev);
         vk_swapchain_->recreate(window_width_, window_height_);
     }
+    vk_swapchain_->releaseRetired(VK_MAX_FRAMES_IN_FLIGHT);
+
+    // Frame interval sample for the adaptive fence timeout
+    {
+        auto now = std::chrono::steady_clock::now();
+        if (last_end_frame_tp_.time_since_epoch().count() != 0) {
+            long long us = std::chrono::duration_cast<std::chrono::microseconds>(
+                now - last_end_frame_tp_).count();
+            frame_time_us_[frame_time_count_++ % FRAME_TIME_SAMPLES] =
+                static_cast<uint32_t>((std::min)(us, 0xFFFFFFFFLL));
+            if (frame_time_count_ % FRAME_TIME_SAMPLES == 0) {
+                auto samples = frame_time_us_;
+                auto p99 = samples.begin() + (FRAME_TIME_SAMPLES * 99) / 100;
+                std::nth_element(samples.begin(), p99, samples.end());
+                frame_time_p99_ns_ = uint64_t(*p99) * 1000;
+            }
+        }
+        last_end_frame_tp_ = now;
+    }
 
     vk_current_frame_ = (vk_current_frame_ + 1) % VK_MAX_FRAMES_IN_FLIGHT;
 }
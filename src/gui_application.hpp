@@ -18,6 +18,7 @@
 #include "vulkan/vulkan_swapchain.hpp"
 #include "vulkan/vulkan_texture.hpp"
 #include "device_transform.hpp"
+#include <array>
 #include <memory>
 #include <string>
 #include <vector>
@@ -425,6 +426,7 @@ private:
     // Vulkan backend
     bool createVulkanResources(HWND hwnd);
     void cleanupVulkanResources();
+    bool createSwapchainSemaphores();
     bool setupImGuiVulkan(HWND hwnd);
     void vulkanBeginFrame();
     void vulkanEndFrame();
@@ -484,10 +486,12 @@ private:
     VkDescriptorPool      vk_descriptor_pool_ = VK_NULL_HANDLE;
     VkCommandPool         vk_command_pool_ = VK_NULL_HANDLE;
     std::vector<VkCommandBuffer> vk_command_buffers_;
-    std::vector<VkSemaphore>     vk_image_available_;
-    std::vector<VkSemaphore>     vk_render_finished_;
+    std::vector<VkSemaphore>     vk_image_available_;  // acquire pool, imageCount + 1, rotated
+    std::vector<VkSemaphore>     vk_render_finished_;  // one per swapchain image
     std::vector<VkFence>         vk_in_flight_;
     uint32_t              vk_current_frame_ = 0;
+    uint32_t              vk_acquire_sem_next_ = 0;  // next vk_image_available_ slot
+    uint32_t              vk_acquire_sem_used_ = 0;  // this frame's slot, waited on by the submit
     static constexpr uint32_t VK_MAX_FRAMES_IN_FLIGHT = 2;
     uint32_t              vk_current_image_index_ = 0;
     bool vulkan_initialized_ = false;
@@ -583,6 +587,15 @@ private:
 
     bool frame_valid_{false};  // Set by vulkanBeginFrame, guards frame ops
 
+    // Adaptive fence timeout (render thread only): vulkanEndFrame records frame
+    // intervals, and each full window refreshes the p99 that vulkanBeginFrame
+    // scales into its vkWaitForFences timeout
+    static constexpr size_t FRAME_TIME_SAMPLES = 128;
+    std::array<uint32_t, FRAME_TIME_SAMPLES> frame_time_us_{};
+    size_t frame_time_count_ = 0;
+    uint64_t frame_time_p99_ns_ = 0;  // 0 until the first full window
+    std::chrono::steady_clock::time_point last_end_frame_tp_{};
+
 
     // Freeze diagnostics (main thread)
     std::atomic<uint64_t> present_count_{0};
@@ -35,6 +35,8 @@ extern "C" int stbi_write_jpg_to_func(void(*func)(void*,void*,int), void* contex
 
 
 #include <algorithm>
+#include <cctype>
+#include <chrono>
 #include <sstream>
 #include <cstdio>
 
@@ -122,6 +124,13 @@ static std::string run_adb_cmd(const std::string& adb_id, const std::string& cmd
     return result;
 }
 
+// ---------------------------------------------------------------------------
+// Binary side channel: a handler may leave raw bytes here (and put their length
+// in result.binary); handle_client sends them right after the JSON line.
+// Per client thread, so concurrent clients never see each other's payload.
+// ---------------------------------------------------------------------------
+static thread_local std::string t_binary_payload;
+
 // ---------------------------------------------------------------------------
 // JSON helpers
 // ---------------------------------------------------------------------------
@@ -231,6 +240,7 @@ bool MacroApiServer::start(int port) {
                 entry.width  = width;
                 entry.height = height;
                 entry.frame_id = e.frame_id;
+                frame_cv_.notify_all();
             });
         MLOG_INFO("macro_api", "Frame cache: subscribed to FrameReadyEvent");
     }
@@ -254,6 +264,12 @@ void MacroApiServer::stop() {
 
     if (server_thread_.joinable()) server_thread_.join();
 
+    // Wake clients blocked in wait_for_text so they can return
+    {
+        std::lock_guard<std::mutex> lk(jpeg_cache_mutex_);
+        frame_cv_.notify_all();
+    }
+
     // Join client threads
     std::lock_guard<std::mutex> lk(clients_mutex_);
     for (auto& t : client_threads_) {
@@ -333,8 +349,13 @@ void MacroApiServer::handle_client(SOCKET client_sock) {
             if (!line.empty() && line.back() == '\r') line.pop_back();
             if (line.empty()) continue;
 
+            t_binary_payload.clear();
             std::string response = dispatch(line);
             response += "\n";
+            if (!t_binary_payload.empty()) {
+                response += t_binary_payload;   // same send loop, no base64 inflation
+                std::string().swap(t_binary_payload);   // release the image buffer
+            }
 
             // Send response
             int total = 0;
@@ -370,6 +391,36 @@ std::string MacroApiServer::dispatch(const std::string& json_line) {
         if (method == "list_devices") {
             return make_result(id, handle_list_devices());
         }
+        if (method == "batch") {
+            // params.ops = [{"method": ..., "params": {...}}, ...]
+            // Runs ops in order, one response per op; stops at the first error.
+            // Saves one client round trip per op for straight-line macros.
+            auto ops = params.value("ops", json::array());
+            if (!ops.is_array()) {
+                return make_error(id, -2, "batch: ops must be an array");
+            }
+            std::string results = "[";
+            for (size_t i = 0; i < ops.size(); ++i) {
+                const auto& op = ops[i];
+                std::string op_method = op.value("method", "");
+                if (op_method == "batch") {
+                    return make_error(id, -2, "batch: nested batch not allowed");
+                }
+                if (op.contains("params") && op["params"].value("binary", false)) {
+                    return make_error(id, -2, "batch: binary responses not allowed");
+                }
+                json sub = {{"id", static_cast<int>(i)}, {"method", op_method},
+                            {"params", op.value("params", json::object())}};
+                std::string resp = dispatch(sub.dump());
+                if (i) results += ",";
+                results += resp;
+                // make_result/make_error: {"id":N,"result":...} / {"id":N,"error":...}
+                size_t comma = resp.find(',');
+                if (comma != std::string::npos && resp.compare(comma + 1, 8, "\"error\":") == 0) break;
+            }
+            results += "]";
+            return make_result(id, "{\"results\":" + results + "}");
+        }
 
         // All other methods require device_id
         std::string device_id = params.value("device_id", "");
@@ -417,7 +468,7 @@ std::string MacroApiServer::dispatch(const std::string& json_line) {
             return make_result(id, handle_force_stop(device_id, params.value("package", "")));
         }
         if (method == "screenshot") {
-            return make_result(id, handle_screenshot(device_id));
+            return make_result(id, handle_screenshot(device_id, params.value("binary", false)));
         }
         if (method == "normalize_coords") {
             return make_result(id, handle_normalize_coords(device_id,
@@ -429,6 +480,10 @@ std::string MacroApiServer::dispatch(const std::string& json_line) {
                 params.value("x_norm", 0.0), params.value("y_norm", 0.0),
                 params.value("prefer_space", std::string("preview"))));
         }
+        if (method == "wait_for_text") {
+            return make_result(id, handle_wait_for_text(device_id, params.value("text", ""),
+                params.value("timeout_sec", 10.0), params.value("interval_sec", 1.0)));
+        }
         if (method == "video_route") {
             return make_result(id, handle_video_route(device_id,
                 params.value("route", std::string("wifi")),
@@ -456,9 +511,17 @@ std::string MacroApiServer::dispatch(const std::string& json_line) {
         if (method == "ocr_find_text") {
             return make_result(id, handle_ocr_find_text(device_id, params.value("query", "")));
         }
+        if (method == "ocr_find_text_raw") {
+            return make_result(id, handle_ocr_find_text_raw(device_id, params.value("query", ""),
+                                                            params.value("binary", false)));
+        }
         if (method == "ocr_has_text") {
             return make_result(id, handle_ocr_has_text(device_id, params.value("query", "")));
         }
+        if (method == "ocr_watch") {
+            return make_result(id, handle_ocr_watch(device_id, params.value("query", ""),
+                params.value("timeout_sec", 10.0), params.value("interval_sec", 1.0)));
+        }
         if (method == "ocr_tap_text") {
             return make_result(id, handle_ocr_tap_text(device_id, params.value("query", "")));
         }
@@ -1124,7 +1187,7 @@ std::string MacroApiServer::handle_video_route(const std::string& device_id, con
     return "{\"status\":\"error\",\"message\":\"video_route failed\"}";
 }
 
-std::string MacroApiServer::handle_screenshot(const std::string& device_id) {
+std::string MacroApiServer::handle_screenshot(const std::string& device_id, bool binary) {
     // Fast path: JPEG郢ｧ・ｭ郢晢ｽ｣郢昴・縺咏ｹ晢ｽ･邵ｺ荵晢ｽ蛾恆譁絶・ (MultiDeviceReceiver郢ｧ・ｳ郢晢ｽｼ郢晢ｽｫ郢晁・繝｣郢ｧ・ｯ邵ｺ・ｧ陝ｶ・ｸ隴弱ｈ蟲ｩ隴・ｽｰ)
     {
         std::string hw_id = device_id;
@@ -1138,21 +1201,28 @@ std::string MacroApiServer::handle_screenshot(const std::string& device_id) {
         std::lock_guard<std::mutex> lk(jpeg_cache_mutex_);
         auto it = jpeg_cache_.find(hw_id);
         if (it != jpeg_cache_.end() && !it->second.jpeg.empty()) {
-            static const char b64c[] =
-                "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/";
-            auto& jpeg_buf = it->second.jpeg;
-            std::string enc; long fs=(long)jpeg_buf.size();
-            enc.reserve(((fs+2)/3)*4);
-            for (long i=0; i<fs; i+=3) {
-                unsigned int n=(unsigned int)jpeg_buf[i]<<16;
-                if(i+1<fs) n|=(unsigned int)jpeg_buf[i+1]<<8;
-                if(i+2<fs) n|=(unsigned int)jpeg_buf[i+2];
-                enc+=b64c[(n>>18)&0x3F]; enc+=b64c[(n>>12)&0x3F];
-                enc+=(i+1<fs)?b64c[(n>>6)&0x3F]:'=';
-                enc+=(i+2<fs)?b64c[n&0x3F]:'=';
-            }
             json r;
-            r["status"]="ok"; r["base64"]=enc;
+            if (binary) {
+                t_binary_payload.assign(it->second.jpeg.begin(), it->second.jpeg.end());
+                r["binary"] = t_binary_payload.size();
+                r["format"] = "jpeg";
+            } else {
+                static const char b64c[] =
+                    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/";
+                auto& jpeg_buf = it->second.jpeg;
+                std::string enc; long fs=(long)jpeg_buf.size();
+                enc.reserve(((fs+2)/3)*4);
+                for (long i=0; i<fs; i+=3) {
+                    unsigned int n=(unsigned int)jpeg_buf[i]<<16;
+                    if(i+1<fs) n|=(unsigned int)jpeg_buf[i+1]<<8;
+                    if(i+2<fs) n|=(unsigned int)jpeg_buf[i+2];
+                    enc+=b64c[(n>>18)&0x3F]; enc+=b64c[(n>>12)&0x3F];
+                    enc+=(i+1<fs)?b64c[(n>>6)&0x3F]:'=';
+                    enc+=(i+2<fs)?b64c[n&0x3F]:'=';
+                }
+                r["base64"]=enc;
+            }
+            r["status"]="ok";
             r["width"]=it->second.width; r["height"]=it->second.height;
             r["preview_w"]=it->second.width; r["preview_h"]=it->second.height;
             r["coord_space"]="preview";
@@ -1209,18 +1279,26 @@ std::string MacroApiServer::handle_screenshot(const std::string& device_id) {
     fclose(f);
     DeleteFileA(local_path.c_str());
 
-    // Simple base64 encoding
-    static const char b64[] = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/";
-    std::string encoded;
-    encoded.reserve(((file_size + 2) / 3) * 4);
-    for (long i = 0; i < file_size; i += 3) {
-        unsigned int n = (data[i] << 16);
-        if (i + 1 < file_size) n |= (data[i + 1] << 8);
-        if (i + 2 < file_size) n |= data[i + 2];
-        encoded += b64[(n >> 18) & 0x3F];
-        encoded += b64[(n >> 12) & 0x3F];
-        encoded += (i + 1 < file_size) ? b64[(n >> 6) & 0x3F] : '=';
-        encoded += (i + 2 < file_size) ? b64[n & 0x3F] : '=';
+    json r;
+    if (binary) {
+        t_binary_payload.assign(data.begin(), data.end());
+        r["binary"] = t_binary_payload.size();
+        r["format"] = "png";
+    } else {
+        // Simple base64 encoding
+        static const char b64[] = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/";
+        std::string encoded;
+        encoded.reserve(((file_size + 2) / 3) * 4);
+        for (long i = 0; i < file_size; i += 3) {
+            unsigned int n = (data[i] << 16);
+            if (i + 1 < file_size) n |= (data[i + 1] << 8);
+            if (i + 2 < file_size) n |= data[i + 2];
+            encoded += b64[(n >> 18) & 0x3F];
+            encoded += b64[(n >> 12) & 0x3F];
+            encoded += (i + 1 < file_size) ? b64[(n >> 6) & 0x3F] : '=';
+            encoded += (i + 2 < file_size) ? b64[n & 0x3F] : '=';
+        }
+        r["base64"] = encoded;
     }
 
     // Get screen dimensions
@@ -1240,14 +1318,111 @@ std::string MacroApiServer::handle_screenshot(const std::string& device_id) {
         }
     }
 
-    json r;
     r["status"] = "ok";
-    r["base64"] = encoded;
     r["width"]  = width;
     r["height"] = height;
     return r.dump();
 }
 
+// ---------------------------------------------------------------------------
+// wait_for_text: server-side long-poll over uiautomator dumps. One RPC replaces
+// the client's dump-per-interval loop; checks re-run early when a new mirrored
+// frame arrives (screen changed), otherwise every interval_sec.
+// ---------------------------------------------------------------------------
+static std::string ascii_lower(std::string s) {
+    for (auto& c : s) c = static_cast<char>(std::tolower(static_cast<unsigned char>(c)));
+    return s;
+}
+
+static std::string xml_unescape(const std::string& v) {
+    if (v.find('&') == std::string::npos) return v;
+    std::string out;
+    out.reserve(v.size());
+    for (size_t i = 0; i < v.size(); ++i) {
+        if (v[i] == '&') {
+            static const std::pair<const char*, char> ents[] = {
+                {"&amp;", '&'}, {"&lt;", '<'}, {"&gt;", '>'}, {"&quot;", '"'}, {"&apos;", '\''}};
+            bool hit = false;
+            for (auto& e : ents) {
+                size_t n = std::char_traits<char>::length(e.first);
+                if (v.compare(i, n, e.first) == 0) { out += e.second; i += n - 1; hit = true; break; }
+            }
+            if (hit) continue;
+        }
+        out += v[i];
+    }
+    return out;
+}
+
+// True if any text="..." / content-desc="..." attribute contains needle_lower
+static bool ui_dump_contains_text(const std::string& xml, const std::string& needle_lower) {
+    for (const char* attr : {" text=\"", " content-desc=\""}) {
+        size_t alen = std::char_traits<char>::length(attr);
+        for (size_t pos = xml.find(attr); pos != std::string::npos; pos = xml.find(attr, pos)) {
+            pos += alen;
+            size_t end = xml.find('"', pos);
+            if (end == std::string::npos) break;
+            if (end > pos &&
+                ascii_lower(xml_unescape(xml.substr(pos, end - pos))).find(needle_lower) != std::string::npos)
+                return true;
+            pos = end;
+        }
+    }
+    return false;
+}
+
+std::string MacroApiServer::handle_wait_for_text(const std::string& device_id,
+    const std::string& text, double timeout_sec, double interval_sec) {
+    using clock = std::chrono::steady_clock;
+    std::string adb_id = resolve_device_id(strip_route_prefix(device_id));
+    if (adb_id.empty()) {
+        json r; r["status"] = "error"; r["error"] = "device not found";
+        return r.dump();
+    }
+    std::string hw_id = resolve_hw_id(strip_route_prefix(device_id));
+    std::string needle = ascii_lower(text);
+
+    const auto start = clock::now();
+    const auto deadline = start + std::chrono::duration_cast<clock::duration>(
+        std::chrono::duration<double>(std::max(0.0, timeout_sec)));
+    const auto interval = std::chrono::duration_cast<clock::duration>(
+        std::chrono::duration<double>(std::max(0.05, interval_sec)));
+    const auto min_gap = std::chrono::milliseconds(100);   // cap dump rate on busy screens
+
+    int checks = 0;
+    bool found = false;
+    while (running_.load()) {
+        ++checks;
+        auto xml = run_adb_cmd(adb_id, "exec-out uiautomator dump /dev/tty");
+        if (ui_dump_contains_text(xml, needle)) { found = true; break; }
+
+        auto now = clock::now();
+        if (now >= deadline) break;
+
+        uint64_t seen = 0;
+        {
+            std::unique_lock<std::mutex> lk(jpeg_cache_mutex_);
+            auto it = jpeg_cache_.find(hw_id);
+            if (it != jpeg_cache_.end()) seen = it->second.frame_id;
+        }
+        std::this_thread::sleep_for(std::min<clock::duration>(min_gap, deadline - now));
+        std::unique_lock<std::mutex> lk(jpeg_cache_mutex_);
+        frame_cv_.wait_until(lk, std::min(now + interval, deadline), [&] {
+            if (!running_.load()) return true;
+            auto it = jpeg_cache_.find(hw_id);
+            return it != jpeg_cache_.end() && it->second.frame_id != seen;
+        });
+    }
+
+    json r;
+    r["status"] = "ok";
+    r["found"] = found;
+    r["checks"] = checks;
+    r["elapsed_ms"] = static_cast<int>(std::chrono::duration_cast<std::chrono::milliseconds>(
+        clock::now() - start).count());
+    return r.dump();
+}
+
 // ---------------------------------------------------------------------------
 // OCR handlers (Tesseract驍ｨ讙守ｽｰ郢昴・縺冗ｹｧ・ｹ郢晞メ・ｪ蟠趣ｽｭ繝ｻ
 // ---------------------------------------------------------------------------
@@ -1321,6 +1496,41 @@ std::string MacroApiServer::handle_ocr_find_text(const std::string& device_id,
     return r.dump();
 }
 
+// Columnar variant of ocr_find_text: texts plus one flat x1,y1,x2,y2 array
+// (N*4 int32, little-endian when binary) so clients can compute centers with
+// a single vectorized op instead of walking one JSON object per match.
+std::string MacroApiServer::handle_ocr_find_text_raw(const std::string& device_id,
+    const std::string& query, bool binary) {
+    ensure_ocr_initialized();
+    std::string adb_id = resolve_hw_id(strip_route_prefix(device_id));
+
+    auto matches = analyzer().findText(adb_id, query);
+
+    std::vector<int32_t> boxes;
+    boxes.reserve(matches.size() * 4);
+    json texts = json::array();
+    for (auto& m : matches) {
+        boxes.push_back(m.x1);
+        boxes.push_back(m.y1);
+        boxes.push_back(m.x2);
+        boxes.push_back(m.y2);
+        texts.push_back(m.text);
+    }
+
+    json r;
+    r["texts"] = texts;
+    r["count"] = (int)matches.size();
+    if (binary) {
+        t_binary_payload.assign(reinterpret_cast<const char*>(boxes.data()),
+                                boxes.size() * sizeof(int32_t));
+        r["binary"] = t_binary_payload.size();
+        r["format"] = "int32x4";
+    } else {
+        r["bboxes"] = boxes;
+    }
+    return r.dump();
+}
+
 std::string MacroApiServer::handle_ocr_has_text(const std::string& device_id,
     const std::string& query) {
     ensure_ocr_initialized();
@@ -1357,6 +1567,74 @@ std::string MacroApiServer::handle_ocr_tap_text(const std::string& device_id,
     return r.dump();
 }
 
+// ocr_watch: server-side counterpart of the client's ocr_has_text poll loop.
+// Blocks until query is seen or timeout_sec elapses, re-checking per mirrored
+// frame. Each frame is OCR'd at most once; concurrent watchers on the same
+// device reuse that result instead of running Tesseract per client per tick.
+OcrResult MacroApiServer::ocr_for_latest_frame(const std::string& adb_id) {
+    auto frame = analyzer().getFrame(adb_id);
+    // Held across the OCR: a second watcher waits here, then hits the cache.
+    // Tesseract is serialized inside FrameAnalyzer anyway, so this adds no stall.
+    std::lock_guard<std::mutex> lk(ocr_watch_mutex_);
+    auto& entry = ocr_watch_cache_[adb_id];
+    if (frame && entry.frame == frame && entry.frame_id == frame->frame_id)
+        return entry.result;
+    entry.result   = analyzer().analyzeText(adb_id);
+    entry.frame    = frame;
+    entry.frame_id = frame ? frame->frame_id : 0;
+    return entry.result;
+}
+
+std::string MacroApiServer::handle_ocr_watch(const std::string& device_id,
+    const std::string& query, double timeout_sec, double interval_sec) {
+    using clock = std::chrono::steady_clock;
+    ensure_ocr_initialized();
+    std::string adb_id = resolve_hw_id(strip_route_prefix(device_id));
+
+    const auto start = clock::now();
+    const auto deadline = start + std::chrono::duration_cast<clock::duration>(
+        std::chrono::duration<double>(std::max(0.0, timeout_sec)));
+    const auto interval = std::chrono::duration_cast<clock::duration>(
+        std::chrono::duration<double>(std::max(0.05, interval_sec)));
+
+    int checks = 0;
+    std::vector<OcrWord> matches;
+    while (running_.load()) {
+        ++checks;
+        uint64_t seen = 0;
+        {
+            std::lock_guard<std::mutex> lk(jpeg_cache_mutex_);
+            auto it = jpeg_cache_.find(adb_id);
+            if (it != jpeg_cache_.end()) seen = it->second.frame_id;
+        }
+        matches = ocr_for_latest_frame(adb_id).findText(query);
+        if (!matches.empty()) break;
+
+        auto now = clock::now();
+        if (now >= deadline) break;
+        // Next check on the next mirrored frame; interval_sec caps the wait
+        // when no frames arrive (static screen, or mirroring not running)
+        std::unique_lock<std::mutex> lk(jpeg_cache_mutex_);
+        frame_cv_.wait_until(lk, std::min(now + interval, deadline), [&] {
+            if (!running_.load()) return true;
+            auto it = jpeg_cache_.find(adb_id);
+            return it != jpeg_cache_.end() && it->second.frame_id != seen;
+        });
+    }
+
+    json r;
+    r["status"] = "ok";
+    r["found"]  = !matches.empty();
+    if (!matches.empty()) {
+        r["x"] = (matches[0].x1 + matches[0].x2) / 2;
+        r["y"] = (matches[0].y1 + matches[0].y2) / 2;
+    }
+    r["checks"] = checks;
+    r["elapsed_ms"] = static_cast<int>(std::chrono::duration_cast<std::chrono::milliseconds>(
+        clock::now() - start).count());
+    return r.dump();
+}
+
 #endif // MIRAGE_OCR_ENABLED
 
 } // namespace mirage
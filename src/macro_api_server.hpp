@@ -9,6 +9,8 @@
 // Protocol: Each request is one line of JSON terminated by \n
 // Request:  {"id": 1, "method": "tap", "params": {"device_id": "abc", "x": 540, "y": 300}}
 // Response: {"id": 1, "result": {"status": "ok"}} or {"id": 1, "error": {"code": -1, "message": "..."}}
+// Binary:   screenshot with params.binary=true replies with result.binary=N
+//           and the N raw image bytes follow the response line (no base64).
 // =============================================================================
 
 #include <string>
@@ -16,10 +18,14 @@
 #include <atomic>
 #include "event_bus.hpp"
 #include <mutex>
+#include <condition_variable>
 #include <map>
 #include <vector>
 #include <vector>
 #include "ai/ui_finder.hpp"
+#ifdef MIRAGE_OCR_ENABLED
+#include "frame_analyzer.hpp"
+#endif
 
 // WinSock forward declaration 繧帝∩縺代ヾOCKET蝙九□縺大ｮ夂ｾｩ
 #ifndef _WINSOCK2API_
@@ -67,10 +73,11 @@ private:
     std::string handle_click_text(const std::string& device_id, const std::string& text);
     std::string handle_launch_app(const std::string& device_id, const std::string& package);
     std::string handle_force_stop(const std::string& device_id, const std::string& package);
-    std::string handle_screenshot(const std::string& device_id);
+    std::string handle_screenshot(const std::string& device_id, bool binary = false);
     std::string handle_normalize_coords(const std::string& device_id, int x, int y, int basis_w, int basis_h);
     std::string handle_resolve_coords(const std::string& device_id, double x_norm, double y_norm, const std::string& prefer_space);
     std::string handle_video_route(const std::string& device_id, const std::string& route, const std::string& host, int port);
+    std::string handle_wait_for_text(const std::string& device_id, const std::string& text, double timeout_sec, double interval_sec);
 
         // UiFinder - ADB fallback for click_text/click_id
     std::string handle_ui_find(const std::string& device_id, const std::string& query, const std::string& strategy);
@@ -82,9 +89,21 @@ private:
 #ifdef MIRAGE_OCR_ENABLED
     std::string handle_ocr_analyze(const std::string& device_id);
     std::string handle_ocr_find_text(const std::string& device_id, const std::string& query);
+    std::string handle_ocr_find_text_raw(const std::string& device_id, const std::string& query, bool binary);
     std::string handle_ocr_has_text(const std::string& device_id, const std::string& query);
     std::string handle_ocr_tap_text(const std::string& device_id, const std::string& query);
+    std::string handle_ocr_watch(const std::string& device_id, const std::string& query, double timeout_sec, double interval_sec);
     void ensure_ocr_initialized();
+
+    // ocr_watch: last OCR result per device, reused while the frame is unchanged
+    struct OcrWatchCache {
+        std::shared_ptr<SharedFrame> frame;
+        uint64_t frame_id = 0;
+        OcrResult result;
+    };
+    OcrResult ocr_for_latest_frame(const std::string& adb_id);
+    std::mutex ocr_watch_mutex_;
+    std::map<std::string, OcrWatchCache> ocr_watch_cache_;
 #endif
 
     // JSON蠢懃ｭ斐・繝ｫ繝代・
@@ -103,6 +122,7 @@ private:
     };
     mutable std::mutex jpeg_cache_mutex_;
     std::map<std::string, JpegCache> jpeg_cache_;
+    std::condition_variable frame_cv_;   // notified per cached frame (wait_for_text wakeups)
     std::atomic<bool> frame_cb_registered_{false};
     mirage::SubscriptionHandle frame_sub_;
 
@@ -1,5 +1,6 @@
 #include "mirror_receiver.hpp"
 #include "video/unified_decoder.hpp"
+#include "video/annexb_scan.hpp"
 
 #ifdef USE_FFMPEG
 #include "video/h264_decoder.hpp"
@@ -864,14 +865,9 @@ void MirrorReceiver::process_raw_h264(const uint8_t* data, size_t len) {
 }
 
 // Find H.264 Annex B start code (00 00 00 01 or 00 00 01) starting from offset
+// Block scan that skips zero-free runs (see video/annexb_scan.hpp)
 size_t MirrorReceiver::find_start_code(const uint8_t* data, size_t len, size_t offset) {
-  for (size_t i = offset; i + 3 <= len; i++) {
-    if (data[i] == 0 && data[i+1] == 0) {
-      if (i + 3 < len && data[i+2] == 0 && data[i+3] == 1) return i;  // 00 00 00 01
-      if (data[i+2] == 1) return i;  // 00 00 01
-    }
-  }
-  return (size_t)-1;
+  return mirage::video::findAnnexBStartCode(data, len, offset);
 }
 
 void MirrorReceiver::process_rtp_packet(const uint8_t* data, size_t len) {
@@ -15,6 +15,7 @@
 #else
 #include <sys/socket.h>
 #include <netinet/in.h>
+#include <netinet/tcp.h>
 #include <arpa/inet.h>
 #include <unistd.h>
 #define SOCKET int
@@ -28,9 +29,11 @@
 #include <array>
 #include <chrono>
 #include <memory>
+#include <random>
 #include <algorithm>
 #include <functional>
 #include <cstdlib>
+#include <string_view>
 
 #include "vid0_parser.hpp"  // Common VID0 parser
 
@@ -51,6 +54,7 @@ using UniquePipe = std::unique_ptr<FILE, PipeDeleter>;
 // Execute command without showing console window, returns output
 std::string execCommandHidden(const std::string& cmd) {
     std::string result;
+    result.reserve(8192);  // adb output is short: one allocation for most calls
 
 #ifdef _WIN32
     SECURITY_ATTRIBUTES sa = {};
@@ -80,11 +84,10 @@ std::string execCommandHidden(const std::string& cmd) {
         CloseHandle(hWritePipe);
         hWritePipe = nullptr;
 
-        char buffer[4096];
+        char buffer[8192];
         DWORD bytesRead;
-        while (ReadFile(hReadPipe, buffer, sizeof(buffer) - 1, &bytesRead, nullptr) && bytesRead > 0) {
-            buffer[bytesRead] = '\0';
-            result += buffer;
+        while (ReadFile(hReadPipe, buffer, sizeof(buffer), &bytesRead, nullptr) && bytesRead > 0) {
+            result.append(buffer, bytesRead);
         }
 
         WaitForSingleObject(pi.hProcess, 30000);
@@ -97,15 +100,22 @@ std::string execCommandHidden(const std::string& cmd) {
 #else
     UniquePipe pipe(popen(cmd.c_str(), "r"));
     if (pipe) {
-        char buffer[4096];
-        while (fgets(buffer, sizeof(buffer), pipe.get()) != nullptr) {
-            result += buffer;
+        char buffer[8192];
+        size_t n;
+        while ((n = fread(buffer, 1, sizeof(buffer), pipe.get())) > 0) {
+            result.append(buffer, n);
         }
     }
 #endif
 
     return result;
 }
+
+// adb reports a failure on its first line; no need to scan the whole output
+bool adbReportedError(const std::string& out) {
+    return std::string_view(out).substr(0, 256).find("error") != std::string_view::npos;
+}
+
 static int computePolicyMaxSizeFromNative(int native_w, int native_h, bool reduced_mode) {
     const int short_side = std::min(native_w, native_h);
     const int long_side = std::max(native_w, native_h);
@@ -256,7 +266,7 @@ bool TcpVideoReceiver::setupAdbForward(const std::string& serial, int local_port
     std::string cmd = "adb -s " + serial + " forward tcp:"
                     + std::to_string(local_port) + " tcp:50100 2>&1";
     std::string result = execCommandHidden(cmd);
-    if (!result.empty() && result.find("error") != std::string::npos) {
+    if (adbReportedError(result)) {
         MLOG_ERROR("tcpvideo", "adb forward failed: %s", result.c_str());
         return false;
     }
@@ -278,16 +288,20 @@ void TcpVideoReceiver::receiverThread(const std::string& hardware_id,
     int reconnect_delay_ms = RECONNECT_INIT_MS;
     int no_data_count = 0;
     bool forward_established = false;  // forward縺悟､悶ｌ縺溷庄閭ｽ諤ｧ縺後≠繧九・縺ｧ谺｡蝗槫・險ｭ螳・
+    // Full jitter: sleep a uniform [0, reconnect_delay_ms], the cap doubling per
+    // failure. Receivers hit by one shared failure (hub reset, router reboot)
+    // spread out instead of retrying in lockstep. Per-thread engine: the CRT
+    // rand() state starts from the same seed in every thread.
     auto jittered_delay = [](int delay_ms) -> int {
-        int jitter = delay_ms * (rand() % 40 - 20) / 100;
-        return delay_ms + jitter;
+        static thread_local std::mt19937 rng{std::random_device{}()};
+        return std::uniform_int_distribution<int>(0, delay_ms)(rng);
     };
 
     while (running_.load()) {
         // forward_established: 謌仙粥貂医∩縺ｪ繧画ｯ主屓 adb forward 繧ｳ繝槭Φ繝峨ｒ蜿ｩ縺九↑縺・
         if (!forward_established) {
             if (!setupAdbForward(serial, local_port)) {
-                MLOG_WARN("tcpvideo", "ADB forward failed for %s, retry in %dms", hardware_id.c_str(), reconnect_delay_ms);
+                MLOG_WARN("tcpvideo", "ADB forward failed for %s, retry within %dms", hardware_id.c_str(), reconnect_delay_ms);
                 std::this_thread::sleep_for(std::chrono::milliseconds(jittered_delay(reconnect_delay_ms)));
                 reconnect_delay_ms = std::min(reconnect_delay_ms * 2, RECONNECT_MAX_MS);
                 continue;
@@ -315,6 +329,12 @@ void TcpVideoReceiver::receiverThread(const std::string& hardware_id,
             setsockopt(sock, SOL_SOCKET, SO_SNDBUF, (const char*)&buf_size, sizeof(buf_size));
         }
 
+        // TCP_NODELAY for low latency (same as the scrcpy bridge socket)
+        {
+            int nodelay = 1;
+            setsockopt(sock, IPPROTO_TCP, TCP_NODELAY, (const char*)&nodelay, sizeof(nodelay));
+        }
+
 #ifdef _WIN32
         DWORD tv = 5000;
         setsockopt(sock, SOL_SOCKET, SO_RCVTIMEO, (const char*)&tv, sizeof(tv));
@@ -334,7 +354,7 @@ void TcpVideoReceiver::receiverThread(const std::string& hardware_id,
 #else
             int err = errno;
 #endif
-            MLOG_WARN("tcpvideo", "connect() failed for %s (port %d), retry in %dms",
+            MLOG_WARN("tcpvideo", "connect() failed for %s (port %d), retry within %dms",
                       hardware_id.c_str(), local_port, reconnect_delay_ms);
             MLOG_WARN("tcpvideo", "connect() errno=%d for %s", err, hardware_id.c_str());
             closesocket(sock);
@@ -356,19 +376,26 @@ void TcpVideoReceiver::receiverThread(const std::string& hardware_id,
 
         bool got_data = false;
 
-        std::vector<uint8_t> stream_buffer;
-        std::vector<uint8_t> recv_buf(TCP_RECV_BUF_SIZE);
+        // recv() writes straight behind the unparsed bytes - no staging copy.
+        // The parser leaves at most one partial VID0 packet, so there is always
+        // room for a full recv after it.
+        std::vector<uint8_t> stream_buffer(TCP_RECV_BUF_SIZE + mirage::video::VID0_HEADER_SIZE + mirage::video::RTP_MAX_LEN);
+        size_t fill = 0;
 
         while (running_.load()) {
-            int received = recv(sock, reinterpret_cast<char*>(recv_buf.data()),
-                               static_cast<int>(recv_buf.size()), 0);
+            int received = recv(sock, reinterpret_cast<char*>(stream_buffer.data() + fill),
+                               static_cast<int>(stream_buffer.size() - fill), 0);
             if (received > 0) {
                 if (!got_data) {
                     got_data = true;
                     reconnect_delay_ms = RECONNECT_INIT_MS;
                 }
-                stream_buffer.insert(stream_buffer.end(), recv_buf.begin(), recv_buf.begin() + received);
-                parseVid0Stream(hardware_id, stream_buffer);
+                fill += static_cast<size_t>(received);
+                size_t consumed = parseVid0Stream(hardware_id, stream_buffer.data(), fill);
+                fill -= consumed;
+                if (consumed > 0 && fill > 0) {
+                    std::memmove(stream_buffer.data(), stream_buffer.data() + consumed, fill);
+                }
             } else if (received == 0) {
                 MLOG_WARN("tcpvideo", "recv() returned 0 (peer closed) for %s", hardware_id.c_str());
                 break;
@@ -390,7 +417,7 @@ void TcpVideoReceiver::receiverThread(const std::string& hardware_id,
             if (!got_data) {
                 no_data_count++;
                 reconnect_delay_ms = std::min(reconnect_delay_ms * 2, RECONNECT_MAX_MS);
-                MLOG_INFO("tcpvideo", "No data from %s (attempt %d), backoff %dms",
+                MLOG_INFO("tcpvideo", "No data from %s (attempt %d), backoff up to %dms",
                           hardware_id.c_str(), no_data_count, reconnect_delay_ms);
 
                 // ScreenCaptureService縺悟●豁｢縺励※縺・ｌ縺ｰ閾ｪ蜍戊ｵｷ蜍輔ｒ隧ｦ縺ｿ繧・
@@ -402,7 +429,7 @@ void TcpVideoReceiver::receiverThread(const std::string& hardware_id,
 
             } else {
                 no_data_count = 0;  // Reset on successful data
-                MLOG_INFO("tcpvideo", "Reconnecting %s in %dms...", hardware_id.c_str(), reconnect_delay_ms);
+                MLOG_INFO("tcpvideo", "Reconnecting %s within %dms...", hardware_id.c_str(), reconnect_delay_ms);
             }
             std::this_thread::sleep_for(std::chrono::milliseconds(jittered_delay(reconnect_delay_ms)));
         }
@@ -411,20 +438,21 @@ void TcpVideoReceiver::receiverThread(const std::string& hardware_id,
     MLOG_INFO("tcpvideo", "Receiver thread ended: %s", hardware_id.c_str());
 }
 
-void TcpVideoReceiver::parseVid0Stream(const std::string& hardware_id,
-                                        std::vector<uint8_t>& buffer) {
+size_t TcpVideoReceiver::parseVid0Stream(const std::string& hardware_id,
+                                          const uint8_t* data, size_t len) {
     MirrorReceiver* decoder = nullptr;
     uint64_t* pkt_counter = nullptr;
     {
         std::lock_guard<std::mutex> lock(devices_mutex_);
         auto it = devices_.find(hardware_id);
-        if (it == devices_.end() || !it->second.decoder) return;
+        if (it == devices_.end() || !it->second.decoder) return len;  // nobody to feed: drop
         decoder = it->second.decoder.get();
         pkt_counter = &it->second.pkt_count;
     }
 
     // Use common VID0 parser from vid0_parser.hpp
-    auto result = mirage::video::parseVid0Packets(buffer);
+    size_t consumed = 0;
+    auto result = mirage::video::parseVid0Packets(data, len, consumed);
 
     for (const auto& pkt : result.rtp_packets) {
         (*pkt_counter)++;
@@ -438,6 +466,7 @@ void TcpVideoReceiver::parseVid0Stream(const std::string& hardware_id,
     if (result.sync_errors > 0) {
         MLOG_WARN("tcpvideo", "VID0 sync errors: %d for %s", result.sync_errors, hardware_id.c_str());
     }
+    return consumed;
 }
 
 
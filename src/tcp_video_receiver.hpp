@@ -45,7 +45,7 @@ private:
     };
 
     void receiverThread(const std::string& hardware_id, const std::string& serial, int local_port);
-    void parseVid0Stream(const std::string& hardware_id, std::vector<uint8_t>& buffer);
+    size_t parseVid0Stream(const std::string& hardware_id, const uint8_t* data, size_t len);
     bool setupAdbForward(const std::string& serial, int local_port);
     void removeAdbForward(const std::string& serial, int local_port);
 
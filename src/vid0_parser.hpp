@@ -27,42 +27,43 @@ struct ParseResult {
     bool buffer_overflow = false;
 };
 
-// Parse VID0 framed RTP packets from a byte buffer.
-// Uses efficient index-based parsing with single erase.
-// Modifies `buffer` in-place (consumed data is erased).
-inline ParseResult parseVid0Packets(std::vector<uint8_t>& buffer) {
+// Parse VID0 framed RTP packets from a caller-owned span; nothing is erased.
+// `consumed` is set to how many leading bytes the caller can drop: parsed
+// packets plus garbage skipped while resyncing. What remains is at most one
+// partial packet (VID0_HEADER_SIZE + RTP_MAX_LEN bytes).
+inline ParseResult parseVid0Packets(const uint8_t* data, size_t size, size_t& consumed) {
     ParseResult result;
 
     size_t pos = 0;
-    while (pos + VID0_HEADER_SIZE <= buffer.size()) {
-        uint32_t magic = (uint32_t(buffer[pos]) << 24) |
-                        (uint32_t(buffer[pos + 1]) << 16) |
-                        (uint32_t(buffer[pos + 2]) << 8) |
-                        uint32_t(buffer[pos + 3]);
+    while (pos + VID0_HEADER_SIZE <= size) {
+        uint32_t magic = (uint32_t(data[pos]) << 24) |
+                        (uint32_t(data[pos + 1]) << 16) |
+                        (uint32_t(data[pos + 2]) << 8) |
+                        uint32_t(data[pos + 3]);
 
         if (magic != VID0_MAGIC) {
             result.sync_errors++;
             result.magic_resync++;
             bool found = false;
-            for (size_t i = pos + 1; i + 3 < buffer.size(); i++) {
-                if (buffer[i] == 0x56 && buffer[i+1] == 0x49 &&
-                    buffer[i+2] == 0x44 && buffer[i+3] == 0x30) {
+            for (size_t i = pos + 1; i + 3 < size; i++) {
+                if (data[i] == 0x56 && data[i+1] == 0x49 &&
+                    data[i+2] == 0x44 && data[i+3] == 0x30) {
                     pos = i;
                     found = true;
                     break;
                 }
             }
             if (!found) {
-                pos = (buffer.size() > 3) ? buffer.size() - 3 : buffer.size();
+                pos = (size > 3) ? size - 3 : size;
                 break;
             }
             continue;
         }
 
-        uint32_t pkt_len = (uint32_t(buffer[pos + 4]) << 24) |
-                          (uint32_t(buffer[pos + 5]) << 16) |
-                          (uint32_t(buffer[pos + 6]) << 8) |
-                          uint32_t(buffer[pos + 7]);
+        uint32_t pkt_len = (uint32_t(data[pos + 4]) << 24) |
+                          (uint32_t(data[pos + 5]) << 16) |
+                          (uint32_t(data[pos + 6]) << 8) |
+                          uint32_t(data[pos + 7]);
 
         if (pkt_len > RTP_MAX_LEN || pkt_len < RTP_MIN_LEN) {
             result.invalid_len++;
@@ -70,16 +71,27 @@ inline ParseResult parseVid0Packets(std::vector<uint8_t>& buffer) {
             continue;
         }
 
-        if (pos + VID0_HEADER_SIZE + pkt_len > buffer.size()) {
+        if (pos + VID0_HEADER_SIZE + pkt_len > size) {
             break;  // Need more data
         }
 
         result.rtp_packets.emplace_back(
-            buffer.begin() + pos + VID0_HEADER_SIZE,
-            buffer.begin() + pos + VID0_HEADER_SIZE + pkt_len);
+            data + pos + VID0_HEADER_SIZE,
+            data + pos + VID0_HEADER_SIZE + pkt_len);
         pos += VID0_HEADER_SIZE + pkt_len;
     }
 
+    consumed = pos;
+    return result;
+}
+
+// Parse VID0 framed RTP packets from a byte buffer.
+// Uses efficient index-based parsing with single erase.
+// Modifies `buffer` in-place (consumed data is erased).
+inline ParseResult parseVid0Packets(std::vector<uint8_t>& buffer) {
+    size_t pos = 0;
+    ParseResult result = parseVid0Packets(buffer.data(), buffer.size(), pos);
+
     // Single erase at the end (O(n) once instead of multiple times)
     if (pos > 0) {
         buffer.erase(buffer.begin(), buffer.begin() + pos);
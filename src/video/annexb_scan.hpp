@@ -0,0 +1,58 @@
+// =============================================================================
+// MirageSystem - H.264 Annex B Start Code Scanner
+// =============================================================================
+// Finds 00 00 01 / 00 00 00 01 start codes. Every start code begins with a
+// zero byte, so whole blocks without one are skipped 16 bytes at a time
+// (SSE2) or 8 at a time (SWAR on uint64_t words); only the bytes around a
+// zero are examined one by one.
+// =============================================================================
+#pragma once
+#include <cstdint>
+#include <cstddef>
+#include <cstring>
+
+#if defined(__SSE2__) || defined(_M_X64) || (defined(_M_IX86_FP) && _M_IX86_FP >= 2)
+#include <emmintrin.h>
+#define MIRAGE_ANNEXB_SSE2 1
+#endif
+
+namespace mirage::video {
+
+static constexpr size_t ANNEXB_NPOS = static_cast<size_t>(-1);
+
+// Index of the first zero byte in data[i, end), or end.
+inline size_t findZeroByte(const uint8_t* data, size_t i, size_t end) {
+#ifdef MIRAGE_ANNEXB_SSE2
+    const __m128i zero = _mm_setzero_si128();
+    for (; i + 16 <= end; i += 16) {
+        __m128i v = _mm_loadu_si128(reinterpret_cast<const __m128i*>(data + i));
+        if (_mm_movemask_epi8(_mm_cmpeq_epi8(v, zero))) break;
+    }
+#else
+    for (; i + 8 <= end; i += 8) {
+        uint64_t v;
+        std::memcpy(&v, data + i, 8);
+        // Nonzero iff some byte of v is zero
+        if ((v - 0x0101010101010101ULL) & ~v & 0x8080808080808080ULL) break;
+    }
+#endif
+    while (i < end && data[i] != 0) ++i;
+    return i;
+}
+
+// Offset of the first start code at or after `offset`, or ANNEXB_NPOS.
+// A 00 00 00 01 code is reported at its first zero.
+inline size_t findAnnexBStartCode(const uint8_t* data, size_t len, size_t offset) {
+    if (len < 3) return ANNEXB_NPOS;
+    for (size_t i = offset; i + 3 <= len; ++i) {
+        i = findZeroByte(data, i, len - 2);
+        if (i + 3 > len) break;
+        if (data[i + 1] == 0) {
+            if (data[i + 2] == 1) return i;                                       // 00 00 01
+            if (i + 3 < len && data[i + 2] == 0 && data[i + 3] == 1) return i;    // 00 00 00 01
+        }
+    }
+    return ANNEXB_NPOS;
+}
+
+} // namespace mirage::video
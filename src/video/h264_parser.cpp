@@ -3,6 +3,7 @@
 // =============================================================================
 
 #include "h264_parser.hpp"
+#include "annexb_scan.hpp"
 
 namespace mirage::video {
 
@@ -46,15 +47,8 @@ std::vector<NalUnit> H264Parser::parseAnnexB(const uint8_t* data, size_t size) {
 
         // Find end of NAL (next start code or end of data)
         size_t nal_start = pos + 1;  // After NAL header
-        size_t nal_end = size;
-
-        for (size_t i = nal_start; i + 2 < size; i++) {
-            if (data[i] == 0 && data[i + 1] == 0 &&
-                (data[i + 2] == 1 || (i + 3 < size && data[i + 2] == 0 && data[i + 3] == 1))) {
-                nal_end = i;
-                break;
-            }
-        }
+        size_t nal_end = findAnnexBStartCode(data, size, nal_start);
+        if (nal_end == ANNEXB_NPOS) nal_end = size;
 
         nal.rbsp_data = data + nal_start;
         nal.rbsp_size = nal_end - nal_start;
@@ -20,8 +20,11 @@ bool VulkanSwapchain::create(VulkanContext& ctx, VkSurfaceKHR surface, int w, in
 
 bool VulkanSwapchain::recreate(int w, int h) {
     if (!ctx_ || w == 0 || h == 0) return false;
-    vkDeviceWaitIdle(ctx_->device());
-    cleanupSwapchain();
+    // Only the graphics queue renders to and presents these images: drain it
+    // rather than the whole device (compute/decode queues keep running).
+    // The old swapchain itself stays alive as oldSwapchain and is retired.
+    ctx_->safeQueueWaitIdle(ctx_->graphicsQueue());
+    cleanupImageViews();
     if (!createSwapchain(w, h) || !createImageViews() || !createFramebuffers()) return false;
     MLOG_INFO("vulkan", "[Swapchain] Recreated %ux%u", extent_.width, extent_.height);
     return true;
@@ -116,8 +119,11 @@ bool VulkanSwapchain::createSwapchain(int w, int h) {
         si.imageExtent.width, si.imageExtent.height, si.minImageCount,
         (int)si.imageFormat, (int)si.presentMode);
     VkSwapchainKHR old = swapchain_;
+    swapchain_ = VK_NULL_HANDLE;
     VkResult r = vkCreateSwapchainKHR(ctx_->device(), &si, nullptr, &swapchain_);
-    if (old) vkDestroySwapchainKHR(ctx_->device(), old, nullptr);
+    // oldSwapchain is retired whether or not creation succeeded; destroy it
+    // only after in-flight presents are done with it (releaseRetired)
+    if (old) retired_.push_back({old, frame_count_});
     if (r != VK_SUCCESS) { MLOG_ERROR("vulkan", "[Swapchain] create: %d", (int)r); return false; }
 
     uint32_t n = 0;
@@ -175,12 +181,27 @@ bool VulkanSwapchain::createFramebuffers() {
     return true;
 }
 
-void VulkanSwapchain::cleanupSwapchain() {
+void VulkanSwapchain::releaseRetired(uint32_t frames_in_flight) {
+    if (!ctx_) return;
+    ++frame_count_;
+    while (!retired_.empty() && frame_count_ - retired_.front().frame > frames_in_flight) {
+        vkDestroySwapchainKHR(ctx_->device(), retired_.front().swapchain, nullptr);
+        retired_.erase(retired_.begin());
+    }
+}
+
+void VulkanSwapchain::cleanupImageViews() {
     for (auto fb : framebuffers_) if (fb) vkDestroyFramebuffer(ctx_->device(), fb, nullptr);
     framebuffers_.clear();
     for (auto v : image_views_) if (v) vkDestroyImageView(ctx_->device(), v, nullptr);
     image_views_.clear();
+}
+
+void VulkanSwapchain::cleanupSwapchain() {
+    cleanupImageViews();
     if (swapchain_) { vkDestroySwapchainKHR(ctx_->device(), swapchain_, nullptr); swapchain_ = VK_NULL_HANDLE; }
+    for (auto& r : retired_) vkDestroySwapchainKHR(ctx_->device(), r.swapchain, nullptr);
+    retired_.clear();
     images_.clear();
 }
 
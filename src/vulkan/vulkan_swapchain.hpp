@@ -16,6 +16,9 @@ public:
     bool create(VulkanContext& ctx, VkSurfaceKHR surface, int width, int height);
     bool recreate(int width, int height);
     void destroy();
+    // Call once per presented frame: destroys swapchains retired by recreate()
+    // once more than frames_in_flight frames have been presented since
+    void releaseRetired(uint32_t frames_in_flight);
 
     VkSwapchainKHR   swapchain()        const { return swapchain_; }
     VkRenderPass     renderPass()       const { return render_pass_; }
@@ -29,6 +32,7 @@ private:
     bool createImageViews();
     bool createRenderPass();
     bool createFramebuffers();
+    void cleanupImageViews();
     void cleanupSwapchain();
 
     VulkanContext*               ctx_          = nullptr;
@@ -40,6 +44,11 @@ private:
     std::vector<VkImage>         images_;
     std::vector<VkImageView>     image_views_;
     std::vector<VkFramebuffer>   framebuffers_;
+
+    // Swapchains replaced by recreate(), kept until no present can use them
+    struct RetiredSwapchain { VkSwapchainKHR swapchain; uint64_t frame; };
+    std::vector<RetiredSwapchain> retired_;
+    uint64_t                     frame_count_  = 0;
 };
 
 } // namespace mirage::vk
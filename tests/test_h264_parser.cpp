@@ -4,9 +4,11 @@
 
 #include <gtest/gtest.h>
 #include "h264_parser.hpp"
+#include "annexb_scan.hpp"
 #include "vulkan_video_decoder.hpp"  // For H264SPS, H264PPS, H264SliceHeader
 #include <vector>
 #include <cstdint>
+#include <random>
 
 using namespace mirage::video;
 
@@ -163,6 +165,57 @@ TEST(NalParserTest, FindStartCodes) {
     EXPECT_EQ(nal_units[2].nal_unit_type, 5);
 }
 
+// =============================================================================
+// Annex B Start Code Scanner Tests
+// =============================================================================
+
+// Byte-at-a-time reference the block scanner must agree with
+static size_t naiveStartCode(const uint8_t* data, size_t len, size_t offset) {
+    for (size_t i = offset; i + 3 <= len; i++) {
+        if (data[i] == 0 && data[i + 1] == 0) {
+            if (i + 3 < len && data[i + 2] == 0 && data[i + 3] == 1) return i;
+            if (data[i + 2] == 1) return i;
+        }
+    }
+    return ANNEXB_NPOS;
+}
+
+TEST(AnnexBScanTest, FindsCodesPastZeroFreeBlocks) {
+    std::vector<uint8_t> data(100, 0xAB);
+    data[70] = 0x00; data[71] = 0x00; data[72] = 0x00; data[73] = 0x01;
+    EXPECT_EQ(findAnnexBStartCode(data.data(), data.size(), 0), 70u);
+
+    data[40] = 0x00; data[41] = 0x00; data[42] = 0x01;
+    EXPECT_EQ(findAnnexBStartCode(data.data(), data.size(), 0), 40u);
+    EXPECT_EQ(findAnnexBStartCode(data.data(), data.size(), 41), 70u);
+}
+
+TEST(AnnexBScanTest, NoCodeAndTruncatedTail) {
+    std::vector<uint8_t> data(64, 0x00);
+    EXPECT_EQ(findAnnexBStartCode(data.data(), data.size(), 0), ANNEXB_NPOS);
+
+    const uint8_t tail[] = {0x11, 0x22, 0x00, 0x00};  // code cut off by the end
+    EXPECT_EQ(findAnnexBStartCode(tail, sizeof(tail), 0), ANNEXB_NPOS);
+    const uint8_t last[] = {0x11, 0x00, 0x00, 0x01};
+    EXPECT_EQ(findAnnexBStartCode(last, sizeof(last), 0), 1u);
+    EXPECT_EQ(findAnnexBStartCode(last, 2, 0), ANNEXB_NPOS);
+}
+
+TEST(AnnexBScanTest, MatchesByteScanOnRandomData) {
+    std::mt19937 rng(1234);
+    for (int round = 0; round < 500; round++) {
+        // Sparse zeros/ones so start codes land at every alignment
+        std::vector<uint8_t> data(rng() % 200);
+        for (auto& b : data) {
+            uint32_t r = rng() % 8;
+            b = r < 3 ? 0x00 : r == 3 ? 0x01 : static_cast<uint8_t>(rng());
+        }
+        size_t offset = data.empty() ? 0 : rng() % data.size();
+        ASSERT_EQ(findAnnexBStartCode(data.data(), data.size(), offset),
+                  naiveStartCode(data.data(), data.size(), offset)) << "round " << round;
+    }
+}
+
 // =============================================================================
 // SPS Parsing Tests
 // =============================================================================
@@ -244,3 +244,21 @@ TEST(Vid0ParserTest, MagicInPayloadNoFalseResync) {
     EXPECT_EQ(r.rtp_packets[0], rtp);
     EXPECT_TRUE(buf.empty());
 }
+
+// ---------------------------------------------------------------------------
+// V-15: Span overload reports consumed bytes and leaves the input untouched
+// ---------------------------------------------------------------------------
+TEST(Vid0ParserTest, SpanReportsConsumed) {
+    auto p1 = makeVid0(minRtp());
+    auto p2 = makeVid0(rtpOfSize(40));
+    std::vector<uint8_t> buf = {0x01, 0x02};         // garbage, skipped
+    buf.insert(buf.end(), p1.begin(), p1.end());
+    buf.insert(buf.end(), p2.begin(), p2.end() - 5);  // p2 incomplete
+    const auto before = buf;
+
+    size_t consumed = 0;
+    auto r = parseVid0Packets(buf.data(), buf.size(), consumed);
+    ASSERT_EQ(r.rtp_packets.size(), 1u);
+    EXPECT_EQ(consumed, 2 + p1.size());
+    EXPECT_EQ(buf, before);
+}